@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+
+REALTIME = 1.0
+
+
+class _Live:
+    __slots__ = ("session", "rate", "mode", "next_due", "steps")
+
+    def __init__(self, session, rate, mode):
+        self.session = session
+        self.rate = rate
+        self.mode = mode
+        self.next_due = time.monotonic()
+        self.steps = 0
+
+
+class _Channel:
+    __slots__ = ("version", "frame", "closed")
+
+    def __init__(self):
+        self.version = 0
+        self.frame = None
+        self.closed = False
+
+
+class SimClock:
+    """Advances live sessions on a server-side thread, independent of clients.
+
+    Each live session runs at ``rate`` simulation steps per wall-clock second
+    (1.0 is real time, 0 or less is as fast as possible in ``max_chunk``-step
+    slices). On every tick the due sessions and their step counts are handed
+    to ``step_fn(batch)`` as ``[(live, n), ...]``, which returns one frame per
+    entry. Only the latest frame per session is kept, so subscribers that fall
+    behind skip frames instead of queueing them.
+    """
+
+    def __init__(self, step_fn, max_chunk=256, max_lag_s=1.0):
+        self.step_fn = step_fn
+        self.max_chunk = max_chunk
+        self.max_lag_s = max_lag_s
+        self.ticks = 0
+        self.steps = 0
+        self._live = {}
+        self._channels = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sim-clock", daemon=True)
+            self._thread.start()
+
+    def start(self, session, rate=REALTIME, mode=None):
+        with self._cond:
+            self._live[session.id] = _Live(session, float(rate), mode)
+            channel = self._channels.get(session.id)
+            if channel is None or channel.closed:
+                self._channels[session.id] = _Channel()
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def stop(self, sid):
+        with self._cond:
+            live = self._live.pop(sid, None)
+            channel = self._channels.pop(sid, None)
+            if channel is not None:
+                channel.closed = True
+            self._cond.notify_all()
+        return live is not None
+
+    def is_live(self, sid):
+        return sid in self._live
+
+    def status(self):
+        with self._cond:
+            items = [{"session": sid, "rate": lv.rate, "mode": lv.mode, "steps": lv.steps} for sid, lv in self._live.items()]
+        return {"live": items, "ticks": self.ticks, "steps": self.steps}
+
+    def wait_frame(self, sid, seen=0, timeout=15.0):
+        """Block until the session has a frame newer than ``seen``.
+
+        Returns ``(version, frame)``, ``(seen, None)`` on timeout, or
+        ``(None, None)`` once the session is no longer live.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                channel = self._channels.get(sid)
+                if channel is None or channel.closed:
+                    return None, None
+                if channel.version > seen:
+                    return channel.version, channel.frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return seen, None
+                self._cond.wait(remaining)
+
+    def _due(self, now):
+        batch = []
+        wake = None
+        for live in self._live.values():
+            if live.rate <= 0:
+                batch.append((live, self.max_chunk))
+                continue
+            period = 1.0 / live.rate
+            if live.next_due > now:
+                wake = live.next_due if wake is None else min(wake, live.next_due)
+                continue
+            lag = now - live.next_due
+            if lag > self.max_lag_s:
+                # Too far behind to catch up: drop the backlog, keep the pace.
+                n = 1
+                live.next_due = now + period
+            else:
+                n = min(self.max_chunk, int(math.floor(lag / period)) + 1)
+                live.next_due += n * period
+            batch.append((live, n))
+            wake = live.next_due if wake is None else min(wake, live.next_due)
+        return batch, wake
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._live:
+                    self._cond.wait()
+                batch, wake = self._due(time.monotonic())
+                if not batch:
+                    self._cond.wait(max(0.0, wake - time.monotonic()))
+                    continue
+            try:
+                frames = self.step_fn(batch)
+            except Exception as e:
+                print(f"[WARN] Simulation clock stopped {len(batch)} session(s): {e}")
+                for live, _ in batch:
+                    self.stop(live.session.id)
+                continue
+            with self._cond:
+                self.ticks += 1
+                for (live, n), frame in zip(batch, frames):
+                    live.steps += n
+                    self.steps += n
+                    channel = self._channels.get(live.session.id)
+                    if channel is not None and not channel.closed:
+                        channel.version += 1
+                        channel.frame = frame
+                self._cond.notify_all()
@@ -0,0 +1,479 @@
+"""Sharded multi-process deployment of api.server behind a session router.
+
+``Cluster`` starts N worker processes, each running its own copy of the
+Flask app (own SessionPool, inference engine and clock) on a loopback port.
+``Router`` is a small threaded HTTP proxy that sends every request for a
+session to the worker that owns it, ``worker_for(sid, N)``, so sessions
+never move between processes and the workers share no mutable state.
+Per-process views (/sessions, /ready, /inference/stats, /debug/timers,
+GET /live and /metrics/prometheus) are gathered from every worker, and
+``?worker=i`` sends any request to one worker.
+
+Exported ``.npz`` policies preloaded at start are placed once in a
+multiprocessing.shared_memory block and every worker wraps read-only views
+of it in a NumpyPolicy, so N workers cost one copy of the weights. ``.zip``
+(torch) policies and policies loaded later through /load_policy are loaded
+by each worker itself.
+
+    python -m api.cluster --workers 4 --port 8000
+"""
+import os
+import json
+import uuid
+import zlib
+import socket
+import argparse
+import threading
+import itertools
+import http.client
+import http.server
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+
+# Requests without a session that any worker can answer; spread round-robin.
+GLOBAL_PATHS = ("/policies", "/predict_batch", "/replays")
+# Per-worker state, answered as {"workers": [one reply per worker]}.
+PER_WORKER = {("GET", "/inference/stats"), ("GET", "/debug/timers"), ("GET", "/live")}
+# Requests whose effect must reach every worker.
+BROADCAST = {("POST", "/load_policy")}
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+              "transfer-encoding", "upgrade", "content-length", "host"}
+ALIGN = 64
+
+
+def worker_for(sid, workers):
+    """Index of the worker that owns session ``sid``; stable across processes
+    and restarts (unlike ``hash``, which is salted per process)."""
+    return zlib.crc32(sid.encode()) % workers
+
+
+def request_session(headers, query):
+    """Session id of a request, resolved the way api.server resolves it."""
+    return headers.get("X-Session-Id") or (query.get("session") or [None])[0]
+
+
+def merge_prometheus(texts):
+    """One exposition from each worker's, with a ``worker`` label on every
+    sample so series stay per process and never jump between workers."""
+    families = {}
+    for w, text in enumerate(texts):
+        current = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    current = families.setdefault(parts[2], {"header": [], "samples": []})
+                    if line not in current["header"]:
+                        current["header"].append(line)
+                continue
+            brace = line.find("{")
+            if brace >= 0 and brace < line.find(" "):
+                # Label values may contain spaces; the label set ends at "} ".
+                end = line.index("} ", brace) + 1
+                name, rest = line[:brace + 1] + f'worker="{w}",' + line[brace + 1:end], line[end + 1:]
+            else:
+                name, _, rest = line.partition(" ")
+                name = f'{name}{{worker="{w}"}}'
+            if current is None:
+                current = families.setdefault("", {"header": [], "samples": []})
+            current["samples"].append(f"{name} {rest}")
+    lines = []
+    for family in families.values():
+        lines += family["header"] + family["samples"]
+    return "\n".join(lines) + "\n"
+
+
+def share_policies(policies):
+    """Copy the weights of the ``.npz`` policies into one shared memory block.
+
+    Returns ``(shm, spec, rest)``: the block (None if nothing was shared),
+    a picklable layout for ``attach_policies`` and the {name: path} policies
+    left for each worker to load itself.
+    """
+    from api.numpy_policy import NumpyPolicy
+    loaded, rest = {}, {}
+    for name, path in (policies or {}).items():
+        if path.endswith(".npz"):
+            loaded[name] = (path, NumpyPolicy.load(path))
+        else:
+            rest[name] = path
+    if not loaded:
+        return None, None, rest
+    layout, offset = {}, 0
+    for name, (path, policy) in loaded.items():
+        arrays = []
+        for a in [x for pair in zip(policy.weights, policy.biases) for x in pair]:
+            offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+            arrays.append((offset, a.shape))
+            offset += a.nbytes
+        layout[name] = {"path": path, "activation": policy.activation, "arrays": arrays}
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, (path, policy) in loaded.items():
+        src = [x for pair in zip(policy.weights, policy.biases) for x in pair]
+        for a, (off, shape) in zip(src, layout[name]["arrays"]):
+            np.ndarray(shape, dtype=np.float32, buffer=shm.buf, offset=off)[...] = a
+    return shm, {"name": shm.name, "policies": layout}, rest
+
+
+def attach_policies(spec):
+    """Attach to a ``share_policies`` block; returns ``(shm, {name: (policy, path)})``.
+
+    The policies compute on read-only views of the block, nothing is copied.
+    Keep ``shm`` referenced for as long as the policies are in use.
+    """
+    from api.numpy_policy import NumpyPolicy
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    out = {}
+    for name, entry in spec["policies"].items():
+        views = []
+        for off, shape in entry["arrays"]:
+            v = np.ndarray(tuple(shape), dtype=np.float32, buffer=shm.buf, offset=off)
+            v.flags.writeable = False
+            views.append(v)
+        out[name] = (NumpyPolicy(views[0::2], views[1::2], entry["activation"]), entry["path"])
+    return shm, out
+
+
+def _worker(i, config, spec, rest, settings, conn):
+    from werkzeug.serving import make_server
+    from envs.normalize import with_normalizer
+    from api import server
+    server.REPLAY_DIR = settings.get("replay_dir", server.REPLAY_DIR)
+    server.record_sessions = settings.get("record_sessions", False)
+    server.clock.max_chunk = settings.get("live_chunk", server.clock.max_chunk)
+    server.inference.max_batch = settings.get("infer_max_batch", server.inference.max_batch)
+    server.inference.max_wait_ms = settings.get("infer_max_wait_ms", server.inference.max_wait_ms)
+    app = server.create_app(config, rest, settings.get("model_cache"))
+    shm = None
+    if spec is not None:
+        shm, shared = attach_policies(spec)
+        for name, (policy, path) in shared.items():
+            server.registry.put(name, with_normalizer(policy, path), path)
+    server.sessions.max_sessions = settings.get("max_sessions", server.sessions.max_sessions)
+    server.sessions.idle_ttl = settings.get("session_ttl", server.sessions.idle_ttl)
+    httpd = make_server("127.0.0.1", 0, app, threaded=True)
+    conn.send(httpd.server_port)
+    conn.close()
+    try:
+        httpd.serve_forever()
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+class Cluster:
+    """N api.server worker processes on loopback ports.
+
+    ``policies`` ({name: path}) defaults to serve.policies of the config;
+    ``settings`` are the per-worker server options of ``main`` (max_sessions,
+    session_ttl, model_cache, infer_max_batch, infer_max_wait_ms, live_chunk,
+    replay_dir, record_sessions). Workers start with ``start_method``
+    (forkserver by default), so they do not inherit the parent's threads.
+    """
+
+    def __init__(self, workers=None, config=None, policies=None, start_method=None, **settings):
+        from api.server import config_policies, load_config
+        if config is not None:
+            config = os.path.abspath(config)
+        if policies is None:
+            policies = config_policies(load_config(config))
+        workers = max(1, workers or mp.cpu_count())
+        ctx = mp.get_context(start_method or "forkserver")
+        self._shm, spec, rest = share_policies(policies)
+        self._procs = []
+        self.backends = []
+        conns = []
+        for i in range(workers):
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_worker, args=(i, config, spec, rest, settings, child), name=f"neurolight-worker-{i}", daemon=True)
+            p.start()
+            child.close()
+            self._procs.append(p)
+            conns.append(parent)
+        try:
+            for i, c in enumerate(conns):
+                if not c.poll(120):
+                    raise RuntimeError(f"worker {i} did not start")
+                self.backends.append(("127.0.0.1", c.recv()))
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            for c in conns:
+                c.close()
+        self.closed = False
+
+    @property
+    def workers(self):
+        return len(self._procs)
+
+    def owner(self, sid):
+        return self.backends[worker_for(sid, len(self.backends))]
+
+    def close(self):
+        if getattr(self, "closed", False):
+            return
+        for p in self._procs:
+            p.terminate()
+        for p in self._procs:
+            p.join(timeout=5)
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._route()
+
+    do_POST = do_PUT = do_DELETE = do_OPTIONS = do_HEAD = do_GET
+
+    def _route(self):
+        router = self.server
+        n = len(router.backends)
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        key = (self.command, url.path)
+        if "worker" in query:
+            try:
+                w = int(query["worker"][0])
+            except ValueError:
+                w = -1
+            if not 0 <= w < n:
+                return self._send_json(400, {"error": f"worker must be an integer in [0, {n})"})
+            return self._forward(w, body)
+        if key in BROADCAST:
+            return self._send_json(*self._merge([router.call(w, self.command, self.path, body, self.headers) for w in range(n)]))
+        if key == ("GET", "/sessions"):
+            return self._send_json(*self._gather_sessions(n))
+        if key == ("GET", "/ready"):
+            return self._send_json(*self._gather_ready(n))
+        if key in PER_WORKER:
+            return self._send_json(*self._gather_each(n))
+        if key == ("GET", "/metrics/prometheus"):
+            return self._gather_prometheus(n)
+        if key == ("POST", "/session"):
+            # Pick the id here (unless the client did) so the session is
+            # created on its owner.
+            try:
+                sid = json.loads(body or b"{}").get("session")
+            except (ValueError, AttributeError):
+                sid = None
+            sid = sid or uuid.uuid4().hex
+            return self._forward(worker_for(sid, n), json.dumps({"session": sid}).encode())
+        sid = request_session(self.headers, query)
+        if sid is None and url.path.startswith(GLOBAL_PATHS):
+            return self._forward(next(router.rr) % n, body)
+        self._forward(worker_for(sid or "default", n), body)
+
+    def _forward(self, w, body):
+        try:
+            resp = self.server.open(w, self.command, self.path, body, self.headers)
+        except OSError as e:
+            return self._send_json(502, {"error": f"worker {w}: {e}"})
+        self.send_response(resp.status)
+        for k, v in resp.getheaders():
+            if k.lower() not in HOP_BY_HOP and k.lower() not in ("server", "date"):
+                self.send_header(k, v)
+        length = resp.getheader("Content-Length")
+        if length is not None or self.command == "HEAD":
+            data = resp.read()
+            self.send_header("Content-Length", length or "0")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+            return
+        # Streams (SSE, chunked rollouts) are relayed chunk by chunk.
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while True:
+            chunk = resp.read1(65536)
+            if not chunk:
+                break
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def _merge(replies):
+        for status, payload in replies:
+            if status >= 400:
+                return status, payload
+        return replies[0][0], {**replies[0][1], "workers": len(replies)}
+
+    def _gather_sessions(self, n):
+        replies = [self.server.call(w, "GET", "/sessions") for w in range(n)]
+        failed = [(s, p) for s, p in replies if s >= 400]
+        if failed:
+            return failed[0]
+        out = {"sessions": [], "max_sessions": 0, "evicted": 0}
+        for w, (_, payload) in enumerate(replies):
+            out["sessions"] += [{**s, "worker": w} for s in payload.get("sessions", [])]
+            out["max_sessions"] += payload.get("max_sessions", 0)
+            out["evicted"] += payload.get("evicted", 0)
+        return 200, out
+
+    def _gather_each(self, n):
+        replies = [self.server.call(w, self.command, self.path, b"", self.headers) for w in range(n)]
+        failed = [(s, p) for s, p in replies if s >= 400]
+        if failed:
+            return failed[0]
+        return 200, {"workers": [p for _, p in replies]}
+
+    def _gather_prometheus(self, n):
+        texts = []
+        for w in range(n):
+            try:
+                resp = self.server.open(w, "GET", self.path, b"", self.headers)
+                data = resp.read()
+            except OSError as e:
+                return self._send_json(502, {"error": f"worker {w}: {e}"})
+            if resp.status != 200:
+                return self._send_json(resp.status, {"error": f"worker {w} returned {resp.status}"})
+            texts.append(data.decode())
+        data = merge_prometheus(texts).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _gather_ready(self, n):
+        replies = [self.server.call(w, "GET", "/ready") for w in range(n)]
+        ready = all(s == 200 for s, _ in replies)
+        return (200 if ready else 503), {"ready": ready, "workers": [p for _, p in replies]}
+
+
+class Router(http.server.ThreadingHTTPServer):
+    """Threaded HTTP front end that routes requests to ``backends`` by session.
+
+    Each router thread keeps one keep-alive connection per backend. With
+    ``reuse_port`` several router processes can listen on the same port and
+    the kernel spreads incoming connections between them.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, backends, reuse_port=False):
+        self.backends = list(backends)
+        self.reuse_port = reuse_port
+        self.rr = itertools.count()
+        self._local = threading.local()
+        super().__init__(address, _Handler)
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def _conn(self, w, fresh=False):
+        conns = self._local.__dict__.setdefault("conns", {})
+        conn = conns.get(w)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = conns[w] = http.client.HTTPConnection(*self.backends[w], timeout=300)
+        return conn
+
+    def open(self, w, method, path, body=b"", headers=None):
+        """Send a request to backend w and return the unread response."""
+        headers = {k: v for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP}
+        if body or method in ("POST", "PUT"):
+            headers["Content-Length"] = str(len(body))
+        for attempt in (0, 1):
+            # A kept-alive connection the backend has since dropped fails on
+            # first use; retry once on a new one.
+            conn = self._conn(w, fresh=attempt > 0)
+            try:
+                conn.request(method, path, body=body or None, headers=headers)
+                return conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if attempt:
+                    raise OSError(f"backend {self.backends[w]} unreachable")
+
+    def call(self, w, method, path, body=b"", headers=None):
+        """Request to backend w answered as ``(status, json payload)``."""
+        try:
+            resp = self.open(w, method, path, body, headers)
+            data = resp.read()
+        except OSError as e:
+            return 502, {"error": f"worker {w}: {e}"}
+        try:
+            return resp.status, json.loads(data or b"{}")
+        except ValueError:
+            return resp.status, {"body": data.decode(errors="replace")}
+
+
+def _serve_router(host, port, backends):
+    Router((host, port), backends, reuse_port=True).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NeuroLight API server as N session-sharded worker processes behind a router")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, each owning a shard of the sessions")
+    parser.add_argument("--routers", type=int, default=1, help="Router processes sharing the port (SO_REUSEPORT)")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address for the router")
+    parser.add_argument("--port", type=int, default=8000, help="Port for the router")
+    parser.add_argument("--config", default=None, help="Config file (default: $NEUROLIGHT_CONFIG or the repository's train/config.yaml)")
+    parser.add_argument("--policies", default=None, help="Policies to pre-load as name=path,...; .npz ones are shared by all workers")
+    parser.add_argument("--max_sessions", type=int, default=256, help="Maximum number of live simulation sessions per worker")
+    parser.add_argument("--session_ttl", type=float, default=1800.0, help="Seconds of inactivity before a session is evicted")
+    parser.add_argument("--infer_max_batch", type=int, default=256, help="Maximum observations per coalesced policy forward pass")
+    parser.add_argument("--infer_max_wait_ms", type=float, default=2.0, help="Maximum time to wait for a micro-batch to fill")
+    parser.add_argument("--model_cache", type=int, default=None, help="Maximum number of loaded models kept in memory per worker")
+    parser.add_argument("--live_chunk", type=int, default=256, help="Maximum steps per clock tick for each live session")
+    parser.add_argument("--replay_dir", default="results/recordings", help="Directory of episode recordings served by /replays")
+    parser.add_argument("--record_sessions", action="store_true", help="Record every session's steps under --replay_dir")
+    args = parser.parse_args()
+    from api.registry import parse_policies
+    policies = parse_policies(args.policies) if args.policies is not None else None
+    settings = {k: getattr(args, k) for k in ("max_sessions", "session_ttl", "infer_max_batch", "infer_max_wait_ms",
+                                              "model_cache", "live_chunk", "replay_dir", "record_sessions")}
+    with Cluster(args.workers, args.config, policies, **settings) as cluster:
+        routers = []
+        ctx = mp.get_context("forkserver")
+        for _ in range(max(0, args.routers - 1)):
+            p = ctx.Process(target=_serve_router, args=(args.host, args.port, cluster.backends), daemon=True)
+            p.start()
+            routers.append(p)
+        router = Router((args.host, args.port), cluster.backends, reuse_port=args.routers > 1)
+        print(f"routing http://{args.host}:{args.port} to {cluster.workers} workers: "
+              + ", ".join(f"{h}:{p}" for h, p in cluster.backends))
+        try:
+            router.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            router.server_close()
+            for p in routers:
+                p.terminate()
+
+
+if __name__ == "__main__":
+    main()
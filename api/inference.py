@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+from api.telemetry import LatencyHistogram
+
+
+class _Pending:
+    __slots__ = ("obs", "enqueued", "event", "action", "error")
+
+    def __init__(self, obs):
+        self.obs = obs
+        self.enqueued = time.perf_counter()
+        self.event = threading.Event()
+        self.action = None
+        self.error = None
+
+
+class BatchInference:
+    """Coalesces single-observation predict calls into micro-batches.
+
+    Callers block in ``predict`` while a worker thread gathers up to
+    ``max_batch`` pending observations, waiting at most ``max_wait_ms`` after
+    the first one arrives, and runs one deterministic forward pass of the
+    current model for the whole batch.
+    """
+
+    def __init__(self, max_batch=256, max_wait_ms=2.0, history=4096):
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.model = None
+        self._queue = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._started = time.perf_counter()
+        self._latency_ms = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self.latency_hist = LatencyHistogram()
+        self.requests = 0
+        self.batches = 0
+        self.batch_rows = 0
+
+    def set_model(self, model):
+        self.model = model
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+            self._thread.start()
+
+    def predict(self, obs, timeout=5.0):
+        item = _Pending(np.asarray(obs, dtype=np.float32))
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append(item)
+            self._cond.notify()
+        if not item.event.wait(timeout):
+            raise TimeoutError("inference timed out")
+        if item.error is not None:
+            raise item.error
+        return item.action
+
+    def predict_many(self, obs):
+        model = self.model
+        if model is None:
+            raise RuntimeError("no model")
+        obs = np.asarray(obs, dtype=np.float32)
+        t0 = time.perf_counter()
+        actions, _ = model.predict(obs, deterministic=True)
+        with self._cond:
+            self.batches += 1
+            self.batch_rows += len(obs)
+            self._batch_sizes.append(len(obs))
+            elapsed = time.perf_counter() - t0
+            self._latency_ms.append(elapsed * 1000.0)
+            self.latency_hist.observe(elapsed)
+        return np.asarray(actions).reshape(len(obs))
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].enqueued + self.max_wait_ms / 1000.0
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            model = self.model
+            try:
+                if model is None:
+                    raise RuntimeError("no model")
+                obs = np.stack([item.obs for item in batch])
+                actions, _ = model.predict(obs, deterministic=True)
+                actions = np.asarray(actions).reshape(len(batch))
+                for item, action in zip(batch, actions):
+                    item.action = int(action)
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            done = time.perf_counter()
+            with self._cond:
+                self.requests += len(batch)
+                self.batches += 1
+                self.batch_rows += len(batch)
+                self._batch_sizes.append(len(batch))
+                for item in batch:
+                    self._latency_ms.append((done - item.enqueued) * 1000.0)
+                    self.latency_hist.observe(done - item.enqueued)
+            for item in batch:
+                item.event.set()
+
+    def stats(self):
+        with self._cond:
+            lat = np.array(self._latency_ms, dtype=np.float64)
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            pending = len(self._queue)
+        uptime = time.perf_counter() - self._started
+        out = {
+            "requests": self.requests,
+            "batches": self.batches,
+            "rows": self.batch_rows,
+            "pending": pending,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "rows_per_s": self.batch_rows / max(uptime, 1e-9),
+            "mean_batch": float(sizes.mean()) if sizes.size else 0.0,
+        }
+        if lat.size:
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            out["latency_ms"] = {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(lat.max())}
+        return out
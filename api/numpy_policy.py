@@ -0,0 +1,57 @@
+import numpy as np
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+    "identity": lambda x: x,
+}
+
+
+class NumpyPolicy:
+    """Deterministic PPO actor evaluated with NumPy from exported weights.
+
+    Holds the actor MLP (``mlp_extractor.policy_net``) and ``action_net`` of an
+    SB3 ``MlpPolicy`` and returns the argmax action, matching
+    ``model.predict(obs, deterministic=True)`` for Box observations and a
+    Discrete action space. Built by ``train/export_policy.py``.
+    """
+
+    def __init__(self, weights, biases, activation="tanh"):
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activation = activation
+        self._act = ACTIVATIONS[activation]
+        self.obs_dim = self.weights[0].shape[0]
+
+    @classmethod
+    def load(cls, path, device=None):
+        with np.load(path) as f:
+            n = int(f["n_layers"])
+            weights = [f[f"w{i}"] for i in range(n)]
+            biases = [f[f"b{i}"] for i in range(n)]
+            activation = str(f["activation"])
+        return cls(weights, biases, activation)
+
+    def save(self, path):
+        arrays = {"n_layers": np.int64(len(self.weights)), "activation": np.str_(self.activation)}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"w{i}"] = w
+            arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    def logits(self, obs):
+        x = np.asarray(obs, dtype=np.float32).reshape(-1, self.obs_dim)
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            x = x @ w + b
+            if i < last:
+                x = self._act(x)
+        return x
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        """SB3-compatible predict; always deterministic (argmax over logits)."""
+        obs = np.asarray(obs, dtype=np.float32)
+        actions = self.logits(obs).argmax(axis=1)
+        if obs.ndim == 1:
+            actions = actions[0]
+        return actions, state
@@ -0,0 +1,200 @@
+import io
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from api.numpy_policy import NumpyPolicy
+from envs.normalize import with_normalizer
+
+
+def load_policy(path, device="cpu", normalize=True):
+    """Rebuild only the SB3 policy network from a saved model zip.
+
+    Reads the ``data`` metadata and ``policy.pth`` weights and skips the
+    optimizer state, rollout buffer settings and the algorithm object, so it
+    is cheaper in time and memory than ``PPO.load``. The returned policy has
+    the same ``predict(obs, deterministic=True)`` interface as the model.
+    An exported ``.npz`` actor loads as a NumpyPolicy without importing torch.
+    When observation statistics were saved next to the model (see
+    envs/normalize.py) the policy is wrapped to apply them, unless
+    ``normalize`` is False.
+    """
+    if path.endswith(".npz"):
+        policy = NumpyPolicy.load(path)
+        return with_normalizer(policy, path) if normalize else policy
+    import torch
+    from stable_baselines3.common.save_util import json_to_data
+    with zipfile.ZipFile(path) as archive:
+        data = json_to_data(archive.read("data").decode())
+        state = torch.load(io.BytesIO(archive.read("policy.pth")), map_location=device)
+    policy = data["policy_class"](
+        data["observation_space"],
+        data["action_space"],
+        lr_schedule=lambda _: 0.0,
+        **data.get("policy_kwargs", {}),
+    )
+    policy.load_state_dict(state)
+    policy.to(device)
+    policy.set_training_mode(False)
+    return with_normalizer(policy, path) if normalize else policy
+
+
+class _Slot:
+    __slots__ = ("path", "model", "loading", "error", "swapped")
+
+    def __init__(self, path):
+        self.path = path
+        self.model = None
+        self.loading = None
+        self.error = None
+        self.swapped = None
+
+
+class ModelRegistry:
+    """Named policies backed by an LRU cache of loaded models.
+
+    Loaded models are cached by (absolute path, mtime, size), so asking for a
+    file that is already loaded and unchanged is free and a rewritten file is
+    picked up on the next load. Names bind to cached models; ``swap`` loads
+    outside the registry lock and rebinds the name in one assignment, so
+    callers that already hold the previous model keep using it undisturbed.
+    ``on_swap(name, model)`` is called after every rebind.
+    """
+
+    def __init__(self, loader=load_policy, max_models=4, device="cpu", on_swap=None):
+        self.loader = loader
+        self.max_models = max_models
+        self.device = device
+        self.on_swap = on_swap
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @staticmethod
+    def _key(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+    def load(self, path):
+        """Return the cached model for path, loading it on a miss."""
+        key = self._key(path)
+        with self._lock:
+            model = self._cache.get(key)
+            if model is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # Concurrent loads of the same file wait for the first one.
+        with load_lock:
+            with self._lock:
+                model = self._cache.get(key)
+                if model is not None:
+                    self.hits += 1
+                    return model
+            model = self.loader(path, self.device)
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = model
+                while len(self._cache) > max(1, self.max_models):
+                    self._cache.popitem(last=False)
+                self._load_locks.pop(key, None)
+            return model
+
+    def put(self, name, model, path=None):
+        """Bind an already built model to name without touching the cache."""
+        slot = _Slot(path)
+        slot.model = model
+        slot.swapped = time.time()
+        with self._lock:
+            self._slots[name] = slot
+        if self.on_swap is not None:
+            self.on_swap(name, model)
+
+    def swap(self, name, path):
+        """Load path (cached) and bind it to name; returns the model."""
+        model = self.load(path)
+        self.put(name, model, path)
+        return model
+
+    def swap_async(self, name, path):
+        """Start ``swap`` on a background thread and return the thread.
+
+        Until it finishes, ``get(name)`` keeps returning the previous model.
+        Failures are recorded and reported by ``status``.
+        """
+        with self._lock:
+            slot = self._slots.setdefault(name, _Slot(path))
+
+        def run():
+            try:
+                self.swap(name, path)
+            except Exception as e:
+                with self._lock:
+                    current = self._slots.get(name, slot)
+                    current.error = f"{path}: {e}"
+                    current.loading = None
+
+        thread = threading.Thread(target=run, name=f"swap-{name}", daemon=True)
+        with self._lock:
+            slot.loading = path
+            slot.error = None
+        thread.start()
+        return thread
+
+    def get(self, name):
+        slot = self._slots.get(name)
+        return None if slot is None else slot.model
+
+    def names(self):
+        with self._lock:
+            return list(self._slots)
+
+    def prewarm(self, policies):
+        """Load {name: path} entries in the background; missing files are skipped."""
+        threads = []
+        for name, path in policies.items():
+            if not os.path.exists(path):
+                print(f"[WARN] Policy '{name}' not found: {path}")
+                continue
+            threads.append(self.swap_async(name, path))
+        return threads
+
+    def status(self):
+        with self._lock:
+            slots = {
+                name: {
+                    "path": s.path,
+                    "loaded": s.model is not None,
+                    "loading": s.loading,
+                    "error": s.error,
+                    "swapped": s.swapped,
+                }
+                for name, s in self._slots.items()
+            }
+            cached = [{"path": k[0], "mtime_ns": k[1], "size": k[2]} for k in self._cache]
+        return {
+            "policies": slots,
+            "cached": cached,
+            "max_models": self.max_models,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def parse_policies(spec):
+    """Parse ``name=path,name=path`` (a bare path means ``default``)."""
+    out = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, path = item.partition("=")
+        if not sep:
+            name, path = "default", item
+        out[name.strip()] = path.strip()
+    return out
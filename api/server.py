@@ -1,42 +1,113 @@
 import argparse
+import json
 import os
-from flask import Flask, request, jsonify
+import re
+import threading
+import time
+import uuid
+import numpy as np
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import yaml
 from envs.traffic_env import TrafficEnv
+from envs import profiling
+from envs.planner import MPCPlanner
+from envs.recorder import EpisodeRecorder, Replay
+from api.sessions import Session, SessionPool, init_metrics
+from api.inference import BatchInference
+from api.registry import ModelRegistry, parse_policies
+from api.clock import REALTIME, SimClock
+from api.telemetry import Counters, prometheus_text
 
 app = Flask(__name__, static_folder="../web", static_url_path="")
 CORS(app)
 
-with open("train/config.yaml", "r") as f:
-    cfg = yaml.safe_load(f)
-
-seed = cfg.get("seed", 42)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG = os.path.join(ROOT, "train", "config.yaml")
+# Set by create_app; importing this module reads no files and builds no envs.
+cfg = None
+seed = 42
+warmup_threads = []
 sb3_device = os.environ.get("SB3_DEVICE", "auto")
-env = TrafficEnv(seed=seed, **cfg["env"])
-obs, info = env.reset()
-model = None
-mode = "fixed"
-
-
-def init_metrics(episode=1):
-    return {
-        "episode": episode,
-        "t": 0,
-        "avg_wait_proxy": 0.0,
-        "served_v": 0,
-        "switches": 0,
-        "reward_avg": 0.0,
-        "_wait_sum": 0.0,
-        "_reward_sum": 0.0,
-        "last_episode": None,
-    }
+MAX_ROLLOUT_STEPS = 100000
+MODES = ("fixed", "rl", "mpc")
+DEFAULT_POLICY = "default"
+# Recordings under REPLAY_DIR are served by /replays; with --record_sessions
+# every session also records its steps there, in a directory named after it.
+REPLAY_DIR = "results/recordings"
+RECORD_SESSION_ROWS = 4096
+record_sessions = False
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+# One coalescing engine per policy name; "default" is the one sessions start with.
+inference = BatchInference()
+engines = {DEFAULT_POLICY: inference}
+engines_lock = threading.Lock()
+
+
+def engine_for(name):
+    with engines_lock:
+        engine = engines.get(name)
+        if engine is None:
+            engine = BatchInference(max_batch=inference.max_batch, max_wait_ms=inference.max_wait_ms)
+            engines[name] = engine
+        return engine
+
+
+def bind_engine(name, policy):
+    engine_for(name).set_model(policy)
+
+
+registry = ModelRegistry(device=sb3_device, on_swap=bind_engine)
+counters = Counters()
+
+
+if profiling.ENABLED:
+    @app.before_request
+    def _start_timer():
+        request.environ["neurolight.t0"] = time.perf_counter_ns()
+
+    @app.after_request
+    def _stop_timer(response):
+        t0 = request.environ.get("neurolight.t0")
+        if t0 is not None:
+            profiling.record(f"api.request.{request.endpoint}", time.perf_counter_ns() - t0)
+        return response
+
+
+def session_record_path(sid):
+    """A fresh recording directory for session ``sid``: ``<sid>``, or
+    ``<sid>.1``, ``<sid>.2``, ... when a session with that id was recorded
+    before (evicted and re-created, or from an earlier server run)."""
+    base = os.path.join(REPLAY_DIR, sid)
+    path, k = base, 0
+    while os.path.exists(path):
+        k += 1
+        path = f"{base}.{k}"
+    return path
+
 
+def new_session(sid):
+    recorder = None
+    if record_sessions and SAFE_NAME.match(sid) and sid not in (".", ".."):
+        recorder = EpisodeRecorder(session_record_path(sid), chunk_rows=RECORD_SESSION_ROWS, meta={"session": sid})
+    return Session(sid, TrafficEnv(seed=seed, **cfg["env"]), recorder)
 
-metrics = init_metrics()
 
+def evict_session(sess):
+    # Stop the clock before the pool closes the session, so no tick steps it
+    # (or its recorder) afterwards.
+    clock.stop(sess.id)
 
-def metrics_payload():
+
+sessions = SessionPool(new_session, on_evict=evict_session)
+
+
+def current_session():
+    sid = request.headers.get("X-Session-Id") or request.args.get("session") or "default"
+    return sessions.get(sid)
+
+
+def metrics_payload(metrics):
     payload = {
         "episode": metrics["episode"],
         "t": metrics["t"],
@@ -49,63 +120,134 @@ def metrics_payload():
         payload["last_episode"] = metrics["last_episode"]
     return payload
 
-def step_fixed():
-    global env
-    
+def step_fixed(env):
     if getattr(env, "yellow_left", 0) > 0:
         return 0
-    
+
     if env.t_in_phase >= 120:
         return 1
-    
+
     return 0
 
+@app.post("/session")
+def create_session():
+    # A router may pick the id, so that it can hash it to this worker first.
+    data = request.get_json(silent=True) or {}
+    sess = sessions.get(data.get("session") or uuid.uuid4().hex)
+    return jsonify({"session": sess.id})
+
+@app.get("/sessions")
+def list_sessions():
+    now = time.monotonic()
+    items = [
+        {"session": s.id, "mode": s.mode, "t": s.metrics["t"], "episode": s.metrics["episode"], "idle_s": now - s.last_used}
+        for s in sessions.snapshot()
+    ]
+    return jsonify({"sessions": items, "max_sessions": sessions.max_sessions, "evicted": sessions.evicted})
+
+@app.delete("/session")
+def close_session():
+    sid = request.headers.get("X-Session-Id") or request.args.get("session") or "default"
+    clock.stop(sid)
+    sess = sessions.pop(sid)
+    if sess is not None:
+        sess.close()
+    return jsonify({"ok": sess is not None})
+
 @app.post("/load_policy")
 def load_policy():
-    global model
     data = request.get_json(force=True)
     p = data.get("path", "train/models/ppo_single_junction.zip")
+    name = data.get("name", DEFAULT_POLICY)
     if not os.path.exists(p):
         return jsonify({"ok": False}), 400
-    from stable_baselines3 import PPO
-    model = PPO.load(p, device=sb3_device)
-    return jsonify({"ok": True})
+    if data.get("wait", True):
+        registry.swap(name, p)
+        return jsonify({"ok": True, "name": name})
+    registry.swap_async(name, p)
+    return jsonify({"ok": True, "name": name, "pending": True}), 202
+
+@app.get("/policies")
+def list_policies():
+    return jsonify(registry.status())
+
+@app.post("/predict_batch")
+def predict_batch():
+    data = request.get_json(force=True)
+    obs = np.asarray(data.get("obs", []), dtype=np.float32)
+    if obs.ndim != 2 or obs.shape[1] != 5 or len(obs) == 0:
+        return jsonify({"error": "obs must be a non-empty list of 5-float observations"}), 400
+    name = data.get("policy", DEFAULT_POLICY)
+    if registry.get(name) is None:
+        return jsonify({"error": "no model"}), 400
+    actions = engine_for(name).predict_many(obs)
+    return jsonify({"actions": actions.astype(int).tolist()})
+
+@app.get("/inference/stats")
+def inference_stats():
+    with engines_lock:
+        items = list(engines.items())
+    stats = {name: engine.stats() for name, engine in items}
+    # Top-level fields stay those of the default engine for existing clients.
+    return jsonify({**stats[DEFAULT_POLICY], "policies": stats})
 
 @app.post("/mode")
 def set_mode():
-    global mode
     data = request.get_json(force=True)
     m = data.get("mode", "fixed")
-    if m not in ["fixed", "rl"]:
+    if m not in MODES:
         return jsonify({"ok": False}), 400
-    mode = m
-    return jsonify({"ok": True, "mode": mode})
+    policy = data.get("policy")
+    if policy is not None and policy not in registry.names():
+        return jsonify({"ok": False, "error": f"unknown policy '{policy}'"}), 400
+    sess = current_session()
+    with sess.lock:
+        sess.mode = m
+        if policy is not None:
+            sess.policy = policy
+        policy = sess.policy
+    return jsonify({"ok": True, "mode": m, "policy": policy})
 
 @app.post("/reset")
 def reset():
-    global env, obs, metrics
-    metrics = init_metrics()
-    obs, info = env.reset()
+    sess = current_session()
+    with sess.lock:
+        obs, info = sess.reset()
     return jsonify({"obs": obs.tolist(), "info": info})
 
-@app.post("/step")
-def step():
-    global env, obs, model, mode, metrics
-    data = request.get_json(force=True) if request.data else {}
-    m = data.get("mode", mode)
-    mode_used = "fixed"
+def new_planner():
+    return MPCPlanner(seed=seed, **cfg.get("mpc", {}))
+
+
+def session_model(sess):
+    return registry.get(sess.policy)
+
+
+def choose_action(sess, m, coalesce=True):
     if m == "rl":
-        if model is None:
-            return jsonify({"error": "no model"}), 400
-        from stable_baselines3 import PPO
-        action, _ = model.predict(obs, deterministic=True)
-        action = int(action)
-        mode_used = "rl"
-    else:
-        action = step_fixed()
-    obs_step, reward, terminated, truncated, info_step = env.step(action)
-    obs = obs_step
-    info = info_step
+        if coalesce:
+            return engine_for(sess.policy).predict(sess.obs), "rl"
+        action, _ = session_model(sess).predict(sess.obs, deterministic=True)
+        return int(action), "rl"
+    if m == "mpc":
+        if sess.planner is None:
+            sess.planner = new_planner()
+        return sess.planner.act(sess.env), "mpc"
+    return step_fixed(sess.env), "fixed"
+
+
+def advance_session(sess, action, counter="steps"):
+    """Step a session's env once and fold the result into its metrics.
+
+    The caller must hold ``sess.lock``. Returns the step tuple with the
+    episode summary (or None); the env is reset when the episode ends and
+    the reset info is left in ``sess.info``. The step is added to the server
+    counter named ``counter``.
+    """
+    env = sess.env
+    metrics = sess.metrics
+    obs_step, reward, terminated, truncated, info = env.step(action)
+    sess.obs = obs_step
     if hasattr(env, "yellow_left"):
         info["yellow"] = int(env.yellow_left)
     if hasattr(env, "t_in_phase"):
@@ -125,10 +267,19 @@ def step():
     metrics["switches"] = info.get("switches", metrics["switches"])
     metrics["_reward_sum"] += reward
     metrics["reward_avg"] = metrics["_reward_sum"] / max(1, metrics["t"])
+    sess.telemetry.append(
+        metrics["episode"], metrics["t"], info.get("q_ns", 0), info.get("q_ew", 0),
+        info.get("phase", 0), action, reward, served_v,
+    )
+    if sess.recorder is not None:
+        sess.recorder.append(
+            env=0, episode=metrics["episode"], t=metrics["t"], obs=obs_step, action=action, reward=reward,
+            q_ns=info.get("q_ns", 0), q_ew=info.get("q_ew", 0), phase=info.get("phase", 0), served=served_v,
+        )
+    counters.inc(counter)
 
-    episode_reset = bool(terminated or truncated)
     summary = None
-    if episode_reset:
+    if terminated or truncated:
         summary = {
             "episode": metrics["episode"],
             "steps": metrics["t"],
@@ -141,25 +292,592 @@ def step():
         }
         next_metrics = init_metrics(episode=summary["episode"] + 1)
         next_metrics["last_episode"] = summary
-        metrics = next_metrics
-        obs, info = env.reset()
-    response = {
-        "obs": obs.tolist(),
-        "reward": float(reward),
-        "terminated": bool(terminated),
-        "truncated": bool(truncated),
-        "info": info,
-        "mode_used": mode_used,
-        "action": int(action),
-    }
-    if episode_reset:
+        sess.metrics = next_metrics
+        sess.obs, sess.info = env.reset()
+    return reward, terminated, truncated, info, summary
+
+@app.post("/step")
+def step():
+    with profiling.span("api.step.parse"):
+        data = request.get_json(force=True) if request.data else {}
+        sess = current_session()
+    with sess.lock:
+        m = data.get("mode", sess.mode)
+        if m == "rl" and session_model(sess) is None:
+            return jsonify({"error": "no model"}), 400
+        with profiling.span("api.step.inference"):
+            action, mode_used = choose_action(sess, m)
+        with profiling.span("api.step.env"):
+            reward, terminated, truncated, info, summary = advance_session(sess, action)
+        if summary is not None:
+            info = sess.info
+        response = {
+            "obs": sess.obs.tolist(),
+            "reward": float(reward),
+            "terminated": bool(terminated),
+            "truncated": bool(truncated),
+            "info": info,
+            "mode_used": mode_used,
+            "action": int(action),
+            "metrics": metrics_payload(sess.metrics),
+        }
+    if summary is not None:
         response["episode_reset"] = True
         response["episode_summary"] = summary
+    with profiling.span("api.step.serialize"):
+        return jsonify(response)
+
+
+TRACE_KEYS = ("t", "q_ns", "q_ew", "phase", "yellow", "served_v")
+
+
+def rollout_chunk(sess, m, n):
+    """Advance a session n steps and return a columnar trace of them."""
+    trace = {k: [] for k in TRACE_KEYS}
+    trace["action"] = []
+    trace["reward"] = []
+    episodes = []
+    for _ in range(n):
+        # Sequential rollouts gain nothing from coalescing, so skip its wait.
+        action, _ = choose_action(sess, m, coalesce=False)
+        reward, terminated, truncated, info, summary = advance_session(sess, action)
+        if summary is not None:
+            episodes.append(summary)
+        for k in TRACE_KEYS:
+            trace[k].append(info.get(k))
+        trace["action"].append(int(action))
+        trace["reward"].append(float(reward))
+    return trace, episodes
+
+
+def rollout_request(data):
+    m = data.get("mode")
+    try:
+        steps = int(data.get("steps", 100))
+    except (TypeError, ValueError):
+        return None, None, (jsonify({"error": "steps must be an integer"}), 400)
+    if steps < 1 or steps > MAX_ROLLOUT_STEPS:
+        return None, None, (jsonify({"error": f"steps must be in [1, {MAX_ROLLOUT_STEPS}]"}), 400)
+    if m is not None and m not in MODES:
+        return None, None, (jsonify({"error": "unknown mode"}), 400)
+    return m, steps, None
+
+@app.post("/rollout")
+def rollout():
+    data = request.get_json(force=True) if request.data else {}
+    m, steps, err = rollout_request(data)
+    if err:
+        return err
+    sess = current_session()
+    with sess.lock:
+        if (m or sess.mode) == "rl" and session_model(sess) is None:
+            return jsonify({"error": "no model"}), 400
+        trace, episodes = rollout_chunk(sess, m or sess.mode, steps)
+        response = {
+            "steps": steps,
+            "mode_used": m or sess.mode,
+            "trace": trace,
+            "episodes": episodes,
+            "obs": sess.obs.tolist(),
+            "metrics": metrics_payload(sess.metrics),
+        }
     return jsonify(response)
 
+@app.post("/rollout/stream")
+def rollout_stream():
+    data = request.get_json(force=True) if request.data else {}
+    m, steps, err = rollout_request(data)
+    if err:
+        return err
+    chunk = max(1, int(data.get("chunk", 100)))
+    sess = current_session()
+
+    def generate():
+        # The lock is taken per chunk and released before each yield so a slow
+        # reader never blocks other requests on the same session.
+        with sess.lock:
+            mode_used = m or sess.mode
+            missing = mode_used == "rl" and session_model(sess) is None
+        if missing:
+            yield json.dumps({"error": "no model"}) + "\n"
+            return
+        done = 0
+        while done < steps:
+            n = min(chunk, steps - done)
+            with sess.lock:
+                trace, episodes = rollout_chunk(sess, mode_used, n)
+            done += n
+            yield json.dumps({"done": done, "trace": trace, "episodes": episodes}) + "\n"
+        with sess.lock:
+            line = json.dumps({"done": done, "obs": sess.obs.tolist(), "metrics": metrics_payload(sess.metrics)})
+        yield line + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def live_step(batch):
+    """SimClock callback: advance each (live, n) entry n steps and return frames.
+
+    Steps run in lockstep across sessions so RL sessions that share a policy
+    get one batched forward pass per step instead of one call each.
+    """
+    state = [{"action": 0, "reward": 0.0, "info": {}, "summary": None} for _ in batch]
+    longest = max(n for _, n in batch)
+    for k in range(longest):
+        active = [j for j, (_, n) in enumerate(batch) if n > k]
+        actions = {}
+        groups = {}
+        seen = {}
+        for j in active:
+            live = batch[j][0]
+            sess = live.session
+            with sess.lock:
+                if not sess.closed and (live.mode or sess.mode) == "rl" and session_model(sess) is not None:
+                    groups.setdefault(sess.policy, []).append(j)
+                    seen[j] = sess.obs
+        for name, idx in groups.items():
+            obs = np.stack([seen[j] for j in idx])
+            for j, a in zip(idx, engine_for(name).predict_many(obs)):
+                actions[j] = int(a)
+        for j in active:
+            live = batch[j][0]
+            sess = live.session
+            with sess.lock:
+                if sess.closed:
+                    continue
+                if j in actions and sess.obs is not seen[j] and session_model(sess) is not None:
+                    # A request stepped the session after the snapshot.
+                    action, _ = choose_action(sess, "rl", coalesce=False)
+                elif j in actions:
+                    action = actions[j]
+                elif (live.mode or sess.mode) == "mpc":
+                    action, _ = choose_action(sess, "mpc")
+                else:
+                    action = step_fixed(sess.env)
+                reward, _, _, info, summary = advance_session(sess, action)
+            st = state[j]
+            st["action"] = action
+            st["reward"] = reward
+            st["info"] = info
+            if summary is not None:
+                st["summary"] = summary
+    frames = []
+    for (live, n), st in zip(batch, state):
+        sess = live.session
+        # Live sessions count as in use, for idle expiry and for LRU order.
+        sessions.touch(sess.id)
+        with sess.lock:
+            frame = {
+                "obs": sess.obs.tolist(),
+                "reward": float(st["reward"]),
+                "info": {k: st["info"].get(k) for k in TRACE_KEYS},
+                "action": st["action"],
+                "steps": n,
+                "metrics": metrics_payload(sess.metrics),
+            }
+        if st["summary"] is not None:
+            frame["episode_summary"] = st["summary"]
+        frames.append(frame)
+    return frames
+
+
+clock = SimClock(live_step)
+
+
+@app.post("/live")
+def start_live():
+    data = request.get_json(force=True) if request.data else {}
+    rate = data.get("rate", "realtime")
+    if rate == "realtime":
+        rate = REALTIME
+    elif rate == "max":
+        rate = 0.0
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        return jsonify({"error": "rate must be a number, 'realtime' or 'max'"}), 400
+    m = data.get("mode")
+    if m is not None and m not in MODES:
+        return jsonify({"error": "unknown mode"}), 400
+    sess = current_session()
+    if (m or sess.mode) == "rl" and session_model(sess) is None:
+        return jsonify({"error": "no model"}), 400
+    clock.start(sess, rate, m)
+    return jsonify({"ok": True, "session": sess.id, "rate": rate})
+
+@app.delete("/live")
+def stop_live():
+    sid = request.headers.get("X-Session-Id") or request.args.get("session") or "default"
+    return jsonify({"ok": clock.stop(sid)})
+
+@app.get("/live")
+def live_status():
+    return jsonify(clock.status())
+
+@app.get("/live/stream")
+def live_stream():
+    """Server-sent events with the latest frame of a live session.
+
+    Frames are coalesced: at most ``fps`` per second are sent and a slow
+    client only ever receives the newest one.
+    """
+    sid = request.headers.get("X-Session-Id") or request.args.get("session") or "default"
+    if not clock.is_live(sid):
+        return jsonify({"error": "session is not live"}), 404
+    try:
+        fps = min(120.0, max(0.1, float(request.args.get("fps", 20))))
+    except ValueError:
+        return jsonify({"error": "fps must be a number"}), 400
+
+    def generate():
+        seen = 0
+        while True:
+            t0 = time.monotonic()
+            version, frame = clock.wait_frame(sid, seen)
+            if version is None:
+                yield "event: end\ndata: {}\n\n"
+                return
+            sessions.touch(sid)
+            if frame is None:
+                yield ": keepalive\n\n"
+                continue
+            seen = version
+            yield f"data: {json.dumps(frame)}\n\n"
+            time.sleep(max(0.0, 1.0 / fps - (time.monotonic() - t0)))
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/snapshot")
+def snapshot():
+    sess = current_session()
+    with sess.lock:
+        return jsonify({"env": sess.env.get_state(), "metrics": sess.metrics, "mode": sess.mode, "policy": sess.policy})
+
+@app.post("/restore")
+def restore():
+    data = request.get_json(force=True)
+    sess = current_session()
+    with sess.lock:
+        try:
+            sess.obs = sess.env.set_state(data["env"])
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"invalid snapshot: {e}"}), 400
+        if "metrics" in data:
+            sess.metrics = {**init_metrics(), **data["metrics"]}
+        return jsonify({"ok": True, "obs": sess.obs.tolist(), "metrics": metrics_payload(sess.metrics)})
+
+
+FORK_CONTROLLERS = ("hold", "switch") + MODES
+MAX_FORK_BRANCHES = 64
+MAX_FORK_TRACE = 1000
+
+
+def fork_branches(state, specs, steps, trace_every=0):
+    """Roll clones of one env state forward under each branch spec in lockstep.
+
+    Every branch starts from the same state and RNG, so all of them see the
+    same arrivals (common random numbers) and differences come only from the
+    control decisions. RL branches sharing a policy get one forward pass per
+    step. Branches stop at the end of the episode instead of resetting.
+    Each branch reports summary stats; with ``trace_every`` > 0 it also keeps
+    the queue and action of every ``trace_every``-th step.
+    """
+    planner = new_planner() if any(sp["controller"] == "mpc" for sp in specs) else None
+    envs = []
+    for _ in specs:
+        env = TrafficEnv(seed=seed, **cfg["env"])
+        env.set_state(state)
+        envs.append(env)
+    obs = [env._obs() for env in envs]
+    out = [{"name": sp["name"], "reward": 0.0, "served_v": 0, "steps": 0, "max_q": 0} for sp in specs]
+    queue_sum = [0] * len(specs)
+    if trace_every:
+        for r in out:
+            r["trace"] = {"t": [], "queue": [], "action": []}
+    for k in range(steps):
+        active = [j for j, env in enumerate(envs) if not env.truncated]
+        if not active:
+            break
+        actions = {}
+        groups = {}
+        for j in active:
+            sp = specs[j]
+            if k < len(sp["actions"]):
+                actions[j] = int(sp["actions"][k])
+            elif sp["controller"] == "rl":
+                groups.setdefault(sp["policy"], []).append(j)
+            elif sp["controller"] == "fixed":
+                actions[j] = step_fixed(envs[j])
+            elif sp["controller"] == "mpc":
+                actions[j] = planner.act(envs[j])
+            else:
+                actions[j] = 1 if sp["controller"] == "switch" else 0
+        for name, idx in groups.items():
+            for j, a in zip(idx, registry.get(name).predict(np.stack([obs[j] for j in idx]), deterministic=True)[0]):
+                actions[j] = int(a)
+        for j in active:
+            o, reward, _, _, info = envs[j].step(actions[j])
+            obs[j] = np.array(o)
+            r = out[j]
+            r["reward"] += float(reward)
+            r["served_v"] += int(info["served_v"])
+            r["steps"] += 1
+            q = int(info["q_ns"] + info["q_ew"])
+            queue_sum[j] += q
+            r["max_q"] = max(r["max_q"], q)
+            if trace_every and k % trace_every == 0:
+                r["trace"]["t"].append(k)
+                r["trace"]["queue"].append(q)
+                r["trace"]["action"].append(actions[j])
+    for r, env, total in zip(out, envs, queue_sum):
+        r["avg_q"] = total / r["steps"] if r["steps"] else 0.0
+        r["switches"] = int(env.switches - state["switches"])
+        r["final"] = {"q_ns": int(env.q_ns), "q_ew": int(env.q_ew), "phase": int(env.phase), "t": int(env.t)}
+    return out
+
+@app.post("/fork")
+def fork():
+    """What-if lookahead: clone the session's current state into branches.
+
+    Body: ``{"steps": 60, "branches": [{"name", "actions": [...],
+    "controller": "hold"|"switch"|"fixed"|"rl"|"mpc", "policy"}], "trace": 0}``.
+    A branch plays its explicit actions first, then its controller. Without
+    branches it compares switching now against holding, both continuing under
+    the session's mode. The session itself is not advanced. Branches return
+    summary stats; ``trace`` > 0 adds per-step queues and actions downsampled
+    to at most that many points per branch.
+    """
+    data = request.get_json(force=True) if request.data else {}
+    try:
+        steps = int(data.get("steps", 60))
+        trace = int(data.get("trace", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "steps and trace must be integers"}), 400
+    if steps < 1 or steps > MAX_ROLLOUT_STEPS:
+        return jsonify({"error": f"steps must be in [1, {MAX_ROLLOUT_STEPS}]"}), 400
+    if trace < 0 or trace > MAX_FORK_TRACE:
+        return jsonify({"error": f"trace must be in [0, {MAX_FORK_TRACE}]"}), 400
+    sess = current_session()
+    with sess.lock:
+        state = sess.env.get_state()
+        mode, policy = sess.mode, sess.policy
+    raw = data.get("branches") or [
+        {"name": "switch_now", "actions": [1]},
+        {"name": "hold", "actions": [0]},
+    ]
+    if not isinstance(raw, list) or len(raw) > MAX_FORK_BRANCHES:
+        return jsonify({"error": f"branches must be a list of at most {MAX_FORK_BRANCHES}"}), 400
+    specs = []
+    for i, b in enumerate(raw):
+        spec = {
+            "name": b.get("name", f"branch{i}"),
+            "actions": list(b.get("actions", [])),
+            "controller": b.get("controller", mode),
+            "policy": b.get("policy", policy),
+        }
+        if spec["controller"] not in FORK_CONTROLLERS:
+            return jsonify({"error": f"controller must be one of {', '.join(FORK_CONTROLLERS)}"}), 400
+        if spec["controller"] == "rl" and registry.get(spec["policy"]) is None:
+            return jsonify({"error": f"no model for policy '{spec['policy']}'"}), 400
+        specs.append(spec)
+    results = fork_branches(state, specs, steps, trace_every=-(-steps // trace) if trace else 0)
+    best = max(results, key=lambda r: r["reward"])["name"] if results else None
+    return jsonify({"t": state["t"], "steps": steps, "branches": results, "best": best})
+
+@app.get("/debug/timers")
+def debug_timers():
+    """Aggregated phase timers (needs NEUROLIGHT_PROFILE=1); ?reset=1 clears them."""
+    reset = request.args.get("reset") in ("1", "true")
+    return jsonify({"enabled": profiling.ENABLED, "timers": profiling.snapshot(reset=reset)})
+
+@app.post("/debug/profile")
+def debug_profile():
+    """Sample the Python stack while a scratch session runs N steps.
+
+    Returns folded stacks (``frame;frame;frame count`` per line) for
+    flamegraph.pl or speedscope. Live sessions are not touched.
+    """
+    data = request.get_json(force=True) if request.data else {}
+    try:
+        steps = int(data.get("steps", 2000))
+        interval = float(data.get("interval_ms", 1.0)) / 1000.0
+    except (TypeError, ValueError):
+        return jsonify({"error": "steps and interval_ms must be numbers"}), 400
+    if steps < 1 or steps > MAX_ROLLOUT_STEPS:
+        return jsonify({"error": f"steps must be in [1, {MAX_ROLLOUT_STEPS}]"}), 400
+    m = data.get("mode", "fixed")
+    if m not in MODES:
+        return jsonify({"error": "unknown mode"}), 400
+    sess = Session("profile", TrafficEnv(seed=seed, **cfg["env"]))
+    sess.policy = data.get("policy", DEFAULT_POLICY)
+    if m == "rl" and session_model(sess) is None:
+        return jsonify({"error": "no model"}), 400
+
+    def run():
+        for _ in range(steps):
+            action, _ = choose_action(sess, m, coalesce=False)
+            # Counted apart from served steps so profiling does not inflate
+            # neurolight_steps_total and the steps-per-second gauge.
+            advance_session(sess, action, counter="profile_steps")
+
+    with sess.lock:
+        _, samples = profiling.sample_stacks(run, interval=max(1e-4, interval))
+    return Response(profiling.folded(samples), mimetype="text/plain")
+
 @app.get("/metrics")
 def get_metrics():
-    return jsonify(metrics_payload())
+    sess = current_session()
+    with sess.lock:
+        payload = metrics_payload(sess.metrics)
+        payload["window"] = sess.telemetry.aggregates()
+    return jsonify(payload)
+
+@app.get("/metrics/history")
+def metrics_history():
+    """Columnar per-step history from sequence number ``since`` on.
+
+    Pass the returned ``next`` as ``since`` to poll for deltas only.
+    """
+    try:
+        since = int(request.args.get("since", 0))
+        limit = request.args.get("limit")
+        limit = None if limit is None else int(limit)
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    sess = current_session()
+    with sess.lock:
+        payload = sess.telemetry.since(since, limit)
+        payload["window"] = sess.telemetry.aggregates()
+    return jsonify(payload)
+
+def replay_path(name):
+    if not SAFE_NAME.match(name) or name in (".", ".."):
+        return None
+    path = os.path.join(REPLAY_DIR, name)
+    return path if os.path.exists(os.path.join(path, "index.json")) else None
+
+@app.get("/replays")
+def list_replays():
+    """Recordings under REPLAY_DIR with their size and metadata."""
+    items = []
+    if os.path.isdir(REPLAY_DIR):
+        for name in sorted(os.listdir(REPLAY_DIR)):
+            path = replay_path(name)
+            if path is None:
+                continue
+            index = Replay(path).index
+            items.append({"name": name, "rows": index["rows"], "episodes": len(index["episodes"]), "meta": index["meta"]})
+    return jsonify({"replays": items})
+
+@app.get("/replays/<name>")
+def replay_episodes(name):
+    path = replay_path(name)
+    if path is None:
+        return jsonify({"error": "unknown recording"}), 404
+    replay = Replay(path)
+    return jsonify({"name": name, "columns": replay.index["columns"], "episodes": replay.episodes()})
+
+@app.get("/replays/<name>/episode")
+def replay_episode(name):
+    """One recorded episode as columns from step ``since`` on, paged like /metrics/history."""
+    path = replay_path(name)
+    if path is None:
+        return jsonify({"error": "unknown recording"}), 404
+    try:
+        env_id = int(request.args.get("env", 0))
+        episode = int(request.args["episode"])
+        since = int(request.args.get("since", 0))
+        limit = request.args.get("limit")
+        limit = None if limit is None else int(limit)
+    except (KeyError, ValueError):
+        return jsonify({"error": "episode is required; env, episode, since and limit must be integers"}), 400
+    try:
+        return jsonify(Replay(path).since(env_id, episode, since, limit))
+    except KeyError:
+        return jsonify({"error": "unknown episode"}), 404
+
+@app.get("/metrics/prometheus")
+def metrics_prometheus():
+    with engines_lock:
+        items = list(engines.items())
+    text = prometheus_text(
+        counters=[
+            ("neurolight_steps_total", "Simulation steps across all sessions", [({}, counters.value("steps"))]),
+            ("neurolight_profile_steps_total", "Scratch-session steps run by /debug/profile", [({}, counters.value("profile_steps"))]),
+            ("neurolight_sessions_evicted_total", "Sessions dropped by the LRU/idle pool", [({}, sessions.evicted)]),
+            ("neurolight_inference_requests_total", "Coalesced single-observation predictions",
+             [({"policy": name}, e.requests) for name, e in items]),
+            ("neurolight_inference_batches_total", "Policy forward passes", [({"policy": name}, e.batches) for name, e in items]),
+        ],
+        gauges=[
+            ("neurolight_steps_per_second", "Simulation steps per second over the last ~10 s", [({}, counters.rate("steps"))]),
+            ("neurolight_active_sessions", "Sessions in the pool", [({}, len(sessions))]),
+            ("neurolight_live_sessions", "Sessions advanced by the server clock", [({}, len(clock.status()["live"]))]),
+        ],
+        histograms=[
+            ("neurolight_inference_latency_seconds", "Time from request to action, per policy",
+             [({"policy": name}, e.latency_hist) for name, e in items]),
+        ],
+    )
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+def _warm_policies(loads, names):
+    # One forward pass per preloaded policy, so the first request does not pay
+    # for lazy initialization inside torch or the NumPy runtime.
+    for t in loads:
+        t.join()
+    for name in names:
+        model = registry.get(name)
+        if model is not None:
+            try:
+                model.predict(np.zeros((1, 5), dtype=np.float32), deterministic=True)
+            except Exception as e:
+                print(f"[WARN] Warm-up of policy '{name}' failed: {e}")
+
+
+def load_config(config_path=None):
+    path = config_path or os.environ.get("NEUROLIGHT_CONFIG") or DEFAULT_CONFIG
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+def config_policies(config):
+    """serve.policies with relative paths resolved against the repository root."""
+    return {name: p if os.path.isabs(p) else os.path.join(ROOT, p)
+            for name, p in config.get("serve", {}).get("policies", {}).items()}
+
+
+def create_app(config_path=None, policies=None, model_cache=None):
+    """Load the config, start warming up in the background and return the app.
+
+    ``config_path`` defaults to $NEUROLIGHT_CONFIG, then the repository's
+    train/config.yaml (not the working directory's); relative policy paths
+    from the config are resolved against the repository root. ``policies``
+    ({name: path}) overrides serve.policies. Policies load and run one
+    prediction on a background thread and /ready answers 503 until that is
+    done. torch and SB3 are only imported if a policy needs them.
+    """
+    global cfg, seed
+    cfg = load_config(config_path)
+    seed = cfg.get("seed", 42)
+    serve_cfg = cfg.get("serve", {})
+    registry.max_models = model_cache or serve_cfg.get("model_cache", registry.max_models)
+    if policies is None:
+        policies = config_policies(cfg)
+    loads = registry.prewarm(policies)
+    warm = threading.Thread(target=_warm_policies, args=(loads, list(policies)), name="warm-policies", daemon=True)
+    warm.start()
+    warmup_threads[:] = [warm]
+    return app
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the config is loaded and warm-up has finished."""
+    if cfg is None:
+        return jsonify({"ready": False, "reason": "not configured"}), 503
+    pending = [t.name for t in warmup_threads if t.is_alive()]
+    policies = {name: {"loaded": s["loaded"], "error": s["error"]} for name, s in registry.status()["policies"].items()}
+    body = {"ready": not pending, "pending": pending, "policies": policies}
+    return jsonify(body), 200 if not pending else 503
 
 @app.get("/")
 def root():
@@ -167,26 +885,44 @@ def root():
 
 @app.post("/set_params")
 def set_params():
-    global env
     data = request.get_json(force=True)
-    if "lambda_ns" in data:
-        env.lambda_ns = float(data["lambda_ns"])
-    if "lambda_ew" in data:
-        env.lambda_ew = float(data["lambda_ew"])
-    if hasattr(env, "lambda_p_ns") and "lambda_p_ns" in data:
-        env.lambda_p_ns = float(data["lambda_p_ns"])
-    if hasattr(env, "lambda_p_ew") and "lambda_p_ew" in data:
-        env.lambda_p_ew = float(data["lambda_p_ew"])
+    sess = current_session()
+    with sess.lock:
+        env = sess.env
+        if "lambda_ns" in data:
+            env.lambda_ns = float(data["lambda_ns"])
+        if "lambda_ew" in data:
+            env.lambda_ew = float(data["lambda_ew"])
     return jsonify({"ok": True})
 
 
 def main():
+    global REPLAY_DIR, record_sessions
     parser = argparse.ArgumentParser(description="NeuroLight API server")
     parser.add_argument("--host", default="0.0.0.0", help="Bind address for the Flask server")
     parser.add_argument("--port", type=int, default=8000, help="Port for the Flask server")
     parser.add_argument("--debug", action="store_true", help="Enable Flask debug mode")
+    parser.add_argument("--config", default=None, help="Config file (default: $NEUROLIGHT_CONFIG or the repository's train/config.yaml)")
+    parser.add_argument("--max_sessions", type=int, default=256, help="Maximum number of live simulation sessions")
+    parser.add_argument("--session_ttl", type=float, default=1800.0, help="Seconds of inactivity before a session is evicted")
+    parser.add_argument("--infer_max_batch", type=int, default=256, help="Maximum observations per coalesced policy forward pass")
+    parser.add_argument("--infer_max_wait_ms", type=float, default=2.0, help="Maximum time to wait for a micro-batch to fill")
+    parser.add_argument("--policies", default=None, help="Policies to pre-load as name=path,... (default: serve.policies in the config)")
+    parser.add_argument("--model_cache", type=int, default=None, help="Maximum number of loaded models kept in memory")
+    parser.add_argument("--live_chunk", type=int, default=256, help="Maximum steps per clock tick for each live session")
+    parser.add_argument("--replay_dir", default=REPLAY_DIR, help="Directory of episode recordings served by /replays")
+    parser.add_argument("--record_sessions", action="store_true", help="Record every session's steps under --replay_dir")
     args = parser.parse_args()
-    app.run(host=args.host, port=args.port, debug=args.debug)
+    REPLAY_DIR = args.replay_dir
+    record_sessions = args.record_sessions
+    clock.max_chunk = args.live_chunk
+    inference.max_batch = args.infer_max_batch
+    inference.max_wait_ms = args.infer_max_wait_ms
+    policies = parse_policies(args.policies) if args.policies is not None else None
+    create_app(args.config, policies, args.model_cache)
+    sessions.max_sessions = args.max_sessions
+    sessions.idle_ttl = args.session_ttl
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from api.telemetry import Telemetry
+
+
+def init_metrics(episode=1):
+    return {
+        "episode": episode,
+        "t": 0,
+        "avg_wait_proxy": 0.0,
+        "served_v": 0,
+        "served_p": 0,  # sessions run TrafficEnv, which has no pedestrians
+        "switches": 0,
+        "reward_avg": 0.0,
+        "_wait_sum": 0.0,
+        "_reward_sum": 0.0,
+        "last_episode": None,
+    }
+
+
+class Session:
+    """One client's simulation: its own env, observation, mode, policy name,
+    metrics and per-step telemetry history, plus an optional EpisodeRecorder
+    that keeps every step on disk.
+
+    Handlers must hold ``lock`` while touching any of the fields.
+    """
+
+    def __init__(self, sid, env, recorder=None):
+        self.id = sid
+        self.env = env
+        self.recorder = recorder
+        self.mode = "fixed"
+        self.policy = "default"
+        self.telemetry = Telemetry()
+        self.planner = None
+        self.lock = threading.Lock()
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.closed = False
+        self.reset()
+
+    def reset(self):
+        self.metrics = init_metrics()
+        self.obs, self.info = self.env.reset()
+        return self.obs, self.info
+
+    def close(self):
+        # Under the lock, so a step already holding it finishes its append
+        # first and later steps see no recorder.
+        with self.lock:
+            self.closed = True
+            recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+
+
+class SessionPool:
+    """Bounded LRU pool of sessions with idle-TTL eviction.
+
+    ``factory(sid)`` builds a new Session on first use of an id. Once the pool
+    holds ``max_sessions`` the least recently used session is dropped, and
+    sessions idle for longer than ``idle_ttl`` seconds are dropped on access.
+    Dropped sessions are passed to ``on_evict(session)`` and then closed;
+    both, like the factory, run outside the pool lock.
+    """
+
+    def __init__(self, factory, max_sessions=256, idle_ttl=1800.0, on_evict=None):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now, dropped):
+        while self._sessions:
+            sid, sess = next(iter(self._sessions.items()))
+            if now - sess.last_used <= self.idle_ttl:
+                break
+            del self._sessions[sid]
+            dropped.append(sess)
+            self.evicted += 1
+
+    def _drop(self, dropped):
+        for sess in dropped:
+            if self.on_evict is not None:
+                self.on_evict(sess)
+            sess.close()
+
+    def get(self, sid):
+        now = time.monotonic()
+        dropped = []
+        with self._lock:
+            self._evict_idle(now, dropped)
+            sess = self._sessions.get(sid)
+            if sess is not None:
+                self._sessions.move_to_end(sid)
+                sess.last_used = now
+        self._drop(dropped)
+        if sess is not None:
+            return sess
+        # Built without the lock so a slow factory (env, recorder) does not
+        # stall other sessions. If a concurrent request created the same id
+        # meanwhile, its session is kept and this one is discarded.
+        fresh = self.factory(sid)
+        dropped = []
+        with self._lock:
+            sess = self._sessions.get(sid)
+            if sess is None:
+                while len(self._sessions) >= max(1, self.max_sessions):
+                    dropped.append(self._sessions.popitem(last=False)[1])
+                    self.evicted += 1
+                sess = self._sessions[sid] = fresh
+            else:
+                self._sessions.move_to_end(sid)
+            sess.last_used = time.monotonic()
+        if sess is not fresh:
+            fresh.close()
+        self._drop(dropped)
+        return sess
+
+    def touch(self, sid):
+        """Mark a session as used without creating it; False if it is gone."""
+        with self._lock:
+            sess = self._sessions.get(sid)
+            if sess is None:
+                return False
+            self._sessions.move_to_end(sid)
+            sess.last_used = time.monotonic()
+            return True
+
+    def pop(self, sid):
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+COLUMNS = {
+    "episode": np.int32,
+    "t": np.int32,
+    "q_ns": np.int32,
+    "q_ew": np.int32,
+    "phase": np.int8,
+    "action": np.int8,
+    "reward": np.float32,
+    "served": np.int32,
+}
+
+
+class Telemetry:
+    """Per-step history of one session in fixed-size NumPy ring buffers.
+
+    ``append`` is O(1). Rows are addressed by a sequence number that keeps
+    counting past ``capacity``; ``since(seq)`` returns the retained rows from
+    seq on as columns. Over the last ``window`` steps it also keeps a running
+    served-vehicle sum and a histogram of total queue length (queues at or
+    above ``max_queue_bin`` share the top bin), both updated incrementally, so
+    the windowed throughput and queue percentiles never rescan the history.
+    """
+
+    def __init__(self, capacity=3600, window=60, max_queue_bin=256):
+        self.capacity = capacity
+        self.window = min(window, capacity)
+        self.seq = 0
+        self.cols = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._qbin = np.zeros(capacity, dtype=np.int64)
+        self._hist = np.zeros(max_queue_bin + 1, dtype=np.int64)
+        self._served_sum = 0
+
+    def append(self, episode, t, q_ns, q_ew, phase, action, reward, served):
+        if self.seq >= self.window:
+            old = (self.seq - self.window) % self.capacity
+            self._hist[self._qbin[old]] -= 1
+            self._served_sum -= int(self.cols["served"][old])
+        i = self.seq % self.capacity
+        c = self.cols
+        c["episode"][i] = episode
+        c["t"][i] = t
+        c["q_ns"][i] = q_ns
+        c["q_ew"][i] = q_ew
+        c["phase"][i] = phase
+        c["action"][i] = action
+        c["reward"][i] = reward
+        c["served"][i] = served
+        b = min(q_ns + q_ew, len(self._hist) - 1)
+        self._qbin[i] = b
+        self._hist[b] += 1
+        self._served_sum += served
+        self.seq += 1
+
+    def since(self, seq=0, limit=None):
+        """Rows with sequence number >= seq as ``{"from", "next", "columns"}``.
+
+        Rows that have already been overwritten are skipped, so ``from`` may be
+        later than the requested seq.
+        """
+        start = max(int(seq), self.seq - self.capacity, 0)
+        stop = self.seq if limit is None else min(self.seq, start + int(limit))
+        idx = np.arange(start, stop) % self.capacity
+        return {
+            "from": start,
+            "next": stop,
+            "columns": {name: col[idx].tolist() for name, col in self.cols.items()},
+        }
+
+    def queue_percentile(self, q):
+        n = min(self.seq, self.window)
+        if n == 0:
+            return 0.0
+        rank = int(np.ceil(q / 100.0 * n))
+        return float(np.searchsorted(np.cumsum(self._hist), max(1, rank)))
+
+    def aggregates(self):
+        n = min(self.seq, self.window)
+        return {
+            "window_steps": n,
+            "queue_p50": self.queue_percentile(50),
+            "queue_p95": self.queue_percentile(95),
+            # One step is one simulated second.
+            "served_per_min": self._served_sum * 60.0 / n if n else 0.0,
+        }
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds in seconds."""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = np.asarray(buckets, dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[np.searchsorted(self.bounds, seconds)] += 1
+        self.sum += seconds
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+
+class Counters:
+    """Thread-safe monotonically increasing server counters.
+
+    ``rate(name)`` is the increase per second over roughly the last
+    ``rate_window`` seconds, from one sample of each counter per second.
+    """
+
+    def __init__(self, rate_window=10.0):
+        self.rate_window = rate_window
+        self._values = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        now = time.monotonic()
+        with self._lock:
+            value = self._values.get(name, 0) + n
+            self._values[name] = value
+            samples = self._samples.setdefault(name, deque())
+            if not samples or now - samples[-1][0] >= 1.0:
+                samples.append((now, value))
+            while len(samples) > 1 and now - samples[0][0] > self.rate_window:
+                samples.popleft()
+
+    def value(self, name):
+        return self._values.get(name, 0)
+
+    def rate(self, name):
+        now = time.monotonic()
+        with self._lock:
+            samples = self._samples.get(name)
+            if not samples:
+                return 0.0
+            t0, v0 = samples[0]
+            value = self._values[name]
+        if now - t0 > self.rate_window + 1.0:
+            return 0.0
+        return (value - v0) / max(now - t0, 1e-9)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text(counters=(), gauges=(), histograms=()):
+    """Render Prometheus text exposition format (version 0.0.4).
+
+    ``counters`` and ``gauges`` are ``(name, help, [(labels, value), ...])``;
+    ``histograms`` are ``(name, help, [(labels, LatencyHistogram), ...])``.
+    """
+    lines = []
+    for kind, metrics in (("counter", counters), ("gauge", gauges)):
+        for name, help_text, samples in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {value}")
+    for name, help_text, samples in histograms:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in samples:
+            cumulative = np.cumsum(hist.counts)
+            for bound, c in zip(hist.bounds, cumulative):
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': f'{bound:g}'})} {int(c)}")
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {int(cumulative[-1])}")
+            lines.append(f"{name}_sum{_labels(labels)} {hist.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {int(cumulative[-1])}")
+    return "\n".join(lines) + "\n"
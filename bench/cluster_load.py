@@ -0,0 +1,141 @@
+"""Local load test of api.cluster: request throughput against worker count.
+
+For each worker count a fresh Cluster is started and driven by client
+processes, each running threads that own one session and one keep-alive
+connection and post /step (or /rollout) for a fixed time. Clients either
+connect to the owning worker directly (``--target direct``, what a
+session-aware load balancer would do) or go through a Router process
+(``--target router``).
+
+    python -m bench.cluster_load --workers 1,2,4,8 --duration 10
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import argparse
+import http.client
+import threading
+import multiprocessing as mp
+from bench.common import machine_info, rate
+
+
+def _ints(s):
+    return [int(x) for x in s.split(",") if x]
+
+
+def _session_loop(address, sid, path, body, deadline, out):
+    conn = http.client.HTTPConnection(*address, timeout=60)
+    headers = {"Content-Type": "application/json", "X-Session-Id": sid}
+    n = errors = 0
+    try:
+        conn.request("POST", "/session", body=json.dumps({"session": sid}), headers=headers)
+        conn.getresponse().read()
+        while time.time() < deadline:
+            conn.request("POST", path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                n += 1
+            else:
+                errors += 1
+        conn.request("DELETE", "/session", headers=headers)
+        conn.getresponse().read()
+    finally:
+        conn.close()
+    out.append((n, errors))
+
+
+def _client(addresses, threads, path, body, start, duration, results):
+    # addresses: one per thread, already resolved to the owner or the router.
+    time.sleep(max(0.0, start - time.time()))
+    out = []
+    ts = [threading.Thread(target=_session_loop, args=(addresses[k][0], addresses[k][1], path, body, start + duration, out))
+          for k in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    results.put((sum(n for n, _ in out), sum(e for _, e in out)))
+
+
+def drive(cluster, router, clients, threads, path, body, duration, direct=True):
+    """Run ``clients`` x ``threads`` sessions for ``duration`` seconds.
+
+    Returns ``(requests, errors, seconds)``.
+    """
+    ctx = mp.get_context("forkserver")
+    results = ctx.Queue()
+    start = time.time() + 2.0
+    procs = []
+    for _ in range(clients):
+        sids = [uuid.uuid4().hex for _ in range(threads)]
+        addresses = [(cluster.owner(sid) if direct else router, sid) for sid in sids]
+        p = ctx.Process(target=_client, args=(addresses, threads, path, body, start, duration, results), daemon=True)
+        p.start()
+        procs.append(p)
+    totals = [results.get(timeout=duration + 120) for _ in procs]
+    for p in procs:
+        p.join()
+    return sum(n for n, _ in totals), sum(e for _, e in totals), duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the sharded API server (api.cluster) against worker count")
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default: 1,2,4,... up to half the cores, leaving the rest to the clients)")
+    parser.add_argument("--target", default="direct", choices=["direct", "router"], help="Clients hit the owning worker, or a router process")
+    parser.add_argument("--clients", type=int, default=None, help="Client processes (default: one per worker)")
+    parser.add_argument("--threads", type=int, default=8, help="Sessions (threads) per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--mode", default="fixed", choices=["fixed", "rl", "mpc"])
+    parser.add_argument("--rollout_steps", type=int, default=0, help="Post /rollout with this many steps instead of /step")
+    parser.add_argument("--policies", default=None, help="Policies to pre-load as name=path,... (needed for --mode rl)")
+    parser.add_argument("--config", default=None)
+    parser.add_argument("--out", default="results/cluster_load.json", help="JSON results path")
+    args = parser.parse_args()
+    from api.cluster import Cluster, _serve_router
+    from api.registry import parse_policies
+    cores = os.cpu_count() or 1
+    counts = _ints(args.workers) if args.workers else [1 << k for k in range(8) if (1 << k) <= max(1, cores // 2)]
+    policies = parse_policies(args.policies) if args.policies is not None else {}
+    if args.rollout_steps:
+        path, body = "/rollout", {"mode": args.mode, "steps": args.rollout_steps}
+    else:
+        path, body = "/step", {"mode": args.mode}
+    steps_per_request = args.rollout_steps or 1
+    body = json.dumps(body)
+    results = []
+    base = None
+    print(f"{'workers':>7} {'req/s':>10} {'steps/s':>12} {'speedup':>8} {'efficiency':>10} {'errors':>6}")
+    for w in counts:
+        clients = args.clients or w
+        with Cluster(w, args.config, policies, max_sessions=clients * args.threads + 16) as cluster:
+            router = router_proc = None
+            if args.target == "router":
+                # Leave the router its own process, as in a deployment.
+                with socket.socket() as s:
+                    s.bind(("127.0.0.1", 0))
+                    router = ("127.0.0.1", s.getsockname()[1])
+                router_proc = mp.get_context("forkserver").Process(target=_serve_router, args=(*router, cluster.backends), daemon=True)
+                router_proc.start()
+                time.sleep(1.0)
+            try:
+                n, errors, seconds = drive(cluster, router, clients, args.threads, path, body, args.duration, direct=router is None)
+            finally:
+                if router_proc is not None:
+                    router_proc.terminate()
+        r = rate(f"cluster.{path.strip('/')}.{args.mode}.w{w}", n * steps_per_request, seconds,
+                 workers=w, clients=clients, threads=args.threads, target=args.target, requests=n, errors=errors)
+        results.append(r)
+        base = base or r["value"]
+        speedup = r["value"] / base
+        print(f"{w:>7} {n / seconds:>10.1f} {r['value']:>12.1f} {speedup:>8.2f} {speedup / w * counts[0]:>10.2f} {errors:>6}")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+    print(args.out)
+
+
+if __name__ == "__main__":
+    main()
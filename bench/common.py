@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import platform
+import subprocess
+import numpy as np
+
+
+def best_of(fn, repeat=3):
+    """Run fn() repeat times and return the fastest wall time in seconds."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def rate(name, count, seconds, unit="steps/s", **params):
+    """Throughput result; higher is better."""
+    return {"name": name, "value": count / max(seconds, 1e-12), "unit": unit, "higher_is_better": True, **params}
+
+
+def latency(name, samples_ms, **params):
+    """p50/p95/p99 latency results for one measurement; lower is better."""
+    lat = np.asarray(samples_ms, dtype=np.float64)
+    out = []
+    for q in (50, 95, 99):
+        out.append({
+            "name": f"{name}.p{q}",
+            "value": float(np.percentile(lat, q)),
+            "unit": "ms",
+            "higher_is_better": False,
+            "n": int(lat.size),
+            **params,
+        })
+    return out
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def machine_info():
+    return {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
@@ -0,0 +1,54 @@
+import json
+import argparse
+
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=0.1):
+    """Match results by name and flag those that got worse by more than threshold.
+
+    ``change`` is the relative improvement: positive is better whether the
+    metric is a rate or a latency.
+    """
+    before = {r["name"]: r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        b = before.get(r["name"])
+        if b is None or b["value"] == 0:
+            continue
+        rel = (r["value"] - b["value"]) / abs(b["value"])
+        change = rel if r["higher_is_better"] else -rel
+        rows.append({
+            "name": r["name"],
+            "unit": r["unit"],
+            "old": b["value"],
+            "new": r["value"],
+            "change": change,
+            "regression": change < -threshold,
+        })
+    return rows
+
+
+def print_report(rows):
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['name']:40s} {r['old']:14.3f} -> {r['new']:14.3f} {r['unit']:8s} {r['change']:+7.1%} {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two bench JSON reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+    rows = compare(load(args.old), load(args.new), args.threshold)
+    print_report(rows)
+    if any(r["regression"] for r in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
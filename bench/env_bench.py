@@ -0,0 +1,82 @@
+import numpy as np
+from envs.traffic_env import TrafficEnv
+from envs.batched_env import BatchedTrafficEnv
+from bench.common import best_of, rate
+
+VEC_KINDS = ("dummy", "subproc", "batched", "shm", "signal")
+
+
+def _actions(n):
+    # Fixed 40-tick cycle: deterministic and exercises both switch and hold paths.
+    return (np.arange(n) % 40 == 0).astype(np.int64)
+
+
+def bench_traffic_env(env_cfg, steps=20000, repeat=3):
+    """TrafficEnv.step in plain and fast mode, and the TrafficEnv.run kernel."""
+    results = []
+    actions = _actions(steps)
+    for fast in (False, True):
+        env = TrafficEnv(seed=0, **{**env_cfg, "fast": fast})
+
+        def loop():
+            env.reset(seed=0)
+            for a in actions:
+                _, _, terminated, truncated, _ = env.step(int(a))
+                if terminated or truncated:
+                    env.reset()
+
+        results.append(rate("env.step.fast" if fast else "env.step", steps, best_of(loop, repeat)))
+    env = TrafficEnv(seed=0, **env_cfg)
+    env.run(actions[:8])  # compile outside the timed region
+
+    def run_loop():
+        env.reset(seed=0)
+        done = 0
+        while done < steps:
+            obs, _ = env.run(actions[done:])
+            done += len(obs)
+            env.reset()
+
+    results.append(rate("env.run", steps, best_of(run_loop, repeat)))
+    return results
+
+
+def make_vec_env(kind, n, env_cfg):
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+    batched_cfg = {k: v for k, v in env_cfg.items() if k != "fast"}
+    if kind == "dummy":
+        return DummyVecEnv([lambda i=i: TrafficEnv(seed=i, **env_cfg) for i in range(n)])
+    if kind == "subproc":
+        return SubprocVecEnv([lambda i=i: TrafficEnv(seed=i, **env_cfg) for i in range(n)])
+    if kind == "batched":
+        return BatchedTrafficEnv(n, **batched_cfg)
+    if kind == "shm":
+        from envs.shm_vec_env import ShmVecEnv
+        return ShmVecEnv(n, **batched_cfg)
+    if kind == "signal":
+        # Four-phase table with pedestrians; same arrays, more columns.
+        from envs.signal_env import BatchedSignalEnv
+        signal_cfg = {k: v for k, v in batched_cfg.items() if k != "demand"}
+        return BatchedSignalEnv(n, table="protected_left_ped", **signal_cfg)
+    raise ValueError(f"unknown vec env kind: {kind}")
+
+
+def bench_vec_envs(env_cfg, num_envs=(1, 8, 64), kinds=VEC_KINDS, steps=1000, repeat=3):
+    """Vec env step throughput (env steps/s summed over envs) per backend and size."""
+    results = []
+    for n in num_envs:
+        for kind in kinds:
+            env = make_vec_env(kind, n, env_cfg)
+            try:
+                env.reset()
+                actions = np.zeros(n, dtype=np.int64)
+
+                def loop():
+                    for k in range(steps):
+                        actions[:] = k % 40 == 0
+                        env.step(actions)
+
+                results.append(rate(f"vec.{kind}.n{n}", n * steps, best_of(loop, repeat), num_envs=n))
+            finally:
+                env.close()
+    return results
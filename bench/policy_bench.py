@@ -0,0 +1,75 @@
+import math
+import time
+import numpy as np
+from envs.batched_env import BatchedTrafficEnv
+from bench.common import best_of, rate, latency
+
+BATCH_SIZES = (1, 4, 16, 64, 256, 1024, 4096)
+
+
+def make_model(cfg, path=None, device="cpu", num_envs=1, n_steps=None, batch_size=None):
+    """A PPO model with the config's policy, loaded from path when given.
+
+    Untrained weights time the same as trained ones, so a saved model is
+    optional for latency runs.
+    """
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecMonitor
+    env_cfg = {k: v for k, v in cfg["env"].items() if k != "fast"}
+    env = VecMonitor(BatchedTrafficEnv(num_envs, seed=cfg.get("seed", 42), **env_cfg))
+    if path:
+        return PPO.load(path, env=env, device=device)
+    return PPO(cfg["policy"], env,
+               n_steps=n_steps or cfg["n_steps"],
+               batch_size=batch_size or cfg["batch_size"],
+               n_epochs=cfg["n_epochs"],
+               gamma=cfg["gamma"],
+               gae_lambda=cfg["gae_lambda"],
+               policy_kwargs=cfg.get("policy_kwargs", None),
+               seed=cfg.get("seed", 42),
+               device=device,
+               verbose=0)
+
+
+def bench_predict(model, batch_sizes=BATCH_SIZES, calls=200, max_rows=200000):
+    """Deterministic model.predict latency and row throughput per batch size."""
+    results = []
+    rng = np.random.default_rng(0)
+    for b in batch_sizes:
+        obs = rng.random((b, 5), dtype=np.float32)
+        model.predict(obs, deterministic=True)
+        n = max(5, min(calls, max_rows // b))
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            model.predict(obs, deterministic=True)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        results.extend(latency(f"predict.b{b}", samples, batch=b))
+        results.append(rate(f"predict.b{b}.rows", b * n, sum(samples) / 1000.0, unit="rows/s", batch=b))
+    return results
+
+
+def bench_ppo(cfg, num_envs=8, n_steps=256, batch_size=256, rollouts=4, device="cpu"):
+    """PPO rollout collection rate and gradient updates per second.
+
+    target_kl is left unset so every epoch runs and the update count is exact.
+    """
+    model = make_model(cfg, device=device, num_envs=num_envs, n_steps=n_steps, batch_size=batch_size)
+    train_time = [0.0]
+    train = model.train
+
+    def timed_train():
+        t0 = time.perf_counter()
+        train()
+        train_time[0] += time.perf_counter() - t0
+
+    model.train = timed_train
+    total = rollouts * n_steps * num_envs
+    elapsed = best_of(lambda: model.learn(total_timesteps=total), repeat=1)
+    updates = rollouts * model.n_epochs * math.ceil(n_steps * num_envs / batch_size)
+    params = {"num_envs": num_envs, "n_steps": n_steps, "batch_size": batch_size}
+    return [
+        rate("ppo.learn", total, elapsed, **params),
+        rate("ppo.rollout", total, elapsed - train_time[0], **params),
+        rate("ppo.updates", updates, train_time[0], unit="updates/s", **params),
+    ]
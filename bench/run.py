@@ -0,0 +1,84 @@
+import os
+import json
+import argparse
+import yaml
+from bench.common import machine_info
+
+SUITES = ("env", "vec", "predict", "ppo", "server")
+
+
+def _ints(s):
+    return [int(x) for x in s.split(",") if x]
+
+
+def run_suites(cfg, suites, args):
+    env_cfg = cfg["env"]
+    results = []
+    model = None
+    if "env" in suites:
+        from bench.env_bench import bench_traffic_env
+        results += bench_traffic_env(env_cfg, steps=args.env_steps, repeat=args.repeat)
+    if "vec" in suites:
+        from bench.env_bench import bench_vec_envs
+        results += bench_vec_envs(env_cfg, num_envs=_ints(args.num_envs), kinds=args.vec_kinds.split(","),
+                                  steps=args.vec_steps, repeat=args.repeat)
+    if "predict" in suites or ("server" in suites and args.model):
+        from bench.policy_bench import make_model
+        model = make_model(cfg, path=args.model, device=args.device)
+    if "predict" in suites:
+        from bench.policy_bench import bench_predict
+        results += bench_predict(model, batch_sizes=_ints(args.batch_sizes))
+    if "ppo" in suites:
+        from bench.policy_bench import bench_ppo
+        results += bench_ppo(cfg, device=args.device)
+    if "server" in suites:
+        from bench.server_bench import bench_server
+        results += bench_server(model if args.model else None, concurrency=_ints(args.concurrency),
+                                requests=args.requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark env, policy and server throughput")
+    parser.add_argument("--config", default="train/config.yaml")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {','.join(SUITES)}")
+    parser.add_argument("--out", default="results/bench.json", help="JSON results path")
+    parser.add_argument("--baseline", default=None, help="Earlier bench JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repeats; the fastest is kept")
+    parser.add_argument("--env_steps", type=int, default=20000)
+    parser.add_argument("--vec_steps", type=int, default=1000)
+    parser.add_argument("--num_envs", default="1,8,64", help="Comma-separated vec env sizes")
+    parser.add_argument("--vec_kinds", default="dummy,subproc,batched,shm")
+    parser.add_argument("--batch_sizes", default="1,4,16,64,256,1024,4096")
+    parser.add_argument("--model", default=None, help="Saved PPO .zip for predict/server runs (default: untrained policy)")
+    parser.add_argument("--device", default="cpu", choices=["auto", "cpu", "cuda"])
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrent client counts")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client per server case")
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    suites = [s for s in args.suites.split(",") if s]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {','.join(sorted(unknown))}")
+    results = run_suites(cfg, suites, args)
+    for r in results:
+        print(f"{r['name']:40s} {r['value']:14.3f} {r['unit']}")
+    report = {"machine": machine_info(), "suites": suites, "results": results}
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(args.out)
+    if args.baseline:
+        from bench.compare import compare, load, print_report
+        rows = compare(load(args.baseline), report, args.threshold)
+        print_report(rows)
+        if any(r["regression"] for r in rows):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
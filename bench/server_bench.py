@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from bench.common import latency, rate
+
+
+def start_server(model=None):
+    """Serve api.server's app on an ephemeral local port from a daemon thread."""
+    from werkzeug.serving import make_server
+    from api import server
+    app = server.create_app(policies={})
+    if model is not None:
+        server.registry.put(server.DEFAULT_POLICY, model)
+    httpd = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, name="bench-server", daemon=True)
+    thread.start()
+    return httpd
+
+
+def _post(conn, path, body, sid=None):
+    headers = {"Content-Type": "application/json"}
+    if sid:
+        headers["X-Session-Id"] = sid
+    conn.request("POST", path, body=json.dumps(body), headers=headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{path} returned {resp.status}: {data[:200]!r}")
+    return data
+
+
+def _client(port, path, body, requests):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        sid = json.loads(_post(conn, "/session", {}))["session"]
+        samples = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            _post(conn, path, body, sid)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        conn.request("DELETE", "/session", headers={"X-Session-Id": sid})
+        conn.getresponse().read()
+        return samples
+    finally:
+        conn.close()
+
+
+def bench_server(model=None, concurrency=(1, 8, 32), requests=200, rollout_steps=100):
+    """Request latency percentiles and request rate under concurrent local clients.
+
+    Each client owns its own session. /step runs in rl mode when a model is
+    given (exercising coalesced inference) and fixed mode otherwise.
+    """
+    httpd = start_server(model)
+    port = httpd.server_port
+    mode = "rl" if model is not None else "fixed"
+    cases = [
+        (f"server.step.{mode}", "/step", {"mode": mode}),
+        (f"server.rollout{rollout_steps}.{mode}", "/rollout", {"mode": mode, "steps": rollout_steps}),
+    ]
+    results = []
+    try:
+        for name, path, body in cases:
+            for c in concurrency:
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=c) as pool:
+                    futures = [pool.submit(_client, port, path, body, requests) for _ in range(c)]
+                    samples = [s for f in futures for s in f.result()]
+                elapsed = time.perf_counter() - t0
+                name_c = f"{name}.c{c}"
+                results.extend(latency(name_c, samples, concurrency=c))
+                results.append(rate(f"{name_c}.rps", len(samples), elapsed, unit="req/s", concurrency=c))
+    finally:
+        httpd.shutdown()
+    return results
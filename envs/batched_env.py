@@ -0,0 +1,239 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+from envs.demand import make_demand
+from envs.normalize import Normalizer
+from envs.recorder import TRAFFIC_SCHEMA, VecRecorder
+# The junction dynamics live in a NumPy-only module so the server and the
+# planner can use them without importing SB3 and torch.
+from envs.junction import PARAM_DTYPES, JunctionBatch
+
+
+class BatchVecEnv(VecEnv):
+    """SB3 VecEnv plumbing over a structure-of-arrays batch of junctions.
+
+    Mixed in after a batch core (JunctionBatch, SignalBatch) that provides
+    ``advance``, ``_obs``, ``_info`` and ``_reset_state``. Subclasses own the
+    per-env arrival streams: ``_refill(i)`` draws a block of ``prefetch``
+    steps into ``_arrivals``, ``_rewind(i)`` hands an unused block back to the
+    generator and ``_reset_envs(indices, seeds)`` starts new episodes.
+    ``PARAM_DTYPES`` lists the per-env parameters and ``RATE_PARAMS`` those
+    that change arrival rates.
+    """
+
+    metadata = {"render_modes": []}
+    render_mode = None
+    PARAM_DTYPES = PARAM_DTYPES
+    RATE_PARAMS = ("lambda_ns", "lambda_ew")
+
+    def _init_vec(self, num_envs, obs_dim, n_actions, width, seed, seeds, prefetch, full_info, normalize, gamma, record, schema):
+        """VecEnv spaces, arrival buffers ``width`` columns wide, normalizer
+        and recorder. Returns the per-env seeds."""
+        observation_space = spaces.Box(low=0.0, high=1.0, shape=(obs_dim,), dtype=np.float32)
+        VecEnv.__init__(self, num_envs, observation_space, spaces.Discrete(n_actions))
+        n = num_envs
+        if seeds is None:
+            seeds = [None if seed is None else seed + i for i in range(n)]
+        self.prefetch = max(1, int(prefetch))
+        self.full_info = full_info
+        self.rngs = [np.random.default_rng(s) for s in seeds]
+        self._idx = np.arange(n)
+        self._arrivals = np.zeros((n, self.prefetch, width), dtype=np.int64)
+        self._arr_pos = np.zeros(n, dtype=np.int64)
+        self._arr_len = np.zeros(n, dtype=np.int64)
+        self._arr_rates = np.zeros((n, width), dtype=np.float64)
+        self._rng_state = [None] * n
+        self._actions = np.zeros(n, dtype=np.int64)
+        self.normalizer = Normalizer.make(normalize, n, gamma, obs_dim=obs_dim)
+        self.recorder = VecRecorder.make(record, n, schema)
+        return seeds
+
+    def _record_columns(self):
+        """Recorder columns besides obs, action and reward for the last step."""
+        return {}
+
+    def _terminal_info(self, i, info):
+        """Add to the info of env i at the end of its episode."""
+
+    def reset(self):
+        self._reset_envs(self._idx, self._seeds)
+        self._reset_seeds()
+        self._reset_options()
+        self.reset_infos = [self._info(i) for i in range(self.num_envs)]
+        obs = self._obs()
+        if self.recorder is not None:
+            self.recorder.reset()
+        if self.normalizer is not None:
+            self.normalizer.reset(obs)
+        return obs
+
+    def _draw_arrivals(self):
+        for i in np.flatnonzero(self._arr_pos >= self._arr_len):
+            self._refill(i)
+        arrivals = self._arrivals[self._idx, self._arr_pos]
+        self._arr_pos += 1
+        return arrivals
+
+    def step_arrays(self, actions):
+        """Advance all envs one tick with sampled arrivals and no auto-reset.
+
+        For evaluation loops that read episode totals before resetting.
+        """
+        return self.advance(np.asarray(actions, dtype=np.int64), self._draw_arrivals())
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        reward = self.step_arrays(self._actions)
+        dones = self.t >= self.episode_len
+        obs = self._obs()
+        if self.full_info:
+            infos = [self._info(i) for i in range(self.num_envs)]
+        else:
+            infos = [{} for _ in range(self.num_envs)]
+        if self.recorder is not None:
+            self.recorder.step(obs, self._actions, reward, dones, **self._record_columns())
+        if self.normalizer is not None:
+            obs, reward = self.normalizer.step(obs, reward, dones, infos)
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            for i in done_idx:
+                infos[i]["TimeLimit.truncated"] = True
+                infos[i]["terminal_observation"] = obs[i].copy()
+                self._terminal_info(i, infos[i])
+            self._reset_envs(done_idx)
+            for i in done_idx:
+                self.reset_infos[i] = self._info(i)
+            fresh = self._obs()[done_idx]
+            obs[done_idx] = fresh if self.normalizer is None else self.normalizer.normalize_obs(fresh)
+        return obs, reward.astype(np.float32), dones, infos
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def set_params(self, indices, params):
+        """Assign per-env parameter values, ``{attr: values aligned with indices}``.
+
+        Arrivals prefetched at the old rates are handed back first when a rate
+        changes, as in set_attr.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if any(k in params for k in self.RATE_PARAMS):
+            for i in indices[self._arr_pos[indices] < self._arr_len[indices]]:
+                self._rewind(i)
+        for name, values in params.items():
+            getattr(self, name)[indices] = values
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self, attr_name)
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,):
+            return [value[i] for i in self._get_indices(indices)]
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        current = getattr(self, attr_name, None)
+        if not (isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,)):
+            setattr(self, attr_name, value)
+            return
+        idx = np.array(list(self._get_indices(indices)), dtype=np.int64)
+        self.set_params(idx, {attr_name: value})
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """Call ``method_name(*method_args, **method_kwargs)`` on each selected env.
+
+        As in SB3, every env gets the same arguments. The envs are rows of the
+        batch, so only scalar-env methods with a per-row ``_env_<name>(i, ...)``
+        are available; operations over many envs at once are plain methods
+        taking the indices (set_params).
+        """
+        method = getattr(self, f"_env_{method_name}", None)
+        if method is None:
+            raise AttributeError(f"{type(self).__name__} has no per-env method '{method_name}'")
+        return [method(i, *method_args, **method_kwargs) for i in self._get_indices(indices)]
+
+    def _env_reset(self, i, seed=None, options=None):
+        self._reset_envs([i], [seed])
+        return self._obs()[i], self._info(i)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+class BatchedTrafficEnv(JunctionBatch, BatchVecEnv):
+    """N independent TrafficEnv junctions stored as structure-of-arrays.
+
+    Each env keeps its own np.random.Generator so trajectories are bit-identical
+    to N separate TrafficEnv(seed=seeds[i]) instances stepped through DummyVecEnv.
+    Arrivals are drawn in per-env blocks of ``prefetch`` steps (never past the
+    episode end) and the rest of the step is vectorized over all envs. A
+    ``demand`` model (see envs/demand.py) is shared by all envs, each with its
+    own episode offset.
+
+    ``normalize`` (True, a Normalizer config dict or a Normalizer) scales
+    observations and rewards by running statistics inside step_wait, over all
+    envs at once, and reports raw episode returns in ``episode`` infos, so
+    no VecNormalize/VecMonitor layer is needed. ``record`` (a directory, an
+    EpisodeRecorder config dict or an EpisodeRecorder) logs every step's raw
+    observation, action, reward and junction state, see envs/recorder.py.
+    """
+
+    def __init__(self, num_envs, seed=0, seeds=None, prefetch=256, full_info=False, demand=None, normalize=None, gamma=0.99, record=None, **env_kwargs):
+        JunctionBatch.__init__(self, num_envs, **env_kwargs)
+        seeds = self._init_vec(num_envs, 5, 2, 2, seed, seeds, prefetch, full_info, normalize, gamma, record, TRAFFIC_SCHEMA)
+        self.demand = make_demand(demand)
+        self._demand_offset = np.zeros(num_envs, dtype=np.int64)
+        self._arr_t0 = np.zeros(num_envs, dtype=np.int64)
+        # TrafficEnv.__init__ resets once with its constructor seed.
+        self._reset_envs(self._idx, seeds)
+
+    def _info(self, i):
+        return {
+            "t": int(self.t[i]),
+            "q_ns": int(self.q_ns[i]),
+            "q_ew": int(self.q_ew[i]),
+            "phase": int(self.phase[i]),
+            "served_v": int(self.served[i]),
+            "switches": int(self.switches[i]),
+        }
+
+    def _record_columns(self):
+        return {"q_ns": self.q_ns, "q_ew": self.q_ew, "phase": self.phase, "served": self.served}
+
+    def _rewind(self, i):
+        # Give back arrivals that were prefetched but not consumed, so the
+        # generator is exactly where a scalar TrafficEnv would have left it.
+        if self._arr_pos[i] < self._arr_len[i]:
+            rng = self.rngs[i]
+            rng.bit_generator.state = self._rng_state[i]
+            if self._arr_pos[i] > 0 and self.demand is None:
+                rng.poisson(self._arr_rates[i], size=(int(self._arr_pos[i]), 2))
+            elif self._arr_pos[i] > 0:
+                self.demand.take(rng, self._demand_offset[i], self._arr_t0[i], int(self._arr_pos[i]))
+        self._arr_pos[i] = 0
+        self._arr_len[i] = 0
+
+    def _refill(self, i):
+        rng = self.rngs[i]
+        k = int(min(self.prefetch, self.episode_len[i] - self.t[i]))
+        self._rng_state[i] = rng.bit_generator.state
+        self._arr_rates[i, 0] = self.lambda_ns[i]
+        self._arr_rates[i, 1] = self.lambda_ew[i]
+        self._arr_t0[i] = self.t[i]
+        if self.demand is None:
+            self._arrivals[i, :k] = rng.poisson(self._arr_rates[i], size=(k, 2))
+        else:
+            self._arrivals[i, :k] = self.demand.take(rng, self._demand_offset[i], self.t[i], k)
+        self._arr_pos[i] = 0
+        self._arr_len[i] = k
+
+    def _reset_envs(self, indices, seeds=None):
+        for j, i in enumerate(indices):
+            self._rewind(i)
+            if seeds is not None and seeds[j] is not None:
+                self.rngs[i] = np.random.default_rng(seeds[j])
+            self.phase[i] = self.rngs[i].integers(0, 2)
+            if self.demand is not None:
+                self._demand_offset[i] = self.demand.start_offset(self.rngs[i], self.episode_len[i])
+        self._reset_state(indices)
@@ -0,0 +1,142 @@
+import csv
+import argparse
+import numpy as np
+
+
+class RateProfile:
+    """Time-varying Poisson arrivals from a periodic rate curve.
+
+    ``points`` are ``(t_seconds, lambda_ns, lambda_ew)`` knots, linearly
+    interpolated and wrapped every ``period`` seconds (a day by default), so a
+    few knots describe morning and evening rush hours. With ``random_offset``
+    each episode starts at a uniformly drawn time of the period, otherwise at
+    ``start``.
+    """
+
+    def __init__(self, points, period=86400, random_offset=False, start=0, scale=1.0):
+        pts = np.asarray(sorted(points), dtype=np.float64).reshape(-1, 3)
+        if len(pts) == 0:
+            raise ValueError("RateProfile needs at least one (t, lambda_ns, lambda_ew) point")
+        self.period = int(period)
+        # Close the curve so interpolation wraps smoothly across the period end.
+        self._t = np.append(pts[:, 0], pts[0, 0] + self.period)
+        self._lam = np.vstack([pts[:, 1:], pts[:1, 1:]]) * float(scale)
+        self.random_offset = random_offset
+        self.start = int(start)
+
+    def rates(self, offset, t, k):
+        ts = (offset + t + np.arange(k)) % self.period
+        ts = np.where(ts < self._t[0], ts + self.period, ts)
+        return np.stack([np.interp(ts, self._t, self._lam[:, 0]), np.interp(ts, self._t, self._lam[:, 1])], axis=1)
+
+    def start_offset(self, rng, episode_len):
+        if self.random_offset:
+            return int(rng.integers(0, self.period))
+        return self.start
+
+    def take(self, rng, offset, t, k):
+        """Arrivals for episode steps t..t+k-1 as a (k, 2) int64 array."""
+        return rng.poisson(self.rates(offset, t, k))
+
+
+class TraceDemand:
+    """Replays recorded per-second (ns, ew) counts from a memory-mapped .npy.
+
+    The trace is opened with ``mmap_mode="r"`` and only the rows an episode
+    asks for are paged in, so multi-GB traces can back many envs (and worker
+    processes) at once. With ``random_offset`` each episode replays a window
+    starting at a uniformly drawn second; windows running past the end wrap
+    around to the start of the trace.
+    """
+
+    def __init__(self, path, random_offset=True, start=0):
+        self.path = path
+        self.counts = np.load(path, mmap_mode="r")
+        if self.counts.ndim != 2 or self.counts.shape[1] != 2:
+            raise ValueError(f"{path}: expected an (n, 2) count trace, got shape {self.counts.shape}")
+        self.random_offset = random_offset
+        self.start = int(start)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __reduce__(self):
+        # Re-open the map in worker processes instead of pickling the data.
+        return (TraceDemand, (self.path, self.random_offset, self.start))
+
+    def start_offset(self, rng, episode_len):
+        if self.random_offset:
+            return int(rng.integers(0, max(1, len(self) - episode_len + 1)))
+        return self.start
+
+    def take(self, rng, offset, t, k):
+        n = len(self)
+        lo = (offset + t) % n
+        if lo + k <= n:
+            return np.asarray(self.counts[lo:lo + k], dtype=np.int64)
+        return np.asarray(self.counts[(lo + np.arange(k)) % n], dtype=np.int64)
+
+
+def make_demand(spec):
+    """Build a demand model from a config dict (``kind: profile | trace``).
+
+    Returns None for None, and passes demand objects through unchanged.
+    """
+    if spec is None or hasattr(spec, "take"):
+        return spec
+    spec = dict(spec)
+    kind = spec.pop("kind")
+    if kind == "profile":
+        return RateProfile(**spec)
+    if kind == "trace":
+        return TraceDemand(**spec)
+    raise ValueError(f"unknown demand kind: {kind}")
+
+
+def csv_to_trace(src, dst, columns=("count_ns", "count_ew"), dtype=np.uint16, chunk=1 << 16):
+    """Convert a per-second detector count CSV into a memory-mappable .npy.
+
+    Streams the CSV twice (once to count rows, once to fill the output in
+    ``chunk``-row blocks) so neither file has to fit in memory. Returns the
+    number of rows written.
+    """
+    with open(src, newline="") as f:
+        n = sum(1 for _ in csv.reader(f)) - 1
+    out = np.lib.format.open_memmap(dst, mode="w+", dtype=dtype, shape=(max(0, n), 2))
+    limit = np.iinfo(dtype).max
+    buf = np.zeros((chunk, 2), dtype=np.int64)
+    row = 0
+    with open(src, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{src}: missing columns {missing}")
+        k = 0
+        for rec in reader:
+            buf[k, 0] = int(float(rec[columns[0]] or 0))
+            buf[k, 1] = int(float(rec[columns[1]] or 0))
+            k += 1
+            if k == chunk:
+                out[row:row + k] = np.clip(buf[:k], 0, limit)
+                row += k
+                k = 0
+        out[row:row + k] = np.clip(buf[:k], 0, limit)
+        row += k
+    out.flush()
+    del out
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a per-second count CSV to a memory-mapped .npy trace")
+    parser.add_argument("src", help="CSV with one row per second")
+    parser.add_argument("dst", help="Output .npy path")
+    parser.add_argument("--columns", default="count_ns,count_ew", help="NS and EW count columns")
+    parser.add_argument("--dtype", default="uint16", choices=["uint8", "uint16", "uint32"])
+    args = parser.parse_args()
+    rows = csv_to_trace(args.src, args.dst, columns=tuple(args.columns.split(",")), dtype=np.dtype(args.dtype))
+    print(f"{rows} rows -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from envs.junction import JunctionBatch
+
+
+class GridTrafficEnv(JunctionBatch):
+    """R x C grid of junctions where served vehicles feed downstream queues.
+
+    NS traffic flows south (row r -> r + 1) and EW traffic flows east
+    (col c -> c + 1); vehicles served at the last row/column leave the grid.
+    External Poisson demand enters on the north and west edges, interior
+    junctions get ``local_demand`` times that rate. Vehicles in transit sit in
+    a ring buffer of shape (max_travel + 1, R * C, 2) and reach the next queue
+    after ``travel_ns`` / ``travel_ew`` steps (scalars or (R, C) arrays).
+
+    Multi-agent API: ``reset()`` and ``step(actions)`` use per-junction
+    (R * C, 5) observations, (R * C,) actions and (R * C,) rewards.
+    """
+
+    def __init__(self, rows=4, cols=4, seed=0, travel_ns=5, travel_ew=5, local_demand=0.0, **env_kwargs):
+        n = rows * cols
+        super().__init__(n, **env_kwargs)
+        self.rows = rows
+        self.cols = cols
+        self.local_demand = float(local_demand)
+        self.rng = np.random.default_rng(seed)
+        r, c = np.divmod(np.arange(n), cols)
+        self.travel = np.stack([
+            np.broadcast_to(travel_ns, (rows, cols)).reshape(n),
+            np.broadcast_to(travel_ew, (rows, cols)).reshape(n),
+        ], axis=1).astype(np.int64)
+        if self.travel.min() < 1:
+            raise ValueError("travel times must be >= 1 step")
+        self._src_ns = np.flatnonzero(r < rows - 1)
+        self._dst_ns = self._src_ns + cols
+        self._src_ew = np.flatnonzero(c < cols - 1)
+        self._dst_ew = self._src_ew + 1
+        self._edge = np.stack([r == 0, c == 0], axis=1)
+        self._ring = np.zeros((int(self.travel.max()) + 1, n, 2), dtype=np.int64)
+        self._head = 0
+        self.exited = 0
+        self.observation_space = spaces.Box(low=0.0, high=1.0, shape=(n, 5), dtype=np.float32)
+        self.action_space = spaces.MultiDiscrete([2] * n)
+        self.reset(seed=seed)
+
+    def _demand(self):
+        lam = np.stack([self.lambda_ns, self.lambda_ew], axis=1)
+        return np.where(self._edge, lam, lam * self.local_demand)
+
+    def in_transit(self):
+        return int(self._ring.sum())
+
+    def _info(self):
+        return {
+            "t": int(self.t[0]),
+            "q_ns": self.q_ns.copy(),
+            "q_ew": self.q_ew.copy(),
+            "phase": self.phase.copy(),
+            "served_v": self.served.copy(),
+            "switches": self.switches.copy(),
+            "exited": self.exited,
+            "in_transit": self.in_transit(),
+        }
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_state(slice(None))
+        self.phase[:] = self.rng.integers(0, 2, size=self.n)
+        self._ring[:] = 0
+        self._head = 0
+        self.exited = 0
+        return self._obs(), self._info()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.n)
+        ring = self._ring
+        inflow = ring[self._head].copy()
+        ring[self._head] = 0
+        arrivals = self.rng.poisson(self._demand()) + inflow
+        reward = self.advance(actions, arrivals)
+        size = ring.shape[0]
+        src = self._src_ns
+        ring[(self._head + self.travel[src, 0]) % size, self._dst_ns, 0] += self.served_ns[src]
+        src = self._src_ew
+        ring[(self._head + self.travel[src, 1]) % size, self._dst_ew, 1] += self.served_ew[src]
+        self.exited += int(self.served_ns[self.rows * self.cols - self.cols:].sum())
+        self.exited += int(self.served_ew[self.cols - 1::self.cols].sum())
+        self._head = (self._head + 1) % size
+        truncated = bool(self.t[0] >= self.episode_len[0])
+        return self._obs(), reward, False, truncated, self._info()
+
+
+class FlatGridEnv(gym.Env):
+    """Single-agent view of GridTrafficEnv for SB3.
+
+    Observations are flattened to (R * C * 5,), the action is a MultiDiscrete
+    vector of per-junction switch requests and the reward is the mean
+    junction reward.
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(self, rows=4, cols=4, seed=0, **grid_kwargs):
+        self.grid = GridTrafficEnv(rows=rows, cols=cols, seed=seed, **grid_kwargs)
+        n = self.grid.n
+        self.observation_space = spaces.Box(low=0.0, high=1.0, shape=(n * 5,), dtype=np.float32)
+        self.action_space = spaces.MultiDiscrete([2] * n)
+
+    def reset(self, seed=None, options=None):
+        obs, info = self.grid.reset(seed=seed)
+        return obs.reshape(-1), info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.grid.step(action)
+        return obs.reshape(-1), float(reward.mean()), terminated, truncated, info
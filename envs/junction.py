@@ -0,0 +1,150 @@
+import numpy as np
+
+
+PARAM_DTYPES = {
+    "max_queue": np.int64,
+    "lambda_ns": np.float64,
+    "lambda_ew": np.float64,
+    "veh_throughput": np.int64,
+    "min_green": np.int64,
+    "yellow_dur": np.int64,
+    "episode_len": np.int64,
+    "decision_interval": np.int64,
+    "wait_w": np.float64,
+    "max_w": np.float64,
+    "switch_w": np.float64,
+    "served_w": np.float64,
+    "imbalance_w": np.float64,
+    "hold_w": np.float64,
+}
+
+
+class JunctionBatch:
+    """Signal state and dynamics of N junctions held as parallel arrays.
+
+    Parameters may be scalars or per-junction sequences of length N.
+    """
+
+    def __init__(
+        self,
+        n,
+        max_queue=20,
+        lambda_ns=0.7,
+        lambda_ew=0.7,
+        veh_throughput=2,
+        min_green=8,
+        yellow=3,
+        episode_len=1500,
+        decision_interval=1,
+        wait_w=1.0,
+        max_w=0.1,
+        switch_w=0.5,
+        served_w=0.05,
+        imbalance_w=0.0,
+        hold_w=0.0,
+    ):
+        self.n = n
+        params = {
+            "max_queue": max_queue,
+            "lambda_ns": lambda_ns,
+            "lambda_ew": lambda_ew,
+            "veh_throughput": veh_throughput,
+            "min_green": min_green,
+            "yellow_dur": yellow,
+            "episode_len": episode_len,
+            "decision_interval": np.maximum(1, decision_interval),
+            "wait_w": wait_w,
+            "max_w": max_w,
+            "switch_w": switch_w,
+            "served_w": served_w,
+            "imbalance_w": imbalance_w,
+            "hold_w": hold_w,
+        }
+        for name, value in params.items():
+            setattr(self, name, np.array(np.broadcast_to(value, (n,)), dtype=PARAM_DTYPES[name]))
+        self.q_ns = np.zeros(n, dtype=np.int64)
+        self.q_ew = np.zeros(n, dtype=np.int64)
+        self.phase = np.zeros(n, dtype=np.int64)
+        self.t_in_phase = np.zeros(n, dtype=np.int64)
+        self.yellow_left = np.zeros(n, dtype=np.int64)
+        self.pending_switch = np.zeros(n, dtype=bool)
+        self.action_timer = np.zeros(n, dtype=np.int64)
+        self.last_action = np.zeros(n, dtype=np.int64)
+        self.t = np.zeros(n, dtype=np.int64)
+        self.switches = np.zeros(n, dtype=np.int64)
+        self.total_reward = np.zeros(n, dtype=np.float64)
+        self.total_served_v = np.zeros(n, dtype=np.int64)
+        self.served_ns = np.zeros(n, dtype=np.int64)
+        self.served_ew = np.zeros(n, dtype=np.int64)
+        self.served = np.zeros(n, dtype=np.int64)
+
+    def _reset_state(self, indices):
+        self.q_ns[indices] = 0
+        self.q_ew[indices] = 0
+        self.t_in_phase[indices] = 0
+        self.yellow_left[indices] = 0
+        self.pending_switch[indices] = False
+        self.action_timer[indices] = 0
+        self.last_action[indices] = 0
+        self.t[indices] = 0
+        self.switches[indices] = 0
+        self.total_reward[indices] = 0.0
+        self.total_served_v[indices] = 0
+        self.served_ns[indices] = 0
+        self.served_ew[indices] = 0
+        self.served[indices] = 0
+
+    def _obs(self):
+        obs = np.empty((self.n, 5), dtype=np.float32)
+        obs[:, 0] = np.minimum(self.q_ns, self.max_queue) / self.max_queue
+        obs[:, 1] = np.minimum(self.q_ew, self.max_queue) / self.max_queue
+        obs[:, 2] = self.phase == 0
+        obs[:, 3] = self.phase != 0
+        obs[:, 4] = np.minimum(self.t_in_phase / np.maximum(1, self.min_green), 1.0)
+        return obs
+
+    def advance(self, actions, arrivals):
+        """Advance every junction one tick with the given (N, 2) arrivals.
+
+        Mirrors TrafficEnv.step without sampling, episode bookkeeping or resets
+        and returns the float64 reward array.
+        """
+        hold = self.action_timer > 0
+        act = np.where(hold, self.last_action, actions)
+        self.action_timer = np.where(hold, self.action_timer - 1, self.decision_interval - 1)
+        self.last_action = act
+        self.q_ns += arrivals[:, 0]
+        self.q_ew += arrivals[:, 1]
+        in_yellow = self.yellow_left > 0
+        green = ~in_yellow
+        can_switch = self.t_in_phase >= self.min_green
+        switched = green & can_switch & (self.pending_switch | (act == 1))
+        serving = green & ~switched
+        self.pending_switch = (self.pending_switch | (serving & (act == 1) & ~can_switch)) & ~switched
+        ns_green = serving & (self.phase == 0)
+        ew_green = serving & (self.phase != 0)
+        s_ns = np.where(ns_green, np.minimum(self.veh_throughput, self.q_ns), 0)
+        s_ew = np.where(ew_green, np.minimum(self.veh_throughput, self.q_ew), 0)
+        self.q_ns -= s_ns
+        self.q_ew -= s_ew
+        served = s_ns + s_ew
+        self.phase = np.where(switched, 1 - self.phase, self.phase)
+        self.yellow_left = np.where(in_yellow, self.yellow_left - 1, np.where(switched, self.yellow_dur, 0))
+        self.t_in_phase = np.where(serving, self.t_in_phase + 1, 0)
+        self.switches += switched
+        queue_sum = self.q_ns + self.q_ew
+        queue_max = np.maximum(self.q_ns, self.q_ew)
+        reward = self.served_w * served - (
+            self.wait_w * queue_sum
+            + self.max_w * queue_max
+            + self.switch_w * switched
+            + self.imbalance_w * np.abs(self.q_ns - self.q_ew)
+            + self.hold_w * np.maximum(0, self.t_in_phase - self.min_green)
+        )
+        self.served_ns = s_ns
+        self.served_ew = s_ew
+        self.served = served
+        self.total_reward += reward
+        self.total_served_v += served
+        self.t += 1
+        return reward
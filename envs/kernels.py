@@ -0,0 +1,136 @@
+import threading
+import numpy as np
+
+_compile_lock = threading.Lock()
+
+# Slots of the int64 state vector used by run_steps.
+(Q_NS, Q_EW, PHASE, T_IN_PHASE, YELLOW_LEFT, PENDING, ACTION_TIMER, LAST_ACTION,
+ T, SWITCHES, SERVED_TOTAL, SERVED) = range(12)
+STATE_SIZE = 12
+
+# Slots of the float64 parameter vector used by run_steps.
+(MAX_QUEUE, VEH_THROUGHPUT, MIN_GREEN, YELLOW, EPISODE_LEN, DECISION_INTERVAL,
+ WAIT_W, MAX_W, SWITCH_W, SERVED_W, IMBALANCE_W, HOLD_W) = range(12)
+PARAM_SIZE = 12
+
+
+def _run_steps(state, params, actions, arrivals, rewards, obs, total_reward):
+    """Advance one junction over ``actions`` with pre-drawn ``arrivals``.
+
+    Same state machine and reward as TrafficEnv.step. Updates ``state`` and
+    ``total_reward[0]`` in place, fills ``rewards[k]`` and ``obs[k]`` and
+    stops early at the end of the episode. Returns the number of steps taken.
+    """
+    max_queue = int(params[MAX_QUEUE])
+    throughput = int(params[VEH_THROUGHPUT])
+    min_green = int(params[MIN_GREEN])
+    yellow = int(params[YELLOW])
+    episode_len = int(params[EPISODE_LEN])
+    decision_interval = int(params[DECISION_INTERVAL])
+    wait_w = params[WAIT_W]
+    max_w = params[MAX_W]
+    switch_w = params[SWITCH_W]
+    served_w = params[SERVED_W]
+    imbalance_w = params[IMBALANCE_W]
+    hold_w = params[HOLD_W]
+    q_ns = state[Q_NS]
+    q_ew = state[Q_EW]
+    phase = state[PHASE]
+    t_in_phase = state[T_IN_PHASE]
+    yellow_left = state[YELLOW_LEFT]
+    pending = state[PENDING]
+    action_timer = state[ACTION_TIMER]
+    last_action = state[LAST_ACTION]
+    t = state[T]
+    switches = state[SWITCHES]
+    served_total = state[SERVED_TOTAL]
+    served = state[SERVED]
+    total = total_reward[0]
+    steps = 0
+    for k in range(actions.shape[0]):
+        if t >= episode_len:
+            break
+        a = actions[k]
+        if decision_interval <= 1:
+            last_action = a
+        elif action_timer > 0:
+            action_timer -= 1
+            a = last_action
+        else:
+            last_action = a
+            action_timer = decision_interval - 1
+        q_ns += arrivals[k, 0]
+        q_ew += arrivals[k, 1]
+        served = 0
+        switched = 0
+        if yellow_left > 0:
+            yellow_left -= 1
+            t_in_phase = 0
+        else:
+            can_switch = t_in_phase >= min_green
+            if can_switch and (pending != 0 or a == 1):
+                phase = 1 - phase
+                yellow_left = yellow
+                t_in_phase = 0
+                pending = 0
+                switched = 1
+                switches += 1
+            else:
+                if a == 1 and not can_switch:
+                    pending = 1
+                if phase == 0:
+                    served = min(throughput, q_ns)
+                    q_ns -= served
+                else:
+                    served = min(throughput, q_ew)
+                    q_ew -= served
+                t_in_phase += 1
+        reward = served_w * float(served) - (
+            wait_w * float(q_ns + q_ew)
+            + max_w * float(max(q_ns, q_ew))
+            + switch_w * float(switched)
+            + imbalance_w * float(abs(q_ns - q_ew))
+            + hold_w * float(max(0, t_in_phase - min_green))
+        )
+        total += reward
+        served_total += served
+        t += 1
+        rewards[k] = reward
+        obs[k, 0] = min(q_ns, max_queue) / max_queue
+        obs[k, 1] = min(q_ew, max_queue) / max_queue
+        obs[k, 2] = 1.0 if phase == 0 else 0.0
+        obs[k, 3] = 0.0 if phase == 0 else 1.0
+        obs[k, 4] = min(t_in_phase / max(1, min_green), 1.0)
+        steps += 1
+    state[Q_NS] = q_ns
+    state[Q_EW] = q_ew
+    state[PHASE] = phase
+    state[T_IN_PHASE] = t_in_phase
+    state[YELLOW_LEFT] = yellow_left
+    state[PENDING] = pending
+    state[ACTION_TIMER] = action_timer
+    state[LAST_ACTION] = last_action
+    state[T] = t
+    state[SWITCHES] = switches
+    state[SERVED_TOTAL] = served_total
+    state[SERVED] = served
+    total_reward[0] = total
+    return steps
+
+
+def __getattr__(name):
+    # numba takes most of a second to import, so it is only loaded (and the
+    # kernel compiled or read from its cache) the first time run_steps or
+    # HAVE_NUMBA is looked up. The result is stored as a module global, so
+    # later lookups never come back here.
+    if name not in ("run_steps", "HAVE_NUMBA"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _compile_lock:
+        if "run_steps" not in globals():
+            try:
+                from numba import njit
+            except ImportError:
+                globals().update(HAVE_NUMBA=False, run_steps=_run_steps)
+            else:
+                globals().update(HAVE_NUMBA=True, run_steps=njit(cache=True, nogil=True)(_run_steps))
+    return globals()[name]
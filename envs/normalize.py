@@ -0,0 +1,163 @@
+import os
+import numpy as np
+
+
+def norm_path(model_path):
+    """Statistics file saved next to a model: ``ppo.zip`` / ``ppo.npz`` -> ``ppo.norm.npz``."""
+    return os.path.splitext(model_path)[0] + ".norm.npz"
+
+
+class RunningMeanStd:
+    """Mean and variance over every row seen, merged one batch at a time.
+
+    Uses the parallel form of Welford's update (Chan et al.), so merging a
+    batch of N rows costs one mean and one variance over the batch.
+    """
+
+    def __init__(self, shape=()):
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.var = np.ones(shape, dtype=np.float64)
+        self.count = 0
+
+    def update(self, batch):
+        batch = np.asarray(batch, dtype=np.float64)
+        n = batch.shape[0]
+        if n == 0:
+            return
+        b_mean = batch.mean(axis=0)
+        b_var = batch.var(axis=0)
+        total = self.count + n
+        delta = b_mean - self.mean
+        m2 = self.var * self.count + b_var * n + delta ** 2 * (self.count * n / total)
+        self.mean = self.mean + delta * (n / total)
+        self.var = m2 / total
+        self.count = total
+
+
+class Normalizer:
+    """Running observation and return scaling for a vectorized env.
+
+    Called from inside a vec env's reset/step (BatchedTrafficEnv, ShmVecEnv)
+    or by train.wrappers.NormalizeVec for other backends. ``step`` merges the
+    batch of observations into the running statistics and standardizes it in
+    place, divides rewards by the running std of the discounted return (as
+    SB3's VecNormalize does) and, since it sees the raw rewards, writes
+    VecMonitor-style ``episode`` infos with the unscaled returns. NumPy only,
+    so the server loads saved statistics without torch.
+    """
+
+    def __init__(self, num_envs, obs_dim=5, gamma=0.99, obs=True, reward=True, clip_obs=10.0, clip_reward=10.0, epsilon=1e-8):
+        self.num_envs = num_envs
+        self.gamma = gamma
+        self.norm_obs = obs
+        self.norm_reward = reward
+        self.clip_obs = clip_obs
+        self.clip_reward = clip_reward
+        self.epsilon = epsilon
+        self.obs_rms = RunningMeanStd((obs_dim,))
+        self.ret_rms = RunningMeanStd(())
+        self.returns = np.zeros(num_envs, dtype=np.float64)
+        self.ep_return = np.zeros(num_envs, dtype=np.float64)
+        self.ep_len = np.zeros(num_envs, dtype=np.int64)
+        self._sync()
+
+    @classmethod
+    def make(cls, spec, num_envs, gamma=0.99, obs_dim=5):
+        """Build from ``True``, a config dict, or pass an existing Normalizer through."""
+        if not spec:
+            return None
+        if isinstance(spec, cls):
+            return spec
+        kwargs = dict(spec) if isinstance(spec, dict) else {}
+        kwargs.setdefault("gamma", gamma)
+        kwargs.setdefault("obs_dim", obs_dim)
+        return cls(num_envs, **kwargs)
+
+    def _sync(self):
+        self._mean = self.obs_rms.mean.astype(np.float32)
+        self._scale = (1.0 / np.sqrt(self.obs_rms.var + self.epsilon)).astype(np.float32)
+
+    def _standardize(self, obs):
+        obs -= self._mean
+        obs *= self._scale
+        np.clip(obs, -self.clip_obs, self.clip_obs, out=obs)
+        return obs
+
+    def normalize_obs(self, obs):
+        """Scaled copy of obs with the current statistics, which are left unchanged."""
+        if not self.norm_obs:
+            return np.asarray(obs, dtype=np.float32)
+        return self._standardize(np.array(obs, dtype=np.float32))
+
+    def reset(self, obs):
+        self.returns[:] = 0.0
+        self.ep_return[:] = 0.0
+        self.ep_len[:] = 0
+        if self.norm_obs:
+            self.obs_rms.update(obs)
+            self._sync()
+            self._standardize(obs)
+        return obs
+
+    def step(self, obs, rewards, dones, infos):
+        """Update and apply the statistics in place; returns ``(obs, rewards)``."""
+        if self.norm_obs:
+            self.obs_rms.update(obs)
+            self._sync()
+            self._standardize(obs)
+        raw = np.asarray(rewards, dtype=np.float64)
+        self.ep_return += raw
+        self.ep_len += 1
+        if self.norm_reward:
+            self.returns = self.returns * self.gamma + raw
+            self.ret_rms.update(self.returns)
+            rewards = np.clip(raw / np.sqrt(self.ret_rms.var + self.epsilon), -self.clip_reward, self.clip_reward).astype(np.float32)
+        for i in np.flatnonzero(dones):
+            infos[i]["episode"] = {"r": float(self.ep_return[i]), "l": int(self.ep_len[i])}
+            self.returns[i] = 0.0
+            self.ep_return[i] = 0.0
+            self.ep_len[i] = 0
+        return obs, rewards
+
+    def state_dict(self):
+        return {
+            "obs_mean": self.obs_rms.mean, "obs_var": self.obs_rms.var, "obs_count": self.obs_rms.count,
+            "ret_mean": self.ret_rms.mean, "ret_var": self.ret_rms.var, "ret_count": self.ret_rms.count,
+            "gamma": self.gamma, "norm_obs": self.norm_obs, "norm_reward": self.norm_reward,
+            "clip_obs": self.clip_obs, "clip_reward": self.clip_reward, "epsilon": self.epsilon,
+        }
+
+    def save(self, path):
+        np.savez(path, **self.state_dict())
+        return path
+
+    @classmethod
+    def load(cls, path, num_envs=1):
+        with np.load(path) as f:
+            s = {k: f[k] for k in f.files}
+        norm = cls(num_envs, obs_dim=len(s["obs_mean"]), gamma=float(s["gamma"]), obs=bool(s["norm_obs"]),
+                   reward=bool(s["norm_reward"]), clip_obs=float(s["clip_obs"]), clip_reward=float(s["clip_reward"]),
+                   epsilon=float(s["epsilon"]))
+        norm.obs_rms.mean, norm.obs_rms.var, norm.obs_rms.count = s["obs_mean"], s["obs_var"], int(s["obs_count"])
+        norm.ret_rms.mean, norm.ret_rms.var, norm.ret_rms.count = s["ret_mean"], s["ret_var"], int(s["ret_count"])
+        norm._sync()
+        return norm
+
+
+class NormalizedPolicy:
+    """A policy that scales observations with saved statistics before predicting."""
+
+    def __init__(self, policy, normalizer):
+        self.policy = policy
+        self.normalizer = normalizer
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        return self.policy.predict(self.normalizer.normalize_obs(obs), deterministic=deterministic)
+
+
+def with_normalizer(policy, model_path):
+    """Wrap policy in NormalizedPolicy when the model was saved with statistics."""
+    path = norm_path(model_path)
+    if not os.path.exists(path):
+        return policy
+    return NormalizedPolicy(policy, Normalizer.load(path))
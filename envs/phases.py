@@ -0,0 +1,105 @@
+import copy
+import numpy as np
+
+# Demand knobs of a signal env. Each movement's arrival rate is a fixed
+# combination of them, so the knobs stay the per-env parameters that
+# /set_params and domain randomization adjust.
+KNOBS = ("lambda_ns", "lambda_ew", "lambda_p_ns", "lambda_p_ew")
+
+PRESETS = {
+    # The TrafficEnv junction: one green per axis.
+    "two_phase": {
+        "movements": [
+            {"name": "ns", "demand": {"lambda_ns": 1.0}},
+            {"name": "ew", "demand": {"lambda_ew": 1.0}},
+        ],
+        "phases": [
+            {"name": "ns", "serves": ["ns"]},
+            {"name": "ew", "serves": ["ew"]},
+        ],
+    },
+    # Through movements with concurrent crosswalks, then protected lefts.
+    "protected_left_ped": {
+        "movements": [
+            {"name": "ns", "demand": {"lambda_ns": 0.8}},
+            {"name": "ns_left", "demand": {"lambda_ns": 0.2}, "saturation": 1},
+            {"name": "ew", "demand": {"lambda_ew": 0.8}},
+            {"name": "ew_left", "demand": {"lambda_ew": 0.2}, "saturation": 1},
+            {"name": "ped_ns", "demand": {"lambda_p_ns": 1.0}, "saturation": 10, "pedestrian": True},
+            {"name": "ped_ew", "demand": {"lambda_p_ew": 1.0}, "saturation": 10, "pedestrian": True},
+        ],
+        "phases": [
+            {"name": "ns", "serves": ["ns", "ped_ns"], "walk": 7},
+            {"name": "ns_left", "serves": ["ns_left"], "min_green": 4},
+            {"name": "ew", "serves": ["ew", "ped_ew"], "walk": 7},
+            {"name": "ew_left", "serves": ["ew_left"], "min_green": 4},
+        ],
+    },
+}
+
+
+class PhaseTable:
+    """A signal plan as arrays indexed by phase and movement.
+
+    ``green[p, m]`` says whether phase p serves movement m. Per phase,
+    ``min_green`` and ``clearance`` (yellow / all-red, or flashing don't-walk)
+    are in steps, with -1 meaning "the env's min_green / yellow", and
+    pedestrian movements are only served during the first ``walk`` steps of
+    the green (the rest is pedestrian clearance while vehicles keep moving).
+    ``saturation[m]`` is the movement's discharge per step (-1: the env's
+    veh_throughput) and ``demand[k, m]`` maps the KNOBS to arrival rates.
+    """
+
+    def __init__(self, movements, phases):
+        self.movements = [m["name"] for m in movements]
+        self.phases = [p["name"] for p in phases]
+        index = {name: i for i, name in enumerate(self.movements)}
+        m, p = len(self.movements), len(self.phases)
+        self.pedestrian = np.array([bool(mv.get("pedestrian", False)) for mv in movements], dtype=bool)
+        if self.pedestrian.all():
+            raise ValueError("a phase table needs at least one vehicle movement")
+        self.saturation = np.array([int(mv.get("saturation", -1)) for mv in movements], dtype=np.int64)
+        self.demand = np.zeros((len(KNOBS), m), dtype=np.float64)
+        for j, mv in enumerate(movements):
+            for knob, coef in mv.get("demand", {}).items():
+                if knob not in KNOBS:
+                    raise ValueError(f"movement {mv['name']}: unknown demand knob '{knob}'")
+                self.demand[KNOBS.index(knob), j] = coef
+        self.green = np.zeros((p, m), dtype=bool)
+        for i, ph in enumerate(phases):
+            for name in ph["serves"]:
+                if name not in index:
+                    raise ValueError(f"phase {ph['name']}: unknown movement '{name}'")
+                self.green[i, index[name]] = True
+        self.min_green = np.array([int(ph.get("min_green", -1)) for ph in phases], dtype=np.int64)
+        self.clearance = np.array([int(ph.get("clearance", -1)) for ph in phases], dtype=np.int64)
+        # No walk limit: pedestrians cross for the whole green.
+        self.walk = np.array([int(ph.get("walk", np.iinfo(np.int32).max)) for ph in phases], dtype=np.int64)
+        self.vehicle_idx = np.flatnonzero(~self.pedestrian)
+        self.ped_idx = np.flatnonzero(self.pedestrian)
+        # Vehicle movements fed by each axis, for q_ns/q_ew style summaries.
+        self.ns_idx = np.flatnonzero(~self.pedestrian & (self.demand[KNOBS.index("lambda_ns")] > 0))
+        self.ew_idx = np.flatnonzero(~self.pedestrian & (self.demand[KNOBS.index("lambda_ew")] > 0))
+
+    @property
+    def n_movements(self):
+        return len(self.movements)
+
+    @property
+    def n_phases(self):
+        return len(self.phases)
+
+
+def make_phase_table(spec="two_phase"):
+    """PhaseTable from a preset name, ``{"preset": name, ...overrides}`` or a full table dict."""
+    if isinstance(spec, PhaseTable):
+        return spec
+    if isinstance(spec, str):
+        spec = {"preset": spec}
+    spec = copy.deepcopy(dict(spec))
+    preset = spec.pop("preset", None)
+    if preset is not None:
+        if preset not in PRESETS:
+            raise ValueError(f"unknown phase table preset '{preset}' (known: {', '.join(PRESETS)})")
+        spec = {**copy.deepcopy(PRESETS[preset]), **spec}
+    return PhaseTable(spec["movements"], spec["phases"])
@@ -0,0 +1,88 @@
+import time
+import numpy as np
+from envs.junction import JunctionBatch
+
+# Per-junction state copied from a TrafficEnv-like object into the batch.
+STATE = ("q_ns", "q_ew", "phase", "t_in_phase", "yellow_left", "pending_switch", "action_timer", "last_action", "t", "switches")
+PARAMS = ("max_queue", "veh_throughput", "min_green", "yellow_dur", "episode_len", "decision_interval",
+          "wait_w", "max_w", "switch_w", "served_w", "imbalance_w", "hold_w")
+
+
+class MPCPlanner:
+    """Rollout controller: simulate candidate plans over sampled futures, pick the best.
+
+    Candidates are "hold, then request a switch at step k" for k in
+    ``0, stride, 2*stride, ...`` below the horizon, plus "never switch". Each
+    is rolled out ``horizon`` steps on ``samples`` sampled arrival futures
+    with the env's own dynamics and reward weights, all candidates x samples
+    as one JunctionBatch. Candidates share the same futures, so they are
+    compared on common random numbers. The first action of the plan with the
+    best mean return is taken.
+
+    The sample count adapts to keep a decision within ``budget_ms``, from a
+    running estimate of the cost per simulated junction-step.
+    """
+
+    def __init__(self, horizon=30, stride=3, samples=16, min_samples=2, max_samples=256, budget_ms=5.0, seed=0):
+        self.horizon = horizon
+        self.stride = max(1, stride)
+        self.samples = samples
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.budget_ms = budget_ms
+        self.rng = np.random.default_rng(seed)
+        self.switch_at = list(range(0, horizon, self.stride)) + [horizon]
+        self.plans = np.zeros((len(self.switch_at), horizon), dtype=np.int64)
+        for c, k in enumerate(self.switch_at):
+            if k < horizon:
+                self.plans[c, k] = 1
+        self._ns_per_step = None
+        self.last_ms = 0.0
+
+    def _rates(self, env, h):
+        demand = getattr(env, "demand", None)
+        if demand is not None and hasattr(demand, "rates"):
+            return demand.rates(int(env._demand_offset), int(env.t), h)
+        # Stationary Poisson, and recorded traces (whose future is not known).
+        return np.broadcast_to(np.array([env.lambda_ns, env.lambda_ew], dtype=np.float64), (h, 2))
+
+    def _batch(self, env, n):
+        batch = JunctionBatch(n, **{("yellow" if k == "yellow_dur" else k): getattr(env, k) for k in PARAMS})
+        for k in STATE:
+            getattr(batch, k)[:] = getattr(env, k)
+        return batch
+
+    def plan(self, env):
+        """Mean return of every candidate plan from the env's current state."""
+        t0 = time.perf_counter_ns()
+        h = int(min(self.horizon, max(1, env.episode_len - env.t)))
+        c = len(self.plans)
+        s = int(self.samples)
+        batch = self._batch(env, c * s)
+        rates = self._rates(env, h)
+        returns = np.zeros(c * s, dtype=np.float64)
+        for k in range(h):
+            # One future per sample, shared by every candidate.
+            arrivals = np.tile(self.rng.poisson(rates[k], size=(s, 2)), (c, 1))
+            returns += batch.advance(np.repeat(self.plans[:, k], s), arrivals)
+        elapsed = time.perf_counter_ns() - t0
+        self._adapt(elapsed, c * s * h)
+        return returns.reshape(c, s).mean(axis=1)
+
+    def _adapt(self, elapsed_ns, junction_steps):
+        self.last_ms = elapsed_ns / 1e6
+        per_step = elapsed_ns / max(1, junction_steps)
+        if self._ns_per_step is None:
+            self._ns_per_step = per_step
+        else:
+            self._ns_per_step = 0.8 * self._ns_per_step + 0.2 * per_step
+        affordable = self.budget_ms * 1e6 / (self._ns_per_step * len(self.plans) * self.horizon)
+        self.samples = int(np.clip(affordable, self.min_samples, self.max_samples))
+
+    def act(self, env):
+        if getattr(env, "yellow_left", 0) > 0:
+            return 0
+        if env.action_timer > 0:
+            # Held by decision_interval; the env ignores the action anyway.
+            return int(env.last_action)
+        return int(self.plans[int(np.argmax(self.plan(env))), 0])
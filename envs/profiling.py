@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+import numpy as np
+
+# Set NEUROLIGHT_PROFILE=1 to time env step phases and server request stages.
+# When unset, TrafficEnv keeps its plain step method and span() returns a
+# shared no-op context manager.
+ENABLED = os.environ.get("NEUROLIGHT_PROFILE", "") not in ("", "0")
+
+# Power-of-two nanosecond buckets: bucket k counts durations in [2^k, 2^(k+1)).
+N_BUCKETS = 40
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def record(name, ns):
+    with _lock:
+        s = _stats.get(name)
+        if s is None:
+            s = _stats[name] = [0, 0, 0, np.zeros(N_BUCKETS, dtype=np.int64)]
+        s[0] += 1
+        s[1] += ns
+        s[2] = max(s[2], ns)
+        s[3][min(N_BUCKETS - 1, max(0, int(ns).bit_length() - 1))] += 1
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter_ns() - self.t0)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def span(name):
+    """Context manager timing its block under name when profiling is enabled."""
+    return _Span(name) if ENABLED else _NULL
+
+
+def _bucket_quantile(buckets, count, q):
+    rank = max(1, int(np.ceil(q * count)))
+    k = int(np.searchsorted(np.cumsum(buckets), rank))
+    # Report the bucket's upper edge.
+    return float(2 ** (k + 1)) / 1000.0
+
+
+def snapshot(reset=False):
+    """Per-name count, total, mean, max and bucketed p50/p99, in microseconds."""
+    with _lock:
+        items = [(name, s[0], s[1], s[2], s[3].copy()) for name, s in _stats.items()]
+        if reset:
+            _stats.clear()
+    out = {}
+    for name, count, total, peak, buckets in sorted(items):
+        out[name] = {
+            "count": count,
+            "total_ms": total / 1e6,
+            "mean_us": total / count / 1000.0,
+            "max_us": peak / 1000.0,
+            "p50_us": _bucket_quantile(buckets, count, 0.5),
+            "p99_us": _bucket_quantile(buckets, count, 0.99),
+        }
+    return out
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(fn, interval=0.001):
+    """Run fn() while sampling its thread's Python stack every interval seconds.
+
+    Returns ``(result, Counter)`` mapping folded stacks (``outer;...;inner``)
+    to sample counts, the input format of flamegraph.pl and speedscope.
+    """
+    samples = Counter()
+    target = threading.get_ident()
+    done = threading.Event()
+
+    def sampler():
+        while not done.wait(interval):
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                samples[_fold(frame)] += 1
+
+    thread = threading.Thread(target=sampler, name="stack-sampler", daemon=True)
+    thread.start()
+    try:
+        result = fn()
+    finally:
+        done.set()
+        thread.join()
+    return result, samples
+
+
+def folded(samples):
+    return "".join(f"{stack} {n}\n" for stack, n in samples.most_common())
@@ -0,0 +1,304 @@
+import os
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def vec_schema(obs_dim=5):
+    """Columns every vec env recording has: one row per env step with the
+    observation after the step (the terminal one at an episode's end), the
+    action that led to it and its raw reward. ``t`` counts from 1."""
+    return {
+        "env": (np.int32, ()),
+        "episode": (np.int32, ()),
+        "t": (np.int32, ()),
+        "obs": (np.float32, (obs_dim,)),
+        "action": (np.int16, ()),
+        "reward": (np.float32, ()),
+    }
+
+
+# TrafficEnv / BatchedTrafficEnv rows add the junction state after the step,
+# as the server's telemetry columns name it.
+TRAFFIC_SCHEMA = {
+    **vec_schema(5),
+    "q_ns": (np.int32, ()),
+    "q_ew": (np.int32, ()),
+    "phase": (np.int8, ()),
+    "served": (np.int32, ()),
+}
+
+
+def _schema_json(schema):
+    return {name: {"dtype": np.dtype(dtype).str, "shape": list(shape)} for name, (dtype, shape) in schema.items()}
+
+
+class EpisodeRecorder:
+    """Columnar step log written in chunks of ``chunk_rows`` rows.
+
+    ``append`` copies a block of rows (one per env for a batched step) into
+    preallocated typed column buffers; a full chunk is handed to a writer
+    thread and recording continues into fresh buffers. Chunks are written as
+    ``chunk_NNNNN.npz`` (zlib-compressed, one array per column) or, with
+    ``compress=False``, as a ``chunk_NNNNN/`` directory of ``.npy`` files that
+    Replay memory-maps. ``index.json`` is rewritten after every chunk with the
+    chunk list and per-episode step counts, returns and chunk numbers, so a
+    recording can be read while it is still being written.
+
+    The schema must contain ``env``, ``episode`` and ``reward`` columns.
+    """
+
+    def __init__(self, path, schema=TRAFFIC_SCHEMA, chunk_rows=1 << 16, compress=True, meta=None):
+        for name in ("env", "episode", "reward"):
+            if name not in schema:
+                raise ValueError(f"recorder schema needs a '{name}' column")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.schema = {name: (np.dtype(dtype), tuple(shape)) for name, (dtype, shape) in schema.items()}
+        self.chunk_rows = int(chunk_rows)
+        self.compress = compress
+        self.meta = meta or {}
+        self.rows = 0
+        self._fill = 0
+        self._buf = self._alloc()
+        self._chunks = []
+        self._submitted = 0
+        self._episodes = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._pending = []
+        self.closed = False
+
+    def _alloc(self):
+        return {name: np.empty((self.chunk_rows,) + shape, dtype=dtype) for name, (dtype, shape) in self.schema.items()}
+
+    def append(self, **columns):
+        """Add rows; every schema column must be given, all with the same length (scalars for one row)."""
+        first = columns["reward"]
+        k = 1 if np.ndim(first) == 0 else len(first)
+        done = 0
+        while done < k:
+            take = min(k - done, self.chunk_rows - self._fill)
+            sl = slice(self._fill, self._fill + take)
+            for name, buf in self._buf.items():
+                value = columns[name]
+                if np.ndim(value) == len(self.schema[name][1]):
+                    buf[sl] = value
+                else:
+                    buf[sl] = value[done:done + take]
+            self._fill += take
+            done += take
+            if self._fill == self.chunk_rows:
+                self._flush()
+        self.rows += k
+
+    def _flush(self):
+        if self._fill == 0:
+            return
+        n = self._fill
+        data = {name: buf[:n] for name, buf in self._buf.items()}
+        number = self._submitted
+        self._submitted += 1
+        # Surface write errors, and block rather than queue more than two
+        # chunks when the writer falls behind.
+        while self._pending and (self._pending[0].done() or len(self._pending) >= 2):
+            self._pending.pop(0).result()
+        self._pending.append(self._writer.submit(self._write_chunk, number, data))
+        self._buf = self._alloc()
+        self._fill = 0
+
+    def _write_chunk(self, number, data):
+        name = f"chunk_{number:05d}"
+        if self.compress:
+            np.savez_compressed(os.path.join(self.path, name + ".npz"), **data)
+            name += ".npz"
+        else:
+            os.makedirs(os.path.join(self.path, name), exist_ok=True)
+            for col, arr in data.items():
+                np.save(os.path.join(self.path, name, col + ".npy"), arr)
+        # Per-episode step counts and returns within this chunk.
+        env = data["env"].astype(np.int64)
+        episode = data["episode"].astype(np.int64)
+        keys = (env << 32) | (episode & 0xFFFFFFFF)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        steps = np.bincount(inverse)
+        returns = np.bincount(inverse, weights=data["reward"].astype(np.float64))
+        with self._lock:
+            for key, s, r in zip(uniq.tolist(), steps.tolist(), returns.tolist()):
+                e = self._episodes.setdefault(key, {"env": key >> 32, "episode": key & 0xFFFFFFFF, "steps": 0, "return": 0.0, "chunks": []})
+                e["steps"] += s
+                e["return"] += r
+                e["chunks"].append(number)
+            self._chunks.append({"file": name, "rows": len(env)})
+            self._chunks.sort(key=lambda c: c["file"])
+            self._write_index()
+
+    def _write_index(self):
+        index = {
+            "version": FORMAT_VERSION,
+            "columns": _schema_json(self.schema),
+            "chunks": self._chunks,
+            "rows": sum(c["rows"] for c in self._chunks),
+            "episodes": sorted(self._episodes.values(), key=lambda e: (e["env"], e["episode"])),
+            "meta": self.meta,
+        }
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+
+    def flush(self):
+        """Write the partial chunk and wait for all pending writes."""
+        self._flush()
+        for fut in self._pending:
+            fut.result()
+        self._pending = []
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self._writer.shutdown()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class VecRecorder:
+    """Feeds every step of a vec env to an EpisodeRecorder.
+
+    Keeps the per-env episode numbers and step counts, so a batched env only
+    hands over its arrays: ``step`` appends one row per env as a single block.
+    BatchedTrafficEnv, BatchedSignalEnv and ShmVecEnv call it before their
+    normalization stage, so recordings hold raw observations and rewards.
+    """
+
+    def __init__(self, recorder, num_envs):
+        self.recorder = recorder
+        self.num_envs = num_envs
+        self._idx = np.arange(num_envs, dtype=np.int32)
+        self.episodes = np.zeros(num_envs, dtype=np.int32)
+        self.t = np.zeros(num_envs, dtype=np.int32)
+
+    @classmethod
+    def make(cls, spec, num_envs, schema):
+        """Build from a directory, ``{"path": ..., **EpisodeRecorder kwargs}`` or an EpisodeRecorder."""
+        if not spec:
+            return None
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, EpisodeRecorder):
+            return cls(spec, num_envs)
+        kwargs = dict(spec) if isinstance(spec, dict) else {"path": spec}
+        kwargs.setdefault("schema", schema)
+        return cls(EpisodeRecorder(**kwargs), num_envs)
+
+    def reset(self):
+        # A reset mid-episode starts a new episode number.
+        self.episodes += self.t > 0
+        self.t[:] = 0
+
+    def step(self, obs, actions, rewards, dones, **state):
+        self.t += 1
+        self.recorder.append(env=self._idx, episode=self.episodes, t=self.t, obs=obs, action=actions, reward=rewards, **state)
+        done_idx = np.flatnonzero(dones)
+        self.episodes[done_idx] += 1
+        self.t[done_idx] = 0
+
+    def close(self):
+        self.recorder.close()
+
+
+class Replay:
+    """Reader for an EpisodeRecorder directory.
+
+    Uncompressed chunks are memory-mapped; compressed ones are decompressed
+    when first touched and the most recent one is kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reload()
+
+    def reload(self):
+        """Re-read index.json, picking up chunks written since."""
+        with open(os.path.join(self.path, "index.json"), "r") as f:
+            self.index = json.load(f)
+        self.columns = list(self.index["columns"])
+        self._cached = (None, None)
+
+    def __len__(self):
+        return self.index["rows"]
+
+    @property
+    def n_chunks(self):
+        return len(self.index["chunks"])
+
+    def chunk(self, k):
+        """Columns of chunk k as a dict of arrays."""
+        if self._cached[0] == k:
+            return self._cached[1]
+        name = self.index["chunks"][k]["file"]
+        full = os.path.join(self.path, name)
+        if name.endswith(".npz"):
+            with np.load(full) as f:
+                data = {col: f[col] for col in self.columns}
+        else:
+            data = {col: np.load(os.path.join(full, col + ".npy"), mmap_mode="r") for col in self.columns}
+        self._cached = (k, data)
+        return data
+
+    def column(self, name):
+        return np.concatenate([self.chunk(k)[name] for k in range(self.n_chunks)]) if self.n_chunks else np.zeros(0)
+
+    def episodes(self):
+        return self.index["episodes"]
+
+    def episode(self, env, episode):
+        """All rows of one episode, in step order."""
+        entry = next((e for e in self.index["episodes"] if e["env"] == env and e["episode"] == episode), None)
+        if entry is None:
+            raise KeyError(f"no episode {episode} for env {env}")
+        parts = []
+        for k in entry["chunks"]:
+            data = self.chunk(k)
+            mask = (data["env"] == env) & (data["episode"] == episode)
+            parts.append({col: np.asarray(arr[mask]) for col, arr in data.items()})
+        out = {col: np.concatenate([p[col] for p in parts]) for col in self.columns}
+        if "t" in out:
+            order = np.argsort(out["t"], kind="stable")
+            out = {col: arr[order] for col, arr in out.items()}
+        return out
+
+    def since(self, env, episode, seq=0, limit=None):
+        """Episode rows from seq on as ``{"from", "next", "columns"}`` lists, as /metrics/history serves them."""
+        rows = self.episode(env, episode)
+        n = len(rows["reward"])
+        start = max(0, int(seq))
+        stop = n if limit is None else min(n, start + int(limit))
+        return {"from": start, "next": stop, "columns": {col: arr[start:stop].tolist() for col, arr in rows.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize an episode recording")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=10, help="Episodes to list")
+    args = parser.parse_args()
+    replay = Replay(args.path)
+    eps = replay.episodes()
+    print(f"{len(replay)} rows in {replay.n_chunks} chunks, {len(eps)} episodes, columns: {', '.join(replay.columns)}")
+    for e in eps[:args.top]:
+        print(f"env {e['env']:>4} episode {e['episode']:>5}: {e['steps']:>6} steps, return {e['return']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+from envs.batched_env import PARAM_DTYPES, BatchedTrafficEnv
+from envs.normalize import Normalizer
+from envs.recorder import VecRecorder, vec_schema
+
+CMD_STEP = 1
+CMD_CONTROL = 2
+CMD_CLOSE = 3
+
+# Per-worker status slot, read by the parent after every step.
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_EXITED = 2
+
+
+def _layout(n, num_workers):
+    """Byte offsets of the shared arrays for n envs and num_workers workers."""
+    fields = [
+        ("obs", np.float32, (n, 5)),
+        ("terminal_obs", np.float32, (n, 5)),
+        ("rewards", np.float32, (n,)),
+        ("dones", np.bool_, (n,)),
+        ("actions", np.int64, (n,)),
+        ("cmd", np.int64, (num_workers,)),
+        ("status", np.int64, (num_workers,)),
+    ]
+    out = {}
+    offset = 0
+    for name, dtype, shape in fields:
+        offset = (offset + 7) // 8 * 8
+        out[name] = (offset, dtype, shape)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return out, offset
+
+
+def _views(buf, layout):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        for name, (offset, dtype, shape) in layout.items()
+    }
+
+
+def _worker(w, lo, hi, shm_name, n, num_workers, seed, env_kwargs, conn, go, ready):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    layout, _ = _layout(n, num_workers)
+    v = _views(shm.buf, layout)
+    env = BatchedTrafficEnv(hi - lo, seeds=[seed + i for i in range(lo, hi)], **env_kwargs)
+    try:
+        while True:
+            go.acquire()
+            cmd = v["cmd"][w]
+            if cmd == CMD_STEP:
+                try:
+                    env.step_async(v["actions"][lo:hi])
+                    obs, rewards, dones, infos = env.step_wait()
+                    v["obs"][lo:hi] = obs
+                    v["rewards"][lo:hi] = rewards
+                    v["dones"][lo:hi] = dones
+                    for i in np.flatnonzero(dones):
+                        v["terminal_obs"][lo + i] = infos[i]["terminal_observation"]
+                except Exception:
+                    # The parent raises this instead of reading the slice.
+                    v["status"][w] = STATUS_ERROR
+                    conn.send(traceback.format_exc())
+            elif cmd == CMD_CONTROL:
+                method, args, kwargs = conn.recv()
+                try:
+                    if method == "reset":
+                        env._seeds = list(args[0])
+                        result = env.reset()
+                        v["obs"][lo:hi] = result
+                        result = None
+                    else:
+                        result = getattr(env, method)(*args, **kwargs)
+                    conn.send((True, result))
+                except Exception as e:
+                    conn.send((False, e))
+            elif cmd == CMD_CLOSE:
+                break
+            ready.release()
+    finally:
+        v["status"][w] = STATUS_EXITED
+        del v
+        shm.close()
+        ready.release()
+
+
+class ShmVecEnv(VecEnv):
+    """BatchedTrafficEnv slices in worker processes sharing one memory block.
+
+    Observations, rewards, dones, actions and terminal observations live in a
+    multiprocessing.shared_memory block; each step is one semaphore release
+    and acquire per worker, with no pickling. Infos are rebuilt in the parent
+    and only carry data for finished episodes. Rare operations (reset seeds,
+    get/set_attr, env_method) go over a pipe. A worker that fails to step
+    reports it in its status slot and sends the traceback; ``step_wait``
+    raises it as a RuntimeError rather than returning that slice's stale
+    arrays.
+
+    With ``normalize`` the parent applies one Normalizer to the whole shared
+    block after each step, so the running statistics cover every worker's
+    envs without any merging between processes. ``record`` logs the raw
+    steps from the parent in the same way (observation, action and reward
+    columns only).
+    """
+
+    metadata = {"render_modes": []}
+    render_mode = None
+    PARAM_DTYPES = PARAM_DTYPES
+
+    def __init__(self, num_envs, num_workers=None, seed=0, start_method=None, normalize=None, gamma=0.99, record=None, **env_kwargs):
+        num_workers = max(1, min(num_envs, num_workers or mp.cpu_count()))
+        observation_space = spaces.Box(low=0.0, high=1.0, shape=(5,), dtype=np.float32)
+        action_space = spaces.Discrete(2)
+        super().__init__(num_envs, observation_space, action_space)
+        ctx = mp.get_context(start_method or "forkserver")
+        layout, size = _layout(num_envs, num_workers)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._v = _views(self._shm.buf, layout)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self._slices = [(int(bounds[w]), int(bounds[w + 1])) for w in range(num_workers)]
+        self._go = [ctx.Semaphore(0) for _ in range(num_workers)]
+        self._ready = [ctx.Semaphore(0) for _ in range(num_workers)]
+        self._conns = []
+        self._procs = []
+        for w, (lo, hi) in enumerate(self._slices):
+            parent, child = ctx.Pipe()
+            p = ctx.Process(
+                target=_worker,
+                args=(w, lo, hi, self._shm.name, num_envs, num_workers, seed, env_kwargs, child, self._go[w], self._ready[w]),
+                daemon=True,
+            )
+            p.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(p)
+        self.normalizer = Normalizer.make(normalize, num_envs, gamma)
+        self.recorder = VecRecorder.make(record, num_envs, vec_schema(5))
+        self.closed = False
+
+    def _signal(self, cmd, workers):
+        for w in workers:
+            self._v["cmd"][w] = cmd
+            self._go[w].release()
+
+    def _wait(self, workers):
+        for w in workers:
+            while not self._ready[w].acquire(timeout=1.0):
+                if not self._procs[w].is_alive():
+                    raise RuntimeError(f"ShmVecEnv worker {w} exited (exit code {self._procs[w].exitcode})")
+
+    def _check(self, workers):
+        errors = []
+        for w in workers:
+            status = self._v["status"][w]
+            if status == STATUS_ERROR:
+                self._v["status"][w] = STATUS_OK
+                errors.append(f"worker {w}:\n{self._conns[w].recv()}")
+            elif status == STATUS_EXITED:
+                errors.append(f"worker {w} exited")
+        if errors:
+            raise RuntimeError("ShmVecEnv step failed in " + "\n".join(errors))
+
+    def _control(self, w, method, *args, **kwargs):
+        self._v["cmd"][w] = CMD_CONTROL
+        self._conns[w].send((method, args, kwargs))
+        self._go[w].release()
+        ok, result = self._conns[w].recv()
+        self._ready[w].acquire()
+        if not ok:
+            raise result
+        return result
+
+    def reset(self):
+        for w, (lo, hi) in enumerate(self._slices):
+            self._control(w, "reset", self._seeds[lo:hi])
+        self._reset_seeds()
+        self._reset_options()
+        obs = self._v["obs"].copy()
+        if self.recorder is not None:
+            self.recorder.reset()
+        if self.normalizer is not None:
+            self.normalizer.reset(obs)
+        return obs
+
+    def step_async(self, actions):
+        self._v["actions"][:] = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+        self._signal(CMD_STEP, range(len(self._slices)))
+
+    def step_wait(self):
+        workers = range(len(self._slices))
+        self._wait(workers)
+        self._check(workers)
+        dones = self._v["dones"].copy()
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["TimeLimit.truncated"] = True
+            infos[i]["terminal_observation"] = self._v["terminal_obs"][i].copy()
+        obs, rewards = self._v["obs"].copy(), self._v["rewards"].copy()
+        if self.recorder is not None:
+            last = np.where(dones[:, None], self._v["terminal_obs"], obs)
+            self.recorder.step(last, self._v["actions"], rewards, dones)
+        if self.normalizer is not None:
+            obs, rewards = self.normalizer.step(obs, rewards, dones, infos)
+            for i in np.flatnonzero(dones):
+                infos[i]["terminal_observation"] = self.normalizer.normalize_obs(infos[i]["terminal_observation"])
+        return obs, rewards, dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        if self.recorder is not None:
+            self.recorder.close()
+        self._signal(CMD_CLOSE, range(len(self._slices)))
+        for p in self._procs:
+            p.join(timeout=5)
+        for c in self._conns:
+            c.close()
+        del self._v
+        self._shm.close()
+        self._shm.unlink()
+        self.closed = True
+
+    def _owners(self, indices):
+        """Yield ``(worker, positions in indices, local indices)`` per owning worker."""
+        indices = np.array(list(self._get_indices(indices)), dtype=np.int64)
+        for w, (lo, hi) in enumerate(self._slices):
+            pos = np.flatnonzero((indices >= lo) & (indices < hi))
+            if pos.size:
+                yield w, pos, indices[pos] - lo
+
+    def _gather(self, indices, method, *args, **kwargs):
+        """Run a per-env call on the owning workers; results follow ``indices``."""
+        owners = list(self._owners(indices))
+        results = [None] * sum(len(pos) for _, pos, _ in owners)
+        for w, pos, local in owners:
+            for p, value in zip(pos, self._control(w, method, *args, indices=local, **kwargs)):
+                results[p] = value
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        if attr_name in ("render_mode", "PARAM_DTYPES"):
+            return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+        return self._gather(indices, "get_attr", attr_name)
+
+    def set_attr(self, attr_name, value, indices=None):
+        # Per-env parameters accept one value per index, as set_params does;
+        # those are split by owner, anything else goes to every worker as is.
+        owners = list(self._owners(indices))
+        n = sum(len(pos) for _, pos, _ in owners)
+        split = attr_name in self.PARAM_DTYPES and np.ndim(value) > 0 and len(value) == n
+        for w, pos, local in owners:
+            self._control(w, "set_attr", attr_name, np.asarray(value)[pos] if split else value, local)
+
+    def set_params(self, indices, params):
+        for w, pos, local in self._owners(indices):
+            self._control(w, "set_params", local, {k: np.asarray(v)[pos] for k, v in params.items()})
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        # Checked here so an unknown name fails before any worker runs it.
+        if not callable(getattr(BatchedTrafficEnv, f"_env_{method_name}", None)):
+            raise AttributeError(f"ShmVecEnv has no per-env method '{method_name}'")
+        return self._gather(indices, "env_method", method_name, *method_args, **method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
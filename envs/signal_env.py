@@ -0,0 +1,291 @@
+import numpy as np
+import gymnasium as gym
+from envs.batched_env import PARAM_DTYPES, BatchVecEnv
+from envs.phases import KNOBS, make_phase_table
+from envs.recorder import vec_schema
+
+SIGNAL_PARAM_DTYPES = {
+    **PARAM_DTYPES,
+    "lambda_p_ns": np.float64,
+    "lambda_p_ew": np.float64,
+    "ped_w": np.float64,
+}
+
+
+class SignalBatch:
+    """N junctions running a table-driven signal plan, as parallel arrays.
+
+    The action is the phase each junction should run; asking for the current
+    phase holds it. A change is granted once the phase has run its min_green
+    (earlier requests are remembered, the latest one winning), then the old
+    phase's clearance interval passes with nothing served. Every per-phase
+    quantity is looked up from the PhaseTable by the phase array, so the step
+    has the same array operations however many phases or movements the table
+    has. With the ``two_phase`` table this is JunctionBatch, with action
+    "switch" spelled as "the other phase".
+
+    Reward: ``served_w`` per vehicle served, minus ``wait_w`` per queued
+    vehicle, ``ped_w`` per waiting pedestrian, ``max_w`` times the longest
+    vehicle queue, ``switch_w`` per phase change, ``imbalance_w`` times the
+    spread of vehicle queues and ``hold_w`` per step past min_green.
+    """
+
+    def __init__(
+        self,
+        n,
+        table="two_phase",
+        max_queue=20,
+        lambda_ns=0.7,
+        lambda_ew=0.7,
+        lambda_p_ns=0.1,
+        lambda_p_ew=0.1,
+        veh_throughput=2,
+        min_green=8,
+        yellow=3,
+        episode_len=1500,
+        decision_interval=1,
+        wait_w=1.0,
+        max_w=0.1,
+        switch_w=0.5,
+        served_w=0.05,
+        imbalance_w=0.0,
+        hold_w=0.0,
+        ped_w=0.5,
+    ):
+        self.n = n
+        self.table = make_phase_table(table)
+        params = {
+            "max_queue": max_queue,
+            "lambda_ns": lambda_ns,
+            "lambda_ew": lambda_ew,
+            "lambda_p_ns": lambda_p_ns,
+            "lambda_p_ew": lambda_p_ew,
+            "veh_throughput": veh_throughput,
+            "min_green": min_green,
+            "yellow_dur": yellow,
+            "episode_len": episode_len,
+            "decision_interval": np.maximum(1, decision_interval),
+            "wait_w": wait_w,
+            "max_w": max_w,
+            "switch_w": switch_w,
+            "served_w": served_w,
+            "imbalance_w": imbalance_w,
+            "hold_w": hold_w,
+            "ped_w": ped_w,
+        }
+        for name, value in params.items():
+            setattr(self, name, np.array(np.broadcast_to(value, (n,)), dtype=SIGNAL_PARAM_DTYPES[name]))
+        m = self.table.n_movements
+        self.queues = np.zeros((n, m), dtype=np.int64)
+        self.served = np.zeros((n, m), dtype=np.int64)
+        self.phase = np.zeros(n, dtype=np.int64)
+        self.t_in_phase = np.zeros(n, dtype=np.int64)
+        self.clear_left = np.zeros(n, dtype=np.int64)
+        self.pending = np.full(n, -1, dtype=np.int64)
+        self.action_timer = np.zeros(n, dtype=np.int64)
+        self.last_action = np.zeros(n, dtype=np.int64)
+        self.t = np.zeros(n, dtype=np.int64)
+        self.switches = np.zeros(n, dtype=np.int64)
+        self.total_reward = np.zeros(n, dtype=np.float64)
+        self.total_served_v = np.zeros(n, dtype=np.int64)
+        self.total_served_p = np.zeros(n, dtype=np.int64)
+        self._rows = np.arange(n)
+
+    @property
+    def obs_dim(self):
+        return self.table.n_movements + self.table.n_phases + 1
+
+    def rates(self, indices=slice(None)):
+        """Per-movement arrival rates ``(len(indices), M)`` from the demand knobs."""
+        knobs = np.stack([getattr(self, k)[indices] for k in KNOBS], axis=-1)
+        return knobs @ self.table.demand
+
+    def _phase_min_green(self):
+        mg = self.table.min_green[self.phase]
+        return np.where(mg < 0, self.min_green, mg)
+
+    def _reset_state(self, indices):
+        self.queues[indices] = 0
+        self.served[indices] = 0
+        self.t_in_phase[indices] = 0
+        self.clear_left[indices] = 0
+        self.pending[indices] = -1
+        self.action_timer[indices] = 0
+        self.last_action[indices] = 0
+        self.t[indices] = 0
+        self.switches[indices] = 0
+        self.total_reward[indices] = 0.0
+        self.total_served_v[indices] = 0
+        self.total_served_p[indices] = 0
+
+    def _obs(self):
+        m, p = self.table.n_movements, self.table.n_phases
+        obs = np.zeros((self.n, m + p + 1), dtype=np.float32)
+        obs[:, :m] = np.minimum(self.queues, self.max_queue[:, None]) / self.max_queue[:, None]
+        obs[self._rows, m + self.phase] = 1.0
+        obs[:, m + p] = np.minimum(self.t_in_phase / np.maximum(1, self._phase_min_green()), 1.0)
+        return obs
+
+    def advance(self, actions, arrivals):
+        """Advance every junction one tick with the given (N, M) arrivals.
+
+        Returns the float64 reward array.
+        """
+        tbl = self.table
+        hold = self.action_timer > 0
+        act = np.where(hold, self.last_action, actions)
+        self.action_timer = np.where(hold, self.action_timer - 1, self.decision_interval - 1)
+        self.last_action = act
+        self.queues += arrivals
+        in_clear = self.clear_left > 0
+        green = ~in_clear
+        can_switch = self.t_in_phase >= self._phase_min_green()
+        target = np.where(self.pending >= 0, self.pending, act)
+        switched = green & can_switch & (target != self.phase)
+        serving = green & ~switched
+        self.pending = np.where(switched, -1, np.where(serving & ~can_switch & (act != self.phase), act, self.pending))
+        walking = self.t_in_phase < tbl.walk[self.phase]
+        open_ = tbl.green[self.phase] & (~tbl.pedestrian | walking[:, None]) & serving[:, None]
+        sat = np.where(tbl.saturation < 0, self.veh_throughput[:, None], tbl.saturation)
+        served = np.where(open_, np.minimum(sat, self.queues), 0)
+        self.queues -= served
+        clearance = tbl.clearance[self.phase]
+        clearance = np.where(clearance < 0, self.yellow_dur, clearance)
+        self.clear_left = np.where(in_clear, self.clear_left - 1, np.where(switched, clearance, 0))
+        self.phase = np.where(switched, target, self.phase)
+        self.t_in_phase = np.where(serving, self.t_in_phase + 1, 0)
+        self.switches += switched
+        veh_q = self.queues[:, tbl.vehicle_idx]
+        queue_max = veh_q.max(axis=1)
+        served_v = served[:, tbl.vehicle_idx].sum(axis=1)
+        served_p = served[:, tbl.ped_idx].sum(axis=1)
+        reward = self.served_w * served_v - (
+            self.wait_w * veh_q.sum(axis=1)
+            + self.ped_w * self.queues[:, tbl.ped_idx].sum(axis=1)
+            + self.max_w * queue_max
+            + self.switch_w * switched
+            + self.imbalance_w * (queue_max - veh_q.min(axis=1))
+            + self.hold_w * np.maximum(0, self.t_in_phase - self._phase_min_green())
+        )
+        self.served = served
+        self.total_reward += reward
+        self.total_served_v += served_v
+        self.total_served_p += served_p
+        self.t += 1
+        return reward
+
+    def _info(self, i):
+        tbl = self.table
+        q = self.queues[i]
+        return {
+            "t": int(self.t[i]),
+            "q_ns": int(q[tbl.ns_idx].sum()),
+            "q_ew": int(q[tbl.ew_idx].sum()),
+            "q_p": int(q[tbl.ped_idx].sum()),
+            "queues": q.tolist(),
+            "phase": int(self.phase[i]),
+            "yellow": int(self.clear_left[i]),
+            "served_v": int(self.served[i, tbl.vehicle_idx].sum()),
+            "served_p": int(self.served[i, tbl.ped_idx].sum()),
+            "switches": int(self.switches[i]),
+        }
+
+
+class BatchedSignalEnv(SignalBatch, BatchVecEnv):
+    """SB3 VecEnv of N signal junctions (see SignalBatch), one generator per env.
+
+    Arrivals are drawn per env in blocks of ``prefetch`` steps, all movements
+    at once; rate changes through set_attr/set_params hand the unused part of
+    a block back to the generator. ``normalize`` and ``record`` work as in
+    BatchedTrafficEnv; recordings hold per-movement queues and service.
+    """
+
+    PARAM_DTYPES = SIGNAL_PARAM_DTYPES
+    RATE_PARAMS = KNOBS
+
+    def __init__(self, num_envs, seed=0, seeds=None, prefetch=256, full_info=False, normalize=None, gamma=0.99, record=None, **env_kwargs):
+        SignalBatch.__init__(self, num_envs, **env_kwargs)
+        m = self.table.n_movements
+        schema = {**vec_schema(self.obs_dim), "phase": (np.int8, ()), "queues": (np.int32, (m,)), "served": (np.int32, (m,))}
+        seeds = self._init_vec(num_envs, self.obs_dim, self.table.n_phases, m, seed, seeds, prefetch, full_info,
+                               normalize, gamma, record, schema)
+        self._reset_envs(self._idx, seeds)
+
+    def _record_columns(self):
+        return {"phase": self.phase, "queues": self.queues, "served": self.served}
+
+    def _terminal_info(self, i, info):
+        info["served_p_total"] = int(self.total_served_p[i])
+
+    def _rewind(self, i):
+        if self._arr_pos[i] < self._arr_len[i]:
+            rng = self.rngs[i]
+            rng.bit_generator.state = self._rng_state[i]
+            if self._arr_pos[i] > 0:
+                rng.poisson(self._arr_rates[i], size=(int(self._arr_pos[i]), self.table.n_movements))
+        self._arr_pos[i] = 0
+        self._arr_len[i] = 0
+
+    def _refill(self, i):
+        rng = self.rngs[i]
+        k = int(min(self.prefetch, self.episode_len[i] - self.t[i]))
+        self._rng_state[i] = rng.bit_generator.state
+        self._arr_rates[i] = self.rates(i)
+        self._arrivals[i, :k] = rng.poisson(self._arr_rates[i], size=(k, self.table.n_movements))
+        self._arr_pos[i] = 0
+        self._arr_len[i] = k
+
+    def _reset_envs(self, indices, seeds=None):
+        for j, i in enumerate(indices):
+            self._rewind(i)
+            if seeds is not None and seeds[j] is not None:
+                self.rngs[i] = np.random.default_rng(seeds[j])
+            self.phase[i] = self.rngs[i].integers(0, self.table.n_phases)
+        self._reset_state(indices)
+
+
+class SignalEnv(gym.Env):
+    """Single-junction gymnasium view of BatchedSignalEnv.
+
+    Demand knobs and the signal state read and write the underlying arrays,
+    so ``env.lambda_p_ns = 0.3`` behaves as on TrafficEnv.
+    """
+
+    metadata = {"render_modes": []}
+    PARAM_DTYPES = SIGNAL_PARAM_DTYPES
+
+    def __init__(self, seed=0, **env_kwargs):
+        self.batch = BatchedSignalEnv(1, seed=seed, full_info=True, **env_kwargs)
+        self.table = self.batch.table
+        self.observation_space = self.batch.observation_space
+        self.action_space = self.batch.action_space
+
+    def __getattr__(self, name):
+        if name in SIGNAL_PARAM_DTYPES or name in ("phase", "t_in_phase", "t", "switches", "total_reward",
+                                                  "total_served_v", "total_served_p"):
+            return self.__dict__["batch"].__dict__[name][0].item()
+        if name == "yellow_left":
+            return int(self.__dict__["batch"].clear_left[0])
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in SIGNAL_PARAM_DTYPES:
+            self.batch.set_params([0], {name: [value]})
+        else:
+            super().__setattr__(name, value)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.batch._rewind(0)
+            self.batch.rngs[0] = np.random.default_rng(seed)
+        self.batch._reset_envs([0])
+        return self.batch._obs()[0], self.batch._info(0)
+
+    def step(self, action):
+        if self.batch.t[0] >= self.batch.episode_len[0]:
+            return self.batch._obs()[0], 0.0, False, True, {}
+        reward = self.batch.step_arrays([int(action)])[0]
+        info = self.batch._info(0)
+        truncated = bool(self.batch.t[0] >= self.batch.episode_len[0])
+        return self.batch._obs()[0], float(reward), False, truncated, info
+
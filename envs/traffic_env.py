@@ -1,9 +1,23 @@
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
+from time import perf_counter_ns
+from envs import kernels
+from envs import profiling
+from envs.demand import make_demand
+from envs.junction import PARAM_DTYPES
+
+# Everything that changes while stepping (plus the demand knobs /set_params
+# and RandomizeParams touch); the rest of the attributes are configuration.
+STATE_FIELDS = (
+    "q_ns", "q_ew", "phase", "t_in_phase", "yellow_left", "pending_switch", "action_timer", "last_action",
+    "t", "terminated", "truncated", "switches", "total_reward", "total_served_v", "lambda_ns", "lambda_ew",
+    "_demand_offset",
+)
 
 class TrafficEnv(gym.Env):
     metadata = {"render_modes": []}
+    PARAM_DTYPES = PARAM_DTYPES
     def __init__(
         self,
         seed=0,
@@ -21,6 +35,9 @@ class TrafficEnv(gym.Env):
         served_w=0.05,
         imbalance_w=0.0,
         hold_w=0.0,
+        fast=False,
+        prefetch=256,
+        demand=None,
     ):
         self.max_queue = max_queue
         self.lambda_ns = lambda_ns
@@ -38,9 +55,24 @@ class TrafficEnv(gym.Env):
         self.hold_w = float(hold_w)
         self.observation_space = spaces.Box(low=0.0, high=1.0, shape=(5,), dtype=np.float32)
         self.action_space = spaces.Discrete(2)
+        self.fast = fast
+        # Optional RateProfile/TraceDemand (or its config dict) replacing the
+        # stationary lambda_ns/lambda_ew Poisson arrivals.
+        self.demand = make_demand(demand)
+        self._demand_offset = 0
+        self._arr_t0 = 0
+        self.prefetch = max(1, int(prefetch))
+        self._arrivals = []
+        self._arr_pos = 0
+        self._arr_lam = None
+        self._rng_state = None
         self.rng = np.random.default_rng(seed)
+        if profiling.ENABLED:
+            self.step = self._step_profiled
         self.reset(seed=seed)
     def seed(self, seed=None):
+        self._arrivals = []
+        self._arr_pos = 0
         self.rng = np.random.default_rng(seed)
     def _obs(self):
         qns = min(self.q_ns, self.max_queue)
@@ -56,9 +88,12 @@ class TrafficEnv(gym.Env):
     def reset(self, seed=None, options=None):
         if seed is not None:
             self.seed(seed)
+        self._rewind()
         self.q_ns = 0
         self.q_ew = 0
         self.phase = int(self.rng.integers(0, 2))
+        if self.demand is not None:
+            self._demand_offset = self.demand.start_offset(self.rng, self.episode_len)
         self.t_in_phase = 0
         self.yellow_left = 0
         self.t = 0
@@ -73,6 +108,26 @@ class TrafficEnv(gym.Env):
         obs = self._obs()
         info = {"t": self.t, "q_ns": self.q_ns, "q_ew": self.q_ew, "phase": self.phase, "served_v": 0, "switches": self.switches}
         return obs, info
+    def get_state(self):
+        """Snapshot of the dynamic state and RNG as a JSON-serializable dict.
+
+        Unused prefetched arrivals are handed back to the generator first, so
+        the snapshot continues the same random stream in either mode.
+        """
+        self._rewind()
+        state = {k: getattr(self, k) for k in STATE_FIELDS}
+        state["rng"] = self.rng.bit_generator.state
+        return state
+    def set_state(self, state):
+        """Restore a get_state() snapshot (from this or an identically configured env)."""
+        for k in STATE_FIELDS:
+            setattr(self, k, state[k])
+        rng_state = state["rng"]
+        self.rng = np.random.Generator(getattr(np.random, rng_state["bit_generator"])())
+        self.rng.bit_generator.state = rng_state
+        self._arrivals = []
+        self._arr_pos = 0
+        return self._obs()
     def _resolve_action(self, action: int) -> int:
         a = int(action)
         if self.decision_interval <= 1:
@@ -84,12 +139,30 @@ class TrafficEnv(gym.Env):
         self.last_action = a
         self.action_timer = self.decision_interval - 1
         return self.last_action
-    def step(self, action):
-        if self.terminated or self.truncated:
-            return self._obs(), 0.0, self.terminated, self.truncated, {}
-        action = self._resolve_action(action)
-        arrivals_ns = self.rng.poisson(self.lambda_ns)
-        arrivals_ew = self.rng.poisson(self.lambda_ew)
+    def _rewind(self):
+        # Return prefetched-but-unused arrivals to the generator so the
+        # random stream matches the one a non-fast env would have consumed.
+        if self._arr_pos < len(self._arrivals):
+            self.rng.bit_generator.state = self._rng_state
+            if self._arr_pos > 0 and self.demand is None:
+                self.rng.poisson(self._arr_lam, size=(self._arr_pos, 2))
+            elif self._arr_pos > 0:
+                self._draw(self._arr_pos, self._arr_t0)
+        self._arrivals = []
+        self._arr_pos = 0
+    def _draw(self, k, t):
+        # Arrivals for steps t..t+k-1 as a (k, 2) array.
+        if self.demand is None:
+            return self.rng.poisson((self.lambda_ns, self.lambda_ew), size=(k, 2))
+        return self.demand.take(self.rng, self._demand_offset, t, k)
+    def _refill(self):
+        self._rewind()
+        k = min(self.prefetch, self.episode_len - self.t)
+        self._rng_state = self.rng.bit_generator.state
+        self._arr_lam = (self.lambda_ns, self.lambda_ew)
+        self._arr_t0 = self.t
+        self._arrivals = self._draw(k, self.t).tolist()
+    def _advance(self, action, arrivals_ns, arrivals_ew):
         self.q_ns += arrivals_ns
         self.q_ew += arrivals_ew
         served = 0
@@ -142,6 +215,117 @@ class TrafficEnv(gym.Env):
         self.t += 1
         if self.t >= self.episode_len:
             self.truncated = True
+        return reward, served
+    def step(self, action):
+        if self.fast:
+            return self._step_fast(action)
+        if self.terminated or self.truncated:
+            return self._obs(), 0.0, self.terminated, self.truncated, {}
+        action = self._resolve_action(action)
+        if self.demand is None:
+            arrivals_ns = self.rng.poisson(self.lambda_ns)
+            arrivals_ew = self.rng.poisson(self.lambda_ew)
+        else:
+            arrivals_ns, arrivals_ew = (int(v) for v in self._draw(1, self.t)[0])
+        reward, served = self._advance(action, arrivals_ns, arrivals_ew)
+        obs = self._obs()
+        info = {"t": self.t, "q_ns": self.q_ns, "q_ew": self.q_ew, "phase": self.phase, "served_v": served, "switches": self.switches}
+        return obs, reward, self.terminated, self.truncated, info
+    def _step_fast(self, action):
+        # Same dynamics as step(), but arrivals come from a prefetched block.
+        # This path is plain Python; only run() goes through the kernel.
+        return self.step_into(action, np.empty(5, dtype=np.float32))
+    def step_into(self, action, obs):
+        """step() that writes the observation into ``obs``, a float32 array of 5.
+
+        Returns the same tuple as step() with ``obs`` as its first item, so a
+        loop can reuse one array; a caller that keeps observations across
+        steps must copy them. Arrivals are prefetched in fast mode.
+        """
+        if self.terminated or self.truncated:
+            obs[:] = self._obs()
+            return obs, 0.0, self.terminated, self.truncated, {}
+        action = self._resolve_action(action)
+        if self.fast:
+            if self._arr_pos >= len(self._arrivals) or self._arr_lam != (self.lambda_ns, self.lambda_ew):
+                self._refill()
+            arrivals_ns, arrivals_ew = self._arrivals[self._arr_pos]
+            self._arr_pos += 1
+        elif self.demand is None:
+            arrivals_ns = self.rng.poisson(self.lambda_ns)
+            arrivals_ew = self.rng.poisson(self.lambda_ew)
+        else:
+            arrivals_ns, arrivals_ew = (int(v) for v in self._draw(1, self.t)[0])
+        reward, served = self._advance(action, arrivals_ns, arrivals_ew)
+        obs[0] = min(self.q_ns, self.max_queue) / self.max_queue
+        obs[1] = min(self.q_ew, self.max_queue) / self.max_queue
+        obs[2] = self.phase == 0
+        obs[3] = self.phase != 0
+        obs[4] = min(self.t_in_phase / max(1, self.min_green), 1.0)
+        info = {"t": self.t, "q_ns": self.q_ns, "q_ew": self.q_ew, "phase": self.phase, "served_v": served, "switches": self.switches}
+        return obs, reward, self.terminated, self.truncated, info
+    def _step_profiled(self, action):
+        # step() split into timed phases (NEUROLIGHT_PROFILE=1); same random
+        # stream and results.
+        if self.terminated or self.truncated:
+            return self._obs(), 0.0, self.terminated, self.truncated, {}
+        t0 = perf_counter_ns()
+        action = self._resolve_action(action)
+        if self.fast:
+            if self._arr_pos >= len(self._arrivals) or self._arr_lam != (self.lambda_ns, self.lambda_ew):
+                self._refill()
+            arrivals_ns, arrivals_ew = self._arrivals[self._arr_pos]
+            self._arr_pos += 1
+        elif self.demand is None:
+            arrivals_ns = self.rng.poisson(self.lambda_ns)
+            arrivals_ew = self.rng.poisson(self.lambda_ew)
+        else:
+            arrivals_ns, arrivals_ew = (int(v) for v in self._draw(1, self.t)[0])
+        t1 = perf_counter_ns()
+        reward, served = self._advance(action, arrivals_ns, arrivals_ew)
+        t2 = perf_counter_ns()
         obs = self._obs()
+        t3 = perf_counter_ns()
         info = {"t": self.t, "q_ns": self.q_ns, "q_ew": self.q_ew, "phase": self.phase, "served_v": served, "switches": self.switches}
+        t4 = perf_counter_ns()
+        profiling.record("env.step.sample", t1 - t0)
+        profiling.record("env.step.dynamics", t2 - t1)
+        profiling.record("env.step.obs", t3 - t2)
+        profiling.record("env.step.info", t4 - t3)
+        profiling.record("env.step", t4 - t0)
         return obs, reward, self.terminated, self.truncated, info
+    def run(self, actions):
+        """Advance up to len(actions) steps with the compiled kernel.
+
+        Uses numba when installed and a pure-Python loop otherwise. Stops at the
+        end of the episode and returns (obs, rewards) for the steps taken.
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(-1)
+        self._rewind()
+        if self.terminated or self.truncated:
+            return np.zeros((0, 5), dtype=np.float32), np.zeros(0, dtype=np.float64)
+        k = min(len(actions), self.episode_len - self.t)
+        arrivals = self._draw(k, self.t)
+        state = np.array([
+            self.q_ns, self.q_ew, self.phase, self.t_in_phase, self.yellow_left, int(self.pending_switch),
+            self.action_timer, self.last_action, self.t, self.switches, self.total_served_v, 0,
+        ], dtype=np.int64)
+        params = np.array([
+            self.max_queue, self.veh_throughput, self.min_green, self.yellow_dur, self.episode_len, self.decision_interval,
+            self.wait_w, self.max_w, self.switch_w, self.served_w, self.imbalance_w, self.hold_w,
+        ], dtype=np.float64)
+        rewards = np.zeros(k, dtype=np.float64)
+        obs = np.zeros((k, 5), dtype=np.float32)
+        total = np.array([self.total_reward], dtype=np.float64)
+        n = kernels.run_steps(state, params, actions[:k], arrivals, rewards, obs, total)
+        self.q_ns, self.q_ew, self.phase, self.t_in_phase, self.yellow_left = (int(v) for v in state[:5])
+        self.pending_switch = bool(state[kernels.PENDING])
+        self.action_timer = int(state[kernels.ACTION_TIMER])
+        self.last_action = int(state[kernels.LAST_ACTION])
+        self.t = int(state[kernels.T])
+        self.switches = int(state[kernels.SWITCHES])
+        self.total_served_v = int(state[kernels.SERVED_TOTAL])
+        self.total_reward = float(total[0])
+        if self.t >= self.episode_len:
+            self.truncated = True
+        return obs[:n], rewards[:n]
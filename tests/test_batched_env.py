@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+from envs.traffic_env import TrafficEnv
+from envs.batched_env import BatchedTrafficEnv
+
+class TestBatchedEnv(unittest.TestCase):
+    def test_matches_independent_envs(self):
+        kw = dict(min_green=4, yellow=2, episode_len=50, decision_interval=2, hold_w=0.02, imbalance_w=0.05)
+        n = 4
+        ref = DummyVecEnv([lambda i=i: TrafficEnv(seed=7 + i, **kw) for i in range(n)])
+        env = BatchedTrafficEnv(n, seed=7, prefetch=16, **kw)
+        ref.seed(3)
+        env.seed(3)
+        self.assertTrue(np.array_equal(ref.reset(), env.reset()))
+        rng = np.random.default_rng(0)
+        for t in range(120):
+            if t == 30:
+                ref.set_attr("lambda_ew", 1.5, indices=[0])
+                env.set_attr("lambda_ew", 1.5, indices=[0])
+            actions = rng.integers(0, 2, size=n)
+            o1, r1, d1, i1 = ref.step(actions)
+            o2, r2, d2, i2 = env.step(actions)
+            self.assertTrue(np.array_equal(o1, o2))
+            self.assertTrue(np.array_equal(r1, r2))
+            self.assertTrue(np.array_equal(d1, d2))
+            for k in np.flatnonzero(d1):
+                self.assertTrue(np.array_equal(i1[k]["terminal_observation"], i2[k]["terminal_observation"]))
+                self.assertTrue(i2[k]["TimeLimit.truncated"])
+
+if __name__ == '__main__':
+    unittest.main()
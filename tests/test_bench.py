@@ -0,0 +1,31 @@
+import unittest
+from bench.compare import compare
+from bench.env_bench import bench_traffic_env, bench_vec_envs
+
+class TestBench(unittest.TestCase):
+    def test_compare_flags_regressions_by_direction(self):
+        old = {"results": [
+            {"name": "env.step", "value": 100.0, "unit": "steps/s", "higher_is_better": True},
+            {"name": "server.step.p99", "value": 10.0, "unit": "ms", "higher_is_better": False},
+            {"name": "gone", "value": 1.0, "unit": "ms", "higher_is_better": False},
+        ]}
+        new = {"results": [
+            {"name": "env.step", "value": 80.0, "unit": "steps/s", "higher_is_better": True},
+            {"name": "server.step.p99", "value": 8.0, "unit": "ms", "higher_is_better": False},
+            {"name": "added", "value": 1.0, "unit": "ms", "higher_is_better": False},
+        ]}
+        rows = {r["name"]: r for r in compare(old, new, threshold=0.1)}
+        self.assertEqual(set(rows), {"env.step", "server.step.p99"})
+        self.assertTrue(rows["env.step"]["regression"])
+        self.assertAlmostEqual(rows["server.step.p99"]["change"], 0.2)
+        self.assertFalse(rows["server.step.p99"]["regression"])
+    def test_env_suites_report_positive_rates(self):
+        cfg = dict(min_green=4, yellow=2, episode_len=50)
+        results = bench_traffic_env(cfg, steps=200, repeat=1)
+        results += bench_vec_envs(cfg, num_envs=[3], kinds=["dummy", "batched"], steps=20, repeat=1)
+        self.assertEqual([r["name"] for r in results], ["env.step", "env.step.fast", "env.run", "vec.dummy.n3", "vec.batched.n3"])
+        for r in results:
+            self.assertGreater(r["value"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
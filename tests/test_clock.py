@@ -0,0 +1,37 @@
+import time
+import unittest
+from types import SimpleNamespace
+from api.clock import SimClock
+
+class TestSimClock(unittest.TestCase):
+    def make_clock(self, **kw):
+        self.counts = {}
+        def step_fn(batch):
+            frames = []
+            for live, n in batch:
+                sid = live.session.id
+                self.counts[sid] = self.counts.get(sid, 0) + n
+                frames.append({"t": self.counts[sid]})
+            return frames
+        return SimClock(step_fn, **kw)
+    def test_rates_and_coalesced_frames(self):
+        clock = self.make_clock(max_chunk=16)
+        fast = SimpleNamespace(id="fast")
+        paced = SimpleNamespace(id="paced")
+        clock.start(fast, rate=0)
+        clock.start(paced, rate=50)
+        version, frame = clock.wait_frame("fast", 0, timeout=2)
+        self.assertGreater(version, 0)
+        time.sleep(0.3)
+        version2, frame2 = clock.wait_frame("fast", version, timeout=2)
+        self.assertGreater(frame2["t"], frame["t"] + 16)
+        self.assertGreater(version2 - version, 1)
+        paced_steps = clock.wait_frame("paced", 0, timeout=2)[1]["t"]
+        self.assertLess(paced_steps, 40)
+        self.assertTrue(clock.stop("fast"))
+        self.assertEqual(clock.wait_frame("fast", version2, timeout=1), (None, None))
+        clock.stop("paced")
+        self.assertEqual(clock.status()["live"], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+import threading
+import http.client
+import unittest
+import numpy as np
+from api.cluster import Cluster, Router, attach_policies, merge_prometheus, share_policies, worker_for
+from api.numpy_policy import NumpyPolicy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def request(address, method, path, body=None, sid=None):
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if sid:
+        headers["X-Session-Id"] = sid
+    conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    conn.close()
+    return resp.status, data
+
+class TestCluster(unittest.TestCase):
+    def test_worker_for_is_stable_and_spread(self):
+        self.assertEqual(worker_for("abc", 4), worker_for("abc", 4))
+        counts = np.bincount([worker_for(f"s{i}", 4) for i in range(4000)], minlength=4)
+        self.assertTrue(np.all(counts > 800))
+
+    def test_prometheus_merge_labels_each_worker(self):
+        text = '# HELP steps Steps\n# TYPE steps counter\nsteps 5\nlat_bucket{policy="a",le="1"} 2\n'
+        merged = merge_prometheus([text, text.replace("5", "7")]).splitlines()
+        self.assertEqual(merged[:2], ["# HELP steps Steps", "# TYPE steps counter"])
+        self.assertIn('steps{worker="0"} 5', merged)
+        self.assertIn('steps{worker="1"} 7', merged)
+        self.assertIn('lat_bucket{worker="1",policy="a",le="1"} 2', merged)
+
+    def test_shared_policy_matches_loaded(self):
+        rng = np.random.default_rng(0)
+        policy = NumpyPolicy([rng.normal(size=(5, 8)), rng.normal(size=(8, 2))], [rng.normal(size=8), rng.normal(size=2)])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "actor.npz")
+            policy.save(path)
+            shm, spec, rest = share_policies({"a": path, "b": "model.zip"})
+            try:
+                self.assertEqual(rest, {"b": "model.zip"})
+                view_shm, shared = attach_policies(spec)
+                shared_policy, shared_path = shared["a"]
+                self.assertEqual(shared_path, path)
+                self.assertFalse(shared_policy.weights[0].flags.writeable)
+                obs = rng.random((16, 5)).astype(np.float32)
+                np.testing.assert_allclose(shared_policy.logits(obs), policy.logits(obs), rtol=1e-6)
+                del shared_policy, shared
+                view_shm.close()
+            finally:
+                shm.close()
+                shm.unlink()
+
+    def test_router_keeps_sessions_on_their_worker(self):
+        with Cluster(2, os.path.join(ROOT, "train", "config.yaml"), policies={}) as cluster:
+            router = Router(("127.0.0.1", 0), cluster.backends)
+            threading.Thread(target=router.serve_forever, daemon=True).start()
+            address = router.server_address
+            try:
+                sids = [request(address, "POST", "/session", {})[1]["session"] for _ in range(8)]
+                for sid in sids:
+                    for _ in range(3):
+                        status, _ = request(address, "POST", "/step", {"mode": "fixed"}, sid)
+                        self.assertEqual(status, 200)
+                self.assertEqual(request(address, "GET", "/inference/stats?worker=x")[0], 400)
+                self.assertEqual(len(request(address, "GET", "/inference/stats")[1]["workers"]), 2)
+                status, listing = request(address, "GET", "/sessions")
+                self.assertEqual(status, 200)
+                placed = {s["session"]: s["worker"] for s in listing["sessions"]}
+                for sid in sids:
+                    self.assertEqual(placed[sid], worker_for(sid, 2))
+                    self.assertEqual(request(cluster.owner(sid), "GET", "/metrics", sid=sid)[1]["t"], 3)
+            finally:
+                router.shutdown()
+                router.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
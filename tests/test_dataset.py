@@ -0,0 +1,62 @@
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+from envs.recorder import Replay
+from train.dataset import discounted_returns, generate_shard, iter_minibatches
+
+ENV = dict(min_green=4, yellow=2, episode_len=40, lambda_ns=0.5, lambda_ew=0.3)
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.paths = []
+        shards = []
+        for j, spec in enumerate(["longest_queue", "fixed:10"]):
+            path = os.path.join(self.dir.name, f"shard_{j:05d}")
+            shards.append(generate_shard(path, spec, ENV, seeds=[10 * j + i for i in range(3)], gamma=0.9, chunk_rows=50))
+            self.paths.append(path)
+        self.shards = shards
+        with open(os.path.join(self.dir.name, "dataset.json"), "w") as f:
+            json.dump({"shards": shards}, f)
+
+    def test_returns(self):
+        r = np.array([[1.0, 0.0], [2.0, 1.0], [3.0, 0.0]])
+        np.testing.assert_allclose(discounted_returns(r, 0.5), [[2.75, 0.5], [3.5, 1.0], [3.0, 0.0]])
+
+    def test_shard_rows(self):
+        self.assertEqual(self.shards[0]["rows"], 120)
+        replay = Replay(self.paths[0])
+        self.assertEqual(len(replay), 120)
+        ep = replay.episode(1, 0)
+        np.testing.assert_array_equal(ep["t"], np.arange(40))
+        np.testing.assert_allclose(ep["ret"], discounted_returns(ep["reward"].astype(np.float64)[:, None], 0.9)[:, 0], rtol=1e-5)
+        # Longest-queue only switches when the red queue is longer (ties: clipped obs).
+        obs, act = ep["obs"], ep["action"]
+        green = np.where(obs[:, 2] > 0.5, obs[:, 0], obs[:, 1])
+        red = np.where(obs[:, 2] > 0.5, obs[:, 1], obs[:, 0])
+        self.assertTrue(np.all(red[act == 1] >= green[act == 1]))
+
+    def test_minibatches_cover_every_row_once(self):
+        seen = []
+        for batch in iter_minibatches(self.paths, 32, np.random.default_rng(0), columns=("ret",), shuffle_chunks=2):
+            self.assertLessEqual(len(batch["ret"]), 32)
+            seen.append(batch["ret"])
+        expected = np.concatenate([Replay(p).column("ret") for p in self.paths])
+        np.testing.assert_array_equal(np.sort(np.concatenate(seen)), np.sort(expected))
+
+    def test_behavior_cloning_fits_actions(self):
+        from train.pretrain_bc import behavior_clone
+        from train.train_ppo import make_batched_env, new_model
+        cfg = {"policy": "MlpPolicy", "learning_rate": 3e-4, "gamma": 0.9, "gae_lambda": 0.95, "n_steps": 64,
+               "batch_size": 64, "n_epochs": 1, "ent_coef": 0.0, "clip_range": 0.2, "env": ENV}
+        env = make_batched_env(cfg, 1, 0)
+        model = new_model(cfg, env, 0, device="cpu")
+        history = behavior_clone(model, self.paths[:1], epochs=30, batch_size=32, lr=3e-3, seed=0, log=lambda s: None)
+        self.assertLess(history[-1]["loss"], history[0]["loss"])
+        self.assertGreater(history[-1]["acc"], 0.7)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from envs.demand import RateProfile, TraceDemand, csv_to_trace
+from envs.traffic_env import TrafficEnv
+from envs.batched_env import BatchedTrafficEnv
+
+RUSH = {"kind": "profile", "points": [[0, 0.2, 0.1], [30, 1.5, 0.4], [60, 0.3, 1.2]], "period": 90, "random_offset": True}
+
+class TestDemand(unittest.TestCase):
+    def test_csv_trace_roundtrip_and_windows(self):
+        counts = np.random.default_rng(0).integers(0, 5, size=(37, 2))
+        with tempfile.TemporaryDirectory() as d:
+            src = os.path.join(d, "counts.csv")
+            with open(src, "w") as f:
+                f.write("second,count_ns,count_ew\n")
+                for i, (a, b) in enumerate(counts):
+                    f.write(f"{i},{a},{b}\n")
+            dst = os.path.join(d, "counts.npy")
+            self.assertEqual(csv_to_trace(src, dst, chunk=8), len(counts))
+            trace = TraceDemand(dst, random_offset=False, start=30)
+            self.assertIsInstance(trace.counts, np.memmap)
+            self.assertTrue(np.array_equal(trace.take(None, 30, 0, 5), counts[30:35]))
+            self.assertTrue(np.array_equal(trace.take(None, 30, 5, 4), counts[[35, 36, 0, 1]]))
+            env = TrafficEnv(seed=0, veh_throughput=0, max_queue=1000, episode_len=20, demand=trace)
+            for _ in range(20):
+                _, _, _, truncated, info = env.step(0)
+            self.assertTrue(truncated)
+            expected = counts[np.arange(30, 50) % len(counts)].sum(axis=0)
+            self.assertEqual((info["q_ns"], info["q_ew"]), tuple(int(v) for v in expected))
+            del trace, env
+    def test_profile_rates_wrap(self):
+        p = RateProfile([[10, 1.0, 0.0], [20, 0.0, 1.0]], period=30)
+        lam = p.rates(0, 0, 30)
+        self.assertAlmostEqual(lam[10, 0], 1.0)
+        self.assertAlmostEqual(lam[15, 0], 0.5)
+        self.assertAlmostEqual(lam[25, 1], 0.75)
+        self.assertAlmostEqual(lam[0, 0], 0.5)
+        self.assertAlmostEqual(lam[5, 0], 0.75)
+    def test_profile_envs_are_consistent(self):
+        kw = dict(min_green=4, yellow=2, episode_len=40, demand=RUSH)
+        n = 3
+        slow = [TrafficEnv(seed=5 + i, **kw) for i in range(n)]
+        fast = [TrafficEnv(seed=5 + i, fast=True, prefetch=7, **kw) for i in range(n)]
+        batched = BatchedTrafficEnv(n, seed=5, prefetch=7, **kw)
+        batched.reset()
+        for e in slow + fast:
+            e.reset()
+        for t in range(100):
+            actions = np.full(n, t % 9 == 0, dtype=np.int64)
+            _, r, _, _ = batched.step(actions)
+            for i in range(n):
+                o1, r1, _, trunc, _ = slow[i].step(int(actions[i]))
+                o2, r2, _, _, _ = fast[i].step(int(actions[i]))
+                self.assertTrue(np.array_equal(o1, o2))
+                self.assertEqual(r1, r2)
+                self.assertTrue(np.isclose(r[i], r1, rtol=1e-5))
+                if trunc:
+                    slow[i].reset()
+                    fast[i].reset()
+
+if __name__ == '__main__':
+    unittest.main()
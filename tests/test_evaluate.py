@@ -0,0 +1,28 @@
+import unittest
+from envs.traffic_env import TrafficEnv
+from train.eval_fixed import run_episode
+from train.evaluate import build_controller, run_scenario, summarize
+
+class TestEvaluate(unittest.TestCase):
+    def test_fixed_cycle_matches_eval_fixed(self):
+        cfg = dict(min_green=5, yellow=2, episode_len=200)
+        rows = run_scenario("fixed:30", cfg, [3, 4], 0.5, 0.6)
+        for row, seed in zip(rows, [3, 4]):
+            ref = run_episode(TrafficEnv(seed=seed, lambda_ns=0.5, lambda_ew=0.6, **cfg), fixed_cycle=30)
+            self.assertAlmostEqual(row["reward"], ref["reward"])
+            self.assertAlmostEqual(row["avg_q"], ref["avg_q"])
+            self.assertEqual(row["served_v"], ref["served_v"])
+            self.assertEqual(row["switches"], ref["switches"])
+    def test_summary_has_ci_per_metric(self):
+        rows = run_scenario("longest_queue", dict(episode_len=50), [0, 1, 2], 0.5, 0.5)
+        summary = summarize(rows)
+        self.assertEqual(len(summary), 4)
+        for s in summary:
+            self.assertLessEqual(s["ci95_low"], s["mean"])
+            self.assertGreaterEqual(s["ci95_high"], s["mean"])
+    def test_unknown_controller_lists_valid_names(self):
+        with self.assertRaisesRegex(ValueError, "max_pressure"):
+            build_controller("longest_queu")
+
+if __name__ == '__main__':
+    unittest.main()
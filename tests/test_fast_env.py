@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from envs.traffic_env import TrafficEnv
+
+class TestFastEnv(unittest.TestCase):
+    kw = dict(min_green=4, yellow=2, episode_len=300, decision_interval=2, hold_w=0.02, imbalance_w=0.05)
+    def test_fast_step_matches_step(self):
+        ref = TrafficEnv(seed=3, **self.kw)
+        env = TrafficEnv(seed=3, fast=True, prefetch=32, **self.kw)
+        actions = np.random.default_rng(0).integers(0, 2, size=300)
+        for ep in range(2):
+            o1, _ = ref.reset()
+            o2, _ = env.reset()
+            self.assertTrue(np.array_equal(o1, o2))
+            for i, a in enumerate(actions):
+                if i == 100:
+                    ref.lambda_ew = env.lambda_ew = 1.2
+                o1, r1, d1, t1, i1 = ref.step(a)
+                o2, r2, d2, t2, i2 = env.step(a)
+                self.assertTrue(np.array_equal(o1, o2))
+                self.assertEqual((r1, d1, t1, i1), (r2, d2, t2, i2))
+            ref.lambda_ew = env.lambda_ew = 0.7
+    def test_fast_step_returns_fresh_arrays_and_step_into_reuses_one(self):
+        ref = TrafficEnv(seed=5, **self.kw)
+        env = TrafficEnv(seed=5, fast=True, prefetch=16, **self.kw)
+        o1, _, _, _, i1 = env.step(1)
+        kept = o1.copy()
+        o2, _, _, _, i2 = env.step(0)
+        self.assertIsNot(o1, o2)
+        self.assertIsNot(i1, i2)
+        self.assertTrue(np.array_equal(o1, kept))
+        ref.step(1)
+        ref.step(0)
+        buf = np.zeros(5, dtype=np.float32)
+        for a in (1, 0, 1):
+            o, r, _, _, info = env.step_into(a, buf)
+            ref_o, ref_r, _, _, ref_info = ref.step(a)
+            self.assertIs(o, buf)
+            self.assertTrue(np.array_equal(buf, ref_o))
+            self.assertEqual((r, info), (ref_r, ref_info))
+    def test_run_matches_step(self):
+        ref = TrafficEnv(seed=4, **self.kw)
+        env = TrafficEnv(seed=4, **self.kw)
+        actions = np.random.default_rng(1).integers(0, 2, size=400)
+        rewards = []
+        for a in actions:
+            obs, r, d, t, info = ref.step(a)
+            rewards.append(r)
+            if t:
+                break
+        run_obs, run_rewards = env.run(actions)
+        self.assertEqual(len(run_rewards), 300)
+        self.assertTrue(np.array_equal(run_rewards, rewards))
+        self.assertTrue(np.array_equal(run_obs[-1], obs))
+        self.assertTrue(env.truncated)
+        self.assertEqual(env.total_reward, ref.total_reward)
+        self.assertEqual((env.q_ns, env.q_ew, env.switches), (ref.q_ns, ref.q_ew, ref.switches))
+
+if __name__ == '__main__':
+    unittest.main()
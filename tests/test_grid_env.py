@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from envs.grid_env import GridTrafficEnv, FlatGridEnv
+
+class TestGridEnv(unittest.TestCase):
+    def test_served_vehicles_reach_downstream_after_delay(self):
+        env = GridTrafficEnv(rows=2, cols=1, seed=0, travel_ns=3, lambda_ns=0.0, lambda_ew=0.0, min_green=1)
+        env.reset()
+        env.phase[:] = 0
+        env.q_ns[0] = 2
+        env.step([0, 0])
+        self.assertEqual(env.q_ns[0], 0)
+        self.assertEqual(env.in_transit(), 2)
+        env.step([0, 0])
+        env.step([0, 0])
+        self.assertEqual(env.q_ns[1], 0)
+        env.step([1, 1])
+        self.assertEqual(env.q_ns[1] + env.served_ns[1], 2)
+        self.assertEqual(env.in_transit(), 0)
+    def test_flat_view_shapes(self):
+        env = FlatGridEnv(rows=2, cols=3, seed=1, episode_len=5)
+        obs, info = env.reset()
+        self.assertEqual(obs.shape, (30,))
+        done = False
+        steps = 0
+        while not done:
+            obs, r, term, trunc, info = env.step(env.action_space.sample())
+            done = term or trunc
+            steps += 1
+        self.assertEqual(steps, 5)
+
+if __name__ == '__main__':
+    unittest.main()
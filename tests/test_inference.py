@@ -0,0 +1,32 @@
+import threading
+import unittest
+import numpy as np
+from api.inference import BatchInference
+
+class ThresholdPolicy:
+    def __init__(self):
+        self.calls = []
+    def predict(self, obs, deterministic=True):
+        self.calls.append(len(obs))
+        return (obs[:, 0] > obs[:, 1]).astype(np.int64), None
+
+class TestBatchInference(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self):
+        policy = ThresholdPolicy()
+        engine = BatchInference(max_batch=64, max_wait_ms=50.0)
+        engine.set_model(policy)
+        obs = np.random.default_rng(0).random((32, 5)).astype(np.float32)
+        results = [None] * len(obs)
+        def call(i):
+            results[i] = engine.predict(obs[i])
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(obs))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, (obs[:, 0] > obs[:, 1]).astype(int).tolist())
+        self.assertLess(len(policy.calls), len(obs))
+        self.assertEqual(engine.stats()["requests"], len(obs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from api.numpy_policy import NumpyPolicy
+from api.registry import load_policy
+from envs.batched_env import BatchedTrafficEnv
+from envs.normalize import Normalizer, NormalizedPolicy, RunningMeanStd, norm_path
+from envs.shm_vec_env import ShmVecEnv
+
+KW = dict(min_green=4, yellow=2, episode_len=30)
+
+class TestNormalize(unittest.TestCase):
+    def test_running_stats_match_full_batch(self):
+        data = np.random.default_rng(0).normal(3.0, 2.0, size=(257, 5))
+        rms = RunningMeanStd((5,))
+        for chunk in np.array_split(data, 9):
+            rms.update(chunk)
+        self.assertEqual(rms.count, 257)
+        np.testing.assert_allclose(rms.mean, data.mean(axis=0))
+        np.testing.assert_allclose(rms.var, data.var(axis=0))
+
+    def test_fused_stage_matches_manual_normalization(self):
+        n = 6
+        raw = BatchedTrafficEnv(n, seed=3, **KW)
+        env = BatchedTrafficEnv(n, seed=3, normalize={"clip_obs": 5.0}, gamma=0.9, **KW)
+        manual = Normalizer(n, gamma=0.9, clip_obs=5.0)
+        np.testing.assert_array_equal(env.reset(), manual.reset(raw.reset()))
+        rng = np.random.default_rng(1)
+        raw_return = np.zeros(n)
+        episodes = 0
+        for _ in range(70):
+            actions = rng.integers(0, 2, size=n)
+            o1, r1, d1, i1 = raw.step(actions)
+            o2, r2, d2, i2 = env.step(actions)
+            raw_return += r1
+            # The fused stage sees terminal rows before the auto-reset.
+            step_obs = o1.copy()
+            for k in np.flatnonzero(d1):
+                step_obs[k] = i1[k]["terminal_observation"]
+            expect_o, expect_r = manual.step(step_obs, r1, d1, [{} for _ in range(n)])
+            np.testing.assert_allclose(r2, expect_r, rtol=1e-5)
+            live = ~d1
+            np.testing.assert_allclose(o2[live], expect_o[live], rtol=1e-5, atol=1e-6)
+            for k in np.flatnonzero(d2):
+                episodes += 1
+                np.testing.assert_allclose(i2[k]["terminal_observation"], expect_o[k], rtol=1e-5, atol=1e-6)
+                self.assertEqual(i2[k]["episode"]["l"], 30)
+                self.assertAlmostEqual(i2[k]["episode"]["r"], raw_return[k], places=3)
+                raw_return[k] = 0.0
+        self.assertEqual(episodes, 2 * n)
+
+    def test_shm_matches_batched(self):
+        n = 5
+        ref = BatchedTrafficEnv(n, seed=8, normalize=True, **KW)
+        env = ShmVecEnv(n, num_workers=2, seed=8, normalize=True, **KW)
+        try:
+            np.testing.assert_allclose(ref.reset(), env.reset(), rtol=1e-6)
+            rng = np.random.default_rng(2)
+            for _ in range(65):
+                actions = rng.integers(0, 2, size=n)
+                o1, r1, d1, i1 = ref.step(actions)
+                o2, r2, d2, i2 = env.step(actions)
+                np.testing.assert_allclose(r1, r2, rtol=1e-5)
+                for k in np.flatnonzero(d1):
+                    self.assertAlmostEqual(i1[k]["episode"]["r"], i2[k]["episode"]["r"], places=3)
+        finally:
+            env.close()
+
+    def test_saved_stats_wrap_loaded_policy(self):
+        rng = np.random.default_rng(4)
+        policy = NumpyPolicy([rng.normal(size=(5, 8)), rng.normal(size=(8, 2))], [np.zeros(8), np.zeros(2)])
+        norm = Normalizer(1)
+        norm.obs_rms.update(rng.normal(0.4, 0.2, size=(500, 5)))
+        norm._sync()
+        obs = rng.random((64, 5), dtype=np.float32)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "ppo.npz")
+            policy.save(path)
+            self.assertIsInstance(load_policy(path), NumpyPolicy)
+            norm.save(norm_path(path))
+            loaded = load_policy(path)
+            self.assertIsInstance(loaded, NormalizedPolicy)
+            self.assertIsInstance(load_policy(path, normalize=False), NumpyPolicy)
+        np.testing.assert_array_equal(loaded.predict(obs)[0], policy.predict(norm.normalize_obs(obs))[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from stable_baselines3 import PPO
+from envs.traffic_env import TrafficEnv
+from api.numpy_policy import NumpyPolicy
+from api.registry import load_policy
+from train.export_policy import export
+
+class TestNumpyPolicy(unittest.TestCase):
+    def test_export_matches_sb3_predict(self):
+        model = PPO("MlpPolicy", TrafficEnv(seed=0), policy_kwargs={"net_arch": [32, 32]}, seed=0, device="cpu")
+        obs = np.random.default_rng(1).random((2000, 5), dtype=np.float32)
+        ref, _ = model.predict(obs, deterministic=True)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "ppo.zip")
+            model.save(path)
+            out = export(path)
+            self.assertTrue(out.endswith(".npz"))
+            policy = load_policy(out)
+        self.assertIsInstance(policy, NumpyPolicy)
+        got, _ = policy.predict(obs)
+        self.assertTrue(np.array_equal(ref, got))
+        single, _ = policy.predict(obs[0])
+        self.assertEqual(single.shape, ())
+        self.assertEqual(int(single), int(ref[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+from envs.traffic_env import TrafficEnv
+from envs.planner import MPCPlanner
+
+class TestPlanner(unittest.TestCase):
+    def test_plan_returns_match_env_rollouts(self):
+        kw = dict(lambda_ns=0.0, lambda_ew=0.0, min_green=4, yellow=2, decision_interval=2, imbalance_w=0.05, hold_w=0.02)
+        env = TrafficEnv(seed=0, **kw)
+        env.q_ns, env.q_ew, env.t_in_phase = 9, 14, 3
+        planner = MPCPlanner(horizon=12, stride=4, samples=3)
+        returns = planner.plan(env)
+        state = env.get_state()
+        for c, plan in enumerate(planner.plans):
+            clone = TrafficEnv(seed=1, **kw)
+            clone.set_state(state)
+            total = sum(clone.step(int(a))[1] for a in plan)
+            self.assertAlmostEqual(returns[c], total, places=6)
+    def test_switches_to_long_red_queue_within_budget(self):
+        env = TrafficEnv(seed=0, lambda_ns=0.2, lambda_ew=0.6, min_green=5)
+        env.phase, env.t_in_phase, env.q_ns, env.q_ew = 0, 10, 0, 25
+        planner = MPCPlanner(budget_ms=5.0)
+        self.assertEqual(planner.act(env), 1)
+        env.q_ns, env.q_ew = 25, 0
+        self.assertEqual(planner.act(env), 0)
+        self.assertTrue(planner.min_samples <= planner.samples <= planner.max_samples)
+
+if __name__ == '__main__':
+    unittest.main()
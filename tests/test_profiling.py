@@ -0,0 +1,51 @@
+import time
+import unittest
+import numpy as np
+from envs import profiling
+from envs.traffic_env import TrafficEnv
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.ENABLED = False
+        profiling.snapshot(reset=True)
+    def test_profiled_step_matches_plain_step(self):
+        for fast in (False, True):
+            plain = TrafficEnv(seed=3, fast=fast, episode_len=60)
+            profiling.ENABLED = True
+            timed = TrafficEnv(seed=3, fast=fast, episode_len=60)
+            profiling.ENABLED = False
+            for t in range(80):
+                a = int(t % 7 == 0)
+                o1, r1, _, d1, i1 = plain.step(a)
+                o2, r2, _, d2, i2 = timed.step(a)
+                self.assertTrue(np.array_equal(o1, o2))
+                self.assertEqual((r1, d1, i1), (r2, d2, i2))
+                if d1:
+                    plain.reset()
+                    timed.reset()
+        timers = profiling.snapshot()
+        self.assertEqual(timers["env.step"]["count"], 160)
+        for phase in ("sample", "dynamics", "obs", "info"):
+            self.assertIn(f"env.step.{phase}", timers)
+    def test_span_is_noop_when_disabled(self):
+        with profiling.span("x"):
+            pass
+        self.assertEqual(profiling.snapshot(), {})
+        profiling.ENABLED = True
+        with profiling.span("x"):
+            busy_wait(0.002)
+        self.assertGreaterEqual(profiling.snapshot()["x"]["max_us"], 2000)
+    def test_sampled_stacks_are_folded(self):
+        _, samples = profiling.sample_stacks(lambda: busy_wait(0.05), interval=0.001)
+        self.assertGreater(sum(samples.values()), 5)
+        self.assertTrue(any(s.split(";")[-1].startswith("busy_wait") for s in samples))
+        line = profiling.folded(samples).splitlines()[0]
+        self.assertTrue(line.rsplit(" ", 1)[1].isdigit())
+
+if __name__ == '__main__':
+    unittest.main()
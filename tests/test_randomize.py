@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+from envs.batched_env import BatchedTrafficEnv
+from envs.signal_env import BatchedSignalEnv
+from envs.traffic_env import TrafficEnv
+from train.wrappers import BatchRandomize
+
+CFG = {"params": {
+    "lambda_ns": {"scale": [0.5, 1.5]},
+    "veh_throughput": {"range": [1, 4]},
+    "yellow": {"range": [2, 5]},
+    "switch_w": {"range": [0.1, 1.0], "every": 7},
+}}
+
+def rollout(env, steps):
+    obs = env.reset()
+    infos = []
+    for _ in range(steps):
+        obs, _, _, info = env.step(np.zeros(env.num_envs, dtype=np.int64))
+        infos.append(info)
+    return infos
+
+class TestBatchRandomize(unittest.TestCase):
+    def test_params_applied_and_independent_of_env_count(self):
+        small = BatchRandomize(BatchedTrafficEnv(3, seed=0, lambda_ns=0.4, episode_len=20), CFG, seed=5)
+        large = BatchRandomize(BatchedTrafficEnv(8, seed=0, lambda_ns=0.4, episode_len=20), CFG, seed=5)
+        rollout(small, 45)
+        rollout(large, 45)
+        np.testing.assert_array_equal(small.values, large.values[:3])
+        base = large.venv
+        j = small.names.index("lambda_ns")
+        self.assertTrue(np.all((large.values[:, j] >= 0.2) & (large.values[:, j] <= 0.6)))
+        np.testing.assert_array_equal(base.lambda_ns, large.values[:, j])
+        np.testing.assert_array_equal(base.veh_throughput, large.values[:, small.names.index("veh_throughput")])
+        np.testing.assert_array_equal(base.yellow_dur, large.values[:, small.names.index("yellow")])
+        self.assertTrue(np.all(np.isin(base.veh_throughput, [1, 2, 3, 4])))
+
+    def test_episode_and_schedule_infos(self):
+        env = BatchRandomize(BatchedTrafficEnv(4, seed=1, episode_len=20), CFG, seed=2)
+        env.reset()
+        start = env.values.copy()
+        zeros = np.zeros(4, dtype=np.int64)
+        infos = [env.step(zeros)[3] for _ in range(20)]
+        updates = [t for t, info in enumerate(infos) if "rand_update" in info[0]]
+        self.assertEqual(updates, [6, 13])
+        self.assertEqual(list(infos[6][0]["rand_update"]), ["switch_w"])
+        j = env.names.index("switch_w")
+        self.assertNotEqual(infos[6][0]["rand_update"]["switch_w"], start[0, j])
+        done = infos[19]
+        for i in range(4):
+            self.assertEqual(done[i]["rand"], {name: start[i, k] for k, name in enumerate(env.names)})
+        # The next episode started with fresh draws from the same streams.
+        self.assertFalse(np.array_equal(env.values, start))
+        np.testing.assert_array_equal(env.start_values, env.values)
+
+    def test_params_checked_against_the_env(self):
+        ped = {"params": {"lambda_p_ns": {"scale": [0.5, 1.5]}}}
+        with self.assertRaisesRegex(ValueError, "lambda_p_ns"):
+            BatchRandomize(BatchedTrafficEnv(2, seed=0, episode_len=20), ped)
+        env = BatchRandomize(BatchedSignalEnv(2, seed=0, table="protected_left_ped", episode_len=20), ped, seed=1)
+        rollout(env, 3)
+        np.testing.assert_array_equal(env.venv.lambda_p_ns, env.values[:, 0])
+
+    def test_per_env_set_attr_fallback(self):
+        venv = DummyVecEnv([lambda s=s: TrafficEnv(seed=s, episode_len=15, fast=True) for s in range(2)])
+        env = BatchRandomize(venv, {"params": {"lambda_ew": {"range": [0.1, 0.9]}, "min_green": {"range": [4, 9]}}}, seed=0)
+        rollout(env, 16)
+        self.assertEqual(venv.get_attr("lambda_ew"), list(env.values[:, 0]))
+        self.assertEqual(venv.get_attr("min_green"), [int(v) for v in env.values[:, 1]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from envs.batched_env import BatchedTrafficEnv
+from envs.recorder import EpisodeRecorder, Replay, vec_schema
+
+KW = dict(min_green=4, yellow=2, episode_len=30)
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_rows_survive_chunk_boundaries(self, compress=True):
+        path = os.path.join(self.dir.name, "rec")
+        rows = []
+        with EpisodeRecorder(path, schema=vec_schema(3), chunk_rows=7, compress=compress) as rec:
+            for t in range(1, 6):
+                block = {
+                    "env": np.arange(4), "episode": np.zeros(4), "t": np.full(4, t),
+                    "obs": np.full((4, 3), t, dtype=np.float32), "action": np.arange(4) % 2,
+                    "reward": np.arange(4) + 0.5 * t,
+                }
+                rec.append(**block)
+                rows.append(block)
+        replay = Replay(path)
+        self.assertEqual(len(replay), 20)
+        self.assertEqual(replay.n_chunks, 3)
+        np.testing.assert_array_equal(replay.column("env"), np.concatenate([r["env"] for r in rows]))
+        np.testing.assert_allclose(replay.column("reward"), np.concatenate([r["reward"] for r in rows]))
+        ep = replay.episode(2, 0)
+        np.testing.assert_array_equal(ep["t"], np.arange(1, 6))
+        np.testing.assert_allclose(ep["obs"][:, 0], np.arange(1, 6))
+        entry = next(e for e in replay.episodes() if e["env"] == 2)
+        self.assertEqual(entry["steps"], 5)
+        self.assertAlmostEqual(entry["return"], sum(2 + 0.5 * t for t in range(1, 6)))
+        page = replay.since(2, 0, seq=3, limit=10)
+        self.assertEqual((page["from"], page["next"]), (3, 5))
+        self.assertEqual(page["columns"]["t"], [4, 5])
+
+    def test_uncompressed_chunks_are_memory_mapped(self):
+        self.test_rows_survive_chunk_boundaries(compress=False)
+        replay = Replay(os.path.join(self.dir.name, "rec"))
+        self.assertIsInstance(replay.chunk(0)["reward"], np.memmap)
+
+    def test_batched_env_records_raw_steps(self):
+        path = os.path.join(self.dir.name, "train")
+        n = 3
+        ref = BatchedTrafficEnv(n, seed=5, **KW)
+        env = BatchedTrafficEnv(n, seed=5, normalize=True, record={"path": path, "chunk_rows": 16}, **KW)
+        ref.reset()
+        env.reset()
+        rng = np.random.default_rng(0)
+        rewards = []
+        for _ in range(45):
+            a = rng.integers(0, 2, size=n)
+            ref.step_async(a)
+            _, r, _, _ = ref.step_wait()
+            env.step(a)
+            rewards.append(r)
+        env.close()
+        replay = Replay(path)
+        self.assertEqual(len(replay), 45 * n)
+        np.testing.assert_allclose(replay.column("reward"), np.concatenate(rewards), rtol=1e-6)
+        eps = {(e["env"], e["episode"]): e["steps"] for e in replay.episodes()}
+        self.assertEqual(eps, {**{(i, 0): 30 for i in range(n)}, **{(i, 1): 15 for i in range(n)}})
+        first = replay.episode(1, 0)
+        np.testing.assert_array_equal(first["t"], np.arange(1, 31))
+        self.assertTrue(np.all(first["obs"] >= 0.0) and np.all(first["obs"] <= 1.0))
+
+if __name__ == "__main__":
+    unittest.main()
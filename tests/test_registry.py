@@ -0,0 +1,57 @@
+import os
+import tempfile
+import threading
+import unittest
+from api.registry import ModelRegistry, parse_policies
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.loads = []
+        self.gate = threading.Event()
+        self.gate.set()
+    def tearDown(self):
+        self.dir.cleanup()
+    def loader(self, path, device):
+        self.gate.wait(5)
+        self.loads.append(path)
+        with open(path) as f:
+            return ("model", f.read())
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+    def test_cache_by_path_and_mtime_with_lru(self):
+        reg = ModelRegistry(loader=self.loader, max_models=2)
+        a = self.write("a.zip", "a1", mtime=1000)
+        b = self.write("b.zip", "b")
+        c = self.write("c.zip", "c")
+        self.assertIs(reg.load(a), reg.load(a))
+        self.assertEqual(len(self.loads), 1)
+        self.write("a.zip", "a2", mtime=2000)
+        self.assertEqual(reg.load(a), ("model", "a2"))
+        reg.load(b)
+        reg.load(c)
+        reg.load(a)
+        self.assertEqual(len(self.loads), 5)
+        self.assertEqual(reg.status()["hits"], 1)
+    def test_async_swap_keeps_previous_model_until_loaded(self):
+        swapped = []
+        reg = ModelRegistry(loader=self.loader, on_swap=lambda name, m: swapped.append((name, m)))
+        old = reg.swap("default", self.write("old.zip", "old"))
+        self.gate.clear()
+        thread = reg.swap_async("default", self.write("new.zip", "new"))
+        self.assertIs(reg.get("default"), old)
+        self.assertEqual(reg.status()["policies"]["default"]["loading"], os.path.join(self.dir.name, "new.zip"))
+        self.gate.set()
+        thread.join(5)
+        self.assertEqual(reg.get("default"), ("model", "new"))
+        self.assertEqual([name for name, _ in swapped], ["default", "default"])
+    def test_parse_policies(self):
+        self.assertEqual(parse_policies("a.zip, fast=b.zip"), {"default": "a.zip", "fast": "b.zip"})
+
+if __name__ == '__main__':
+    unittest.main()
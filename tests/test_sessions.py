@@ -0,0 +1,69 @@
+import threading
+import unittest
+from api.sessions import Session, SessionPool
+from envs.traffic_env import TrafficEnv
+
+class TestSessionPool(unittest.TestCase):
+    def make_pool(self, **kw):
+        return SessionPool(lambda sid: Session(sid, TrafficEnv(seed=0)), **kw)
+    def test_sessions_are_isolated(self):
+        pool = self.make_pool()
+        a = pool.get("a")
+        b = pool.get("b")
+        for _ in range(3):
+            a.env.step(0)
+        self.assertEqual(a.env.t, 3)
+        self.assertEqual(b.env.t, 0)
+        self.assertIs(pool.get("a"), a)
+    def test_lru_and_idle_eviction(self):
+        pool = self.make_pool(max_sessions=2, idle_ttl=60.0)
+        pool.get("a")
+        pool.get("b")
+        pool.get("a")
+        pool.get("c")
+        self.assertEqual(sorted(s.id for s in pool.snapshot()), ["a", "c"])
+        for sess in pool.snapshot():
+            sess.last_used -= 120.0
+        pool.get("d")
+        self.assertEqual([s.id for s in pool.snapshot()], ["d"])
+        self.assertEqual(pool.evicted, 3)
+    def test_evicted_sessions_are_reported_then_closed(self):
+        evicted = []
+        pool = self.make_pool(max_sessions=1, on_evict=lambda sess: evicted.append((sess.id, sess.closed)))
+        a = pool.get("a")
+        pool.get("b")
+        self.assertEqual(evicted, [("a", False)])
+        self.assertTrue(a.closed)
+    def test_touch_keeps_session_alive(self):
+        pool = self.make_pool(max_sessions=2, idle_ttl=60.0)
+        a = pool.get("a")
+        pool.get("b")
+        a.last_used -= 120.0
+        self.assertTrue(pool.touch("a"))
+        pool.get("c")
+        self.assertEqual(sorted(s.id for s in pool.snapshot()), ["a", "c"])
+        self.assertFalse(pool.touch("b"))
+    def test_slow_factory_does_not_block_other_sessions(self):
+        started, release = threading.Event(), threading.Event()
+        def factory(sid):
+            if sid == "slow":
+                started.set()
+                release.wait(10)
+            return Session(sid, TrafficEnv(seed=0))
+        pool = SessionPool(factory)
+        pool.get("a")
+        results = []
+        slow = [threading.Thread(target=lambda: results.append(pool.get("slow"))) for _ in range(2)]
+        for t in slow:
+            t.start()
+        self.assertTrue(started.wait(10))
+        self.assertEqual(pool.get("a").id, "a")
+        self.assertEqual(pool.get("b").id, "b")
+        release.set()
+        for t in slow:
+            t.join(10)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(len(pool), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from envs.batched_env import BatchedTrafficEnv
+from envs.shm_vec_env import ShmVecEnv
+from envs.traffic_env import TrafficEnv
+
+class TestShmVecEnv(unittest.TestCase):
+    def test_matches_batched_env(self):
+        kw = dict(min_green=4, yellow=2, episode_len=50, decision_interval=2)
+        n = 5
+        ref = BatchedTrafficEnv(n, seed=11, **kw)
+        env = ShmVecEnv(n, num_workers=2, seed=11, **kw)
+        try:
+            ref.seed(4)
+            env.seed(4)
+            self.assertTrue(np.array_equal(ref.reset(), env.reset()))
+            env.set_attr("lambda_ns", 1.2, indices=[3])
+            ref.set_attr("lambda_ns", 1.2, indices=[3])
+            self.assertEqual(env.get_attr("lambda_ns", indices=[3]), [1.2])
+            rng = np.random.default_rng(0)
+            for _ in range(120):
+                actions = rng.integers(0, 2, size=n)
+                o1, r1, d1, i1 = ref.step(actions)
+                o2, r2, d2, i2 = env.step(actions)
+                self.assertTrue(np.array_equal(o1, o2))
+                self.assertTrue(np.array_equal(r1, r2))
+                self.assertTrue(np.array_equal(d1, d2))
+                for k in np.flatnonzero(d1):
+                    self.assertTrue(np.array_equal(i1[k]["terminal_observation"], i2[k]["terminal_observation"]))
+        finally:
+            env.close()
+
+    def test_worker_error_is_raised(self):
+        env = ShmVecEnv(4, num_workers=2, seed=0, episode_len=20)
+        try:
+            env.reset()
+            env.set_attr("lambda_ns", -1.0, indices=[3])
+            with self.assertRaisesRegex(RuntimeError, "worker 1"):
+                env.step(np.zeros(4, dtype=np.int64))
+            # The worker survives the failed step and still answers.
+            self.assertEqual(env.get_attr("lambda_ns", indices=[3]), [-1.0])
+        finally:
+            env.close()
+
+    def test_env_method_runs_on_owning_workers(self):
+        env = ShmVecEnv(4, num_workers=2, seed=0, episode_len=20)
+        try:
+            env.reset()
+            env.set_params([2, 1], {"lambda_ns": [1.1, 0.9]})
+            self.assertEqual(env.get_attr("lambda_ns", indices=[2, 1]), [1.1, 0.9])
+            env.set_attr("lambda_ew", np.array([0.3, 0.4]), indices=[1, 2])
+            self.assertEqual(env.get_attr("lambda_ew", indices=[1, 2]), [0.3, 0.4])
+            results = env.env_method("reset", seed=5, indices=[1, 3])
+            self.assertEqual(len(results), 2)
+            np.testing.assert_array_equal(results[1][0], TrafficEnv(episode_len=20).reset(seed=5)[0])
+            with self.assertRaisesRegex(AttributeError, "no per-env method 'set_params'"):
+                env.env_method("set_params", {"lambda_ns": [1.0]})
+        finally:
+            env.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from envs.batched_env import BatchedTrafficEnv
+from envs.phases import make_phase_table
+from envs.signal_env import BatchedSignalEnv, SignalBatch, SignalEnv
+
+class TestSignalEnv(unittest.TestCase):
+    def test_two_phase_table_matches_batched_env(self):
+        kw = dict(min_green=4, yellow=2, episode_len=50, hold_w=0.02, imbalance_w=0.05)
+        n = 5
+        ref = BatchedTrafficEnv(n, seed=11, **kw)
+        env = BatchedSignalEnv(n, seed=11, table="two_phase", **kw)
+        np.testing.assert_array_equal(ref.reset(), env.reset())
+        rng = np.random.default_rng(0)
+        for _ in range(120):
+            switch = rng.integers(0, 2, size=n)
+            o1, r1, d1, _ = ref.step(switch)
+            # "Switch" is a request for the other phase.
+            o2, r2, d2, _ = env.step(np.where(switch == 1, 1 - env.phase, env.phase))
+            np.testing.assert_array_equal(o1, o2)
+            np.testing.assert_array_equal(r1, r2)
+            np.testing.assert_array_equal(d1, d2)
+
+    def test_env_method_calls_each_env(self):
+        env = BatchedSignalEnv(3, seed=0, table="two_phase")
+        env.reset()
+        env.step(np.ones(3, dtype=np.int64))
+        (obs, info), = env.env_method("reset", seed=5, indices=[2])
+        ref_obs, _ = SignalEnv(table="two_phase").reset(seed=5)
+        np.testing.assert_array_equal(obs, ref_obs)
+        self.assertEqual(info["t"], 0)
+        with self.assertRaisesRegex(AttributeError, "no per-env method 'rates'"):
+            env.env_method("rates")
+
+    def test_phase_table_walk_clearance_and_saturation(self):
+        batch = SignalBatch(1, table="protected_left_ped", min_green=10, yellow=3)
+        tbl = batch.table
+        m = {name: j for j, name in enumerate(tbl.movements)}
+        batch.queues[0] = [20, 5, 20, 5, 100, 100]
+        none = np.zeros((1, tbl.n_movements), dtype=np.int64)
+        ns = tbl.phases.index("ns")
+        batch.phase[:] = ns
+        peds = []
+        for _ in range(10):
+            batch.advance(np.array([ns]), none)
+            peds.append(int(batch.served[0, m["ped_ns"]]))
+        # Walk for 7 steps at 10/step, then pedestrian clearance while NS keeps green.
+        self.assertEqual(peds, [10] * 7 + [0] * 3)
+        self.assertEqual(batch.queues[0, m["ns"]], 0)
+        self.assertEqual(batch.queues[0, m["ns_left"]], 5)
+        left = tbl.phases.index("ns_left")
+        batch.advance(np.array([left]), none)
+        self.assertEqual((int(batch.phase[0]), int(batch.clear_left[0])), (left, 3))
+        for _ in range(3):
+            batch.advance(np.array([left]), none)
+            self.assertEqual(int(batch.served.sum()), 0)
+        batch.advance(np.array([left]), none)
+        # Protected left discharges at its own saturation flow of 1.
+        self.assertEqual(int(batch.served[0, m["ns_left"]]), 1)
+        # Its 4-step min_green (not the env's 10) gates the next change.
+        ew = tbl.phases.index("ew")
+        for _ in range(3):
+            batch.advance(np.array([ew]), none)
+        self.assertEqual(int(batch.phase[0]), left)
+        batch.advance(np.array([left]), none)
+        self.assertEqual(int(batch.phase[0]), ew)
+
+    def test_scalar_env_pedestrians(self):
+        env = SignalEnv(seed=3, table="protected_left_ped", episode_len=200)
+        obs, info = env.reset()
+        self.assertEqual(obs.shape, (11,))
+        self.assertEqual(env.action_space.n, 4)
+        env.lambda_p_ns = 0.8
+        self.assertEqual(env.lambda_p_ns, 0.8)
+        served_p = 0
+        truncated = False
+        t = 0
+        while not truncated:
+            obs, reward, terminated, truncated, info = env.step(t // 20 % 4)
+            served_p += info["served_p"]
+            t += 1
+        self.assertEqual(t, 200)
+        self.assertEqual(served_p, env.total_served_p)
+        self.assertGreater(served_p, 0)
+
+    def test_table_validation(self):
+        with self.assertRaises(ValueError):
+            make_phase_table("nope")
+        with self.assertRaises(ValueError):
+            make_phase_table({"movements": [{"name": "a"}], "phases": [{"name": "p", "serves": ["b"]}]})
+        custom = make_phase_table({"preset": "two_phase", "phases": [
+            {"name": "ns", "serves": ["ns"], "min_green": 20}, {"name": "ew", "serves": ["ew"]}]})
+        self.assertEqual(custom.min_green.tolist(), [20, -1])
+
+if __name__ == '__main__':
+    unittest.main()
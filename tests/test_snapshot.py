@@ -0,0 +1,34 @@
+import json
+import unittest
+import numpy as np
+from envs.traffic_env import TrafficEnv
+
+def rollout(env, actions):
+    out = []
+    for a in actions:
+        obs, reward, _, truncated, info = env.step(int(a))
+        out.append((obs.tolist(), reward, truncated, dict(info)))
+    return out
+
+class TestSnapshot(unittest.TestCase):
+    def test_restore_replays_identically(self):
+        actions = np.random.default_rng(0).integers(0, 2, size=120)
+        for fast in (False, True):
+            env = TrafficEnv(seed=1, fast=fast, episode_len=150, prefetch=16)
+            rollout(env, actions[:37])
+            state = json.loads(json.dumps(env.get_state()))
+            first = rollout(env, actions)
+            rollout(env, actions[:5])
+            env.set_state(state)
+            self.assertEqual(rollout(env, actions), first)
+    def test_state_moves_between_modes(self):
+        src = TrafficEnv(seed=2, fast=True, prefetch=8)
+        rollout(src, [0, 1, 0, 0, 1] * 5)
+        dst = TrafficEnv(seed=99, fast=False)
+        obs = dst.set_state(src.get_state())
+        self.assertTrue(np.array_equal(obs, src._obs()))
+        actions = [1, 0, 0] * 10
+        self.assertEqual(rollout(dst, actions), rollout(src, actions))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("torch", "stable_baselines3", "numba")
+
+def loaded_modules(code):
+    out = subprocess.run([sys.executable, "-c", code + "\nimport sys; print(' '.join(sys.modules))"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(out.stdout.split())
+
+class TestStartup(unittest.TestCase):
+    def test_server_import_is_light(self):
+        mods = loaded_modules("import api.server")
+        for name in HEAVY:
+            self.assertNotIn(name, mods)
+
+    def test_train_help_is_light(self):
+        mods = loaded_modules("import train.train_ppo")
+        for name in HEAVY:
+            self.assertNotIn(name, mods)
+        out = subprocess.run([sys.executable, "-m", "train.train_ppo", "--help"], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(out.returncode, 0)
+        self.assertIn("--resume_from", out.stdout)
+
+    def test_ready_after_warmup(self):
+        from api import server
+        app = server.create_app(os.path.join(ROOT, "train", "config.yaml"), policies={})
+        client = app.test_client()
+        deadline = time.monotonic() + 10
+        while True:
+            resp = client.get("/ready")
+            if resp.status_code == 200 or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.get_json()["ready"])
+        self.assertEqual(client.post("/step", json={"mode": "fixed"}).status_code, 200)
+
+if __name__ == "__main__":
+    unittest.main()
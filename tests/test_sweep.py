@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from train.sweep import Sweep, apply_params, eval_config, sample_params
+
+SPACE = {
+    "learning_rate": {"type": "loguniform", "low": 1e-5, "high": 1e-3},
+    "env.wait_w": {"type": "uniform", "low": 0.5, "high": 1.5},
+    "n_epochs": {"type": "choice", "values": [5, 10]},
+}
+
+def drain(sweep, score_fn, limit=1000):
+    runs = []
+    while len(runs) < limit:
+        job = sweep.next_job()
+        if job is None:
+            return runs
+        trial, params, rung = job
+        sweep.start(trial)
+        sweep.record(trial, rung, sweep.budget(rung), score_fn(params, rung), 0.0)
+        runs.append((trial, rung))
+    raise AssertionError("sweep did not terminate")
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "sweeps.sqlite")
+    def tearDown(self):
+        self.tmp.cleanup()
+    def test_params(self):
+        p = sample_params(SPACE, np.random.default_rng(0))
+        self.assertTrue(1e-5 <= p["learning_rate"] <= 1e-3)
+        self.assertIn(p["n_epochs"], (5, 10))
+        cfg = apply_params({"env": {"wait_w": 1.0, "max_w": 0.1}, "n_epochs": 10}, p)
+        self.assertEqual(cfg["env"], {"wait_w": p["env.wait_w"], "max_w": 0.1})
+        scored = eval_config({"env": {"wait_w": 1.0, "max_w": 0.1}, "n_epochs": 10}, p)
+        self.assertEqual(scored["env"], {"wait_w": 1.0, "max_w": 0.1})
+        self.assertEqual(scored["n_epochs"], p["n_epochs"])
+    def test_asha_promotes_best(self):
+        sweep = Sweep(self.db, "s", SPACE, n_trials=9, min_timesteps=10, eta=3, max_rung=2)
+        runs = drain(sweep, lambda p, r: p["env.wait_w"])
+        rungs = [r for _, r in runs]
+        self.assertEqual(rungs.count(0), 9)
+        # Asynchronous promotion can advance a few early leaders past the
+        # synchronous 9/3/1 schedule, never fewer.
+        self.assertGreaterEqual(rungs.count(1), 3)
+        self.assertGreaterEqual(rungs.count(2), 1)
+        self.assertLess(rungs.count(1), 9)
+        board = sweep.leaderboard()
+        best = max(range(9), key=lambda t: sweep._trials("AND trial=?", (t,))[0][1]["env.wait_w"])
+        self.assertEqual((board[0]["trial"], board[0]["rung"]), (best, 2))
+        self.assertEqual(sweep.budget(2), 90)
+    def test_resume_after_crash(self):
+        sweep = Sweep(self.db, "s", SPACE, n_trials=4, min_timesteps=10, eta=2, max_rung=1)
+        trial, params, rung = sweep.next_job()
+        sweep.start(trial)
+        sweep.db.close()
+        # A fresh process sees the interrupted trial as idle and reruns it first.
+        resumed = Sweep(self.db, "s", SPACE, n_trials=4, min_timesteps=10, eta=2, max_rung=1)
+        self.assertEqual(resumed.next_job(), (trial, params, 0))
+        runs = drain(resumed, lambda p, r: -p["learning_rate"])
+        self.assertEqual([r for _, r in runs].count(0), 4)
+        self.assertGreaterEqual([r for _, r in runs].count(1), 2)
+
+if __name__ == '__main__':
+    unittest.main()
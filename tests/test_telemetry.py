@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from api.telemetry import Telemetry, LatencyHistogram, prometheus_text
+
+class TestTelemetry(unittest.TestCase):
+    def test_ring_history_and_window_aggregates(self):
+        tel = Telemetry(capacity=50, window=20)
+        rng = np.random.default_rng(0)
+        q = rng.integers(0, 15, size=(130, 2))
+        served = rng.integers(0, 4, size=130)
+        for i in range(130):
+            tel.append(1, i + 1, q[i, 0], q[i, 1], i % 2, 0, -1.5, served[i])
+            if i % 17 == 0:
+                total = q[max(0, i - 19):i + 1].sum(axis=1)
+                agg = tel.aggregates()
+                self.assertEqual(agg["queue_p50"], np.percentile(total, 50, method="inverted_cdf"))
+                self.assertEqual(agg["queue_p95"], np.percentile(total, 95, method="inverted_cdf"))
+                self.assertAlmostEqual(agg["served_per_min"], served[max(0, i - 19):i + 1].sum() * 60.0 / len(total))
+        out = tel.since(0)
+        self.assertEqual((out["from"], out["next"]), (80, 130))
+        self.assertEqual(out["columns"]["q_ns"], q[80:, 0].tolist())
+        delta = tel.since(125, limit=3)
+        self.assertEqual((delta["from"], delta["next"]), (125, 128))
+        self.assertEqual(delta["columns"]["t"], [126, 127, 128])
+        self.assertEqual(tel.since(130)["columns"]["t"], [])
+    def test_prometheus_histogram(self):
+        hist = LatencyHistogram(buckets=(0.01, 0.1))
+        for s in (0.005, 0.05, 0.05, 2.0):
+            hist.observe(s)
+        text = prometheus_text(counters=[("x_total", "X", [({}, 3)])], histograms=[("lat_seconds", "L", [({"policy": "a"}, hist)])])
+        self.assertIn("x_total 3\n", text)
+        self.assertIn('lat_seconds_bucket{policy="a",le="0.1"} 3\n', text)
+        self.assertIn('lat_seconds_bucket{policy="a",le="+Inf"} 4\n', text)
+        self.assertIn('lat_seconds_count{policy="a"} 4\n', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import yaml
+from envs.recorder import EpisodeRecorder, Replay
+from train.evaluate import _floats, _init_worker, build_controller
+
+# Dataset rows: ``obs`` is the observation the controller acted on (unlike a
+# vec env recording, where it is the one after the step) and ``ret`` the
+# discounted return from that step to the end of the episode.
+DATASET_SCHEMA = {
+    "env": (np.int32, ()),
+    "episode": (np.int32, ()),
+    "t": (np.int32, ()),
+    "obs": (np.float32, (5,)),
+    "action": (np.int16, ()),
+    "reward": (np.float32, ()),
+    "ret": (np.float32, ()),
+}
+
+
+def discounted_returns(rewards, gamma):
+    """Return-to-go along axis 0 of a (steps, envs) reward array."""
+    out = np.empty_like(rewards, dtype=np.float64)
+    acc = np.zeros(rewards.shape[1:], dtype=np.float64)
+    for t in range(len(rewards) - 1, -1, -1):
+        acc = rewards[t] + gamma * acc
+        out[t] = acc
+    return out
+
+
+def generate_shard(path, spec, env_cfg, seeds, gamma=0.99, lambda_ns=None, lambda_ew=None, chunk_rows=1 << 16):
+    """Run one episode per seed of controller ``spec`` on a BatchedTrafficEnv
+    and write it to ``path`` as an episode recording in DATASET_SCHEMA.
+
+    Rows are written episode by episode, so each episode is contiguous.
+    Returns the shard's entry for dataset.json.
+    """
+    from envs.batched_env import BatchedTrafficEnv
+    ctrl = build_controller(spec)
+    env_cfg = {k: v for k, v in env_cfg.items() if k != "fast"}
+    if lambda_ns is not None:
+        env_cfg["lambda_ns"] = lambda_ns
+    if lambda_ew is not None:
+        env_cfg["lambda_ew"] = lambda_ew
+    env = BatchedTrafficEnv(len(seeds), seeds=seeds, **env_cfg)
+    obs = env.reset()
+    ctrl.reset(env)
+    n, steps = env.num_envs, int(env.episode_len.max())
+    obs_log = np.empty((steps, n, 5), dtype=np.float32)
+    actions = np.empty((steps, n), dtype=np.int16)
+    rewards = np.empty((steps, n), dtype=np.float64)
+    for t in range(steps):
+        obs_log[t] = obs
+        action = ctrl.act(env, obs)
+        actions[t] = action
+        rewards[t] = env.step_arrays(action)
+        ctrl.observe(env)
+        obs = env._obs()
+    # Envs with a shorter episode_len stop counting at their own end.
+    live = np.arange(steps)[:, None] < env.episode_len[None, :]
+    rewards *= live
+    ret = discounted_returns(rewards, gamma)
+    meta = {"controller": ctrl.name, "lambda_ns": env_cfg.get("lambda_ns"), "lambda_ew": env_cfg.get("lambda_ew"),
+            "seeds": [int(s) for s in seeds], "gamma": gamma}
+    with EpisodeRecorder(path, schema=DATASET_SCHEMA, chunk_rows=chunk_rows, meta=meta) as rec:
+        for i in range(n):
+            k = int(env.episode_len[i])
+            rec.append(env=i, episode=0, t=np.arange(k), obs=obs_log[:k, i], action=actions[:k, i],
+                       reward=rewards[:k, i], ret=ret[:k, i])
+    return {"path": os.path.basename(path), "rows": int(live.sum()),
+            "mean_return": float(rewards.sum(axis=0).mean()), **meta}
+
+
+def shard_paths(data_dir):
+    with open(os.path.join(data_dir, "dataset.json"), "r") as f:
+        index = json.load(f)
+    return [os.path.join(data_dir, s["path"]) for s in index["shards"]]
+
+
+def iter_minibatches(paths, batch_size, rng, columns=("obs", "action"), shuffle_chunks=4):
+    """One pass over the shards in random order, as shuffled minibatches.
+
+    Chunks are read ``shuffle_chunks`` at a time and their rows shuffled
+    together, so memory stays at a few chunks however large the dataset is.
+    The last, partial minibatch of each group is yielded too.
+    """
+    chunks = [(p, k) for p in paths for k in range(Replay(p).n_chunks)]
+    order = rng.permutation(len(chunks))
+    readers = {}
+    for g in range(0, len(order), max(1, shuffle_chunks)):
+        parts = []
+        for j in order[g:g + shuffle_chunks]:
+            p, k = chunks[j]
+            reader = readers.setdefault(p, Replay(p))
+            data = reader.chunk(k)
+            parts.append({c: np.asarray(data[c]) for c in columns})
+        group = {c: np.concatenate([part[c] for part in parts]) for c in columns}
+        perm = rng.permutation(len(group[columns[0]]))
+        for s in range(0, len(perm), batch_size):
+            idx = perm[s:s + batch_size]
+            yield {c: arr[idx] for c, arr in group.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate an offline dataset from heuristic controllers")
+    parser.add_argument("--config", default="train/config.yaml")
+    parser.add_argument("--controllers", default="longest_queue", help="Comma-separated controller specs as in train.evaluate (fixed:<cycle>, longest_queue, max_pressure, mpc)")
+    parser.add_argument("--shards", type=int, default=8, help="Shards per controller and demand level")
+    parser.add_argument("--envs_per_shard", type=int, default=64, help="Episodes (seeds) per shard, stepped as one batched env")
+    parser.add_argument("--lambda_ns", default=None, help="Comma-separated NS demand levels (default: config)")
+    parser.add_argument("--lambda_ew", default=None, help="Comma-separated EW demand levels (default: config)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out_dir", default="results/datasets/heuristic")
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    if cfg.get("signal"):
+        raise ValueError("dataset generation supports the two-phase env only")
+    env_cfg = cfg["env"]
+    base_seed = cfg.get("seed", 42)
+    gamma = cfg.get("gamma", 0.99)
+    specs = [s for s in args.controllers.split(",") if s]
+    ns_levels = _floats(args.lambda_ns) if args.lambda_ns else [env_cfg["lambda_ns"]]
+    ew_levels = _floats(args.lambda_ew) if args.lambda_ew else [env_cfg["lambda_ew"]]
+    jobs = list(itertools.product(specs, ns_levels, ew_levels, range(args.shards)))
+    os.makedirs(args.out_dir, exist_ok=True)
+    shards = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker) as pool:
+        futures = []
+        for j, (spec, lns, lew, _) in enumerate(jobs):
+            # Disjoint seed ranges per shard, and from the evaluation seeds.
+            seeds = [base_seed + 1_000_000 + j * args.envs_per_shard + i for i in range(args.envs_per_shard)]
+            path = os.path.join(args.out_dir, f"shard_{j:05d}")
+            futures.append(pool.submit(generate_shard, path, spec, env_cfg, seeds, gamma, lns, lew))
+        for fut in futures:
+            shards.append(fut.result())
+            print(json.dumps({k: shards[-1][k] for k in ("path", "controller", "rows", "mean_return")}))
+    with open(os.path.join(args.out_dir, "dataset.json"), "w") as f:
+        json.dump({"config": args.config, "gamma": gamma, "rows": sum(s["rows"] for s in shards), "shards": shards}, f, indent=2)
+    print(os.path.join(args.out_dir, "dataset.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 import os
+import argparse
 import yaml
-from stable_baselines3 import PPO
 from envs.traffic_env import TrafficEnv
 
-def run_episode(env, model):
+def run_episode(env, model, recorder=None, episode=0):
     obs, info = env.reset()
     done = False
     trunc = False
@@ -17,6 +17,10 @@ def run_episode(env, model):
         a = int(action)
         action_counts[a] = action_counts.get(a, 0) + 1
         obs, reward, done, trunc, info = env.step(a)
+        if recorder is not None:
+            recorder.append(env=0, episode=episode, t=info.get("t", 0), obs=obs, action=a, reward=reward,
+                            q_ns=info.get("q_ns", 0), q_ew=info.get("q_ew", 0), phase=info.get("phase", 0),
+                            served=info.get("served_v", 0))
         total_reward += reward
         total_q += info.get("q_ns", 0) + info.get("q_ew", 0)
         served_v += info.get("served_v", 0)
@@ -24,17 +28,35 @@ def run_episode(env, model):
     avg_q = total_q / max(1, info.get("t", 1))
     return {"reward": total_reward, "avg_q": avg_q, "served_v": served_v, "switches": switches, "actions": action_counts}
 
+def load_model(path):
+    from envs.normalize import with_normalizer
+    if path.endswith(".npz"):
+        from api.numpy_policy import NumpyPolicy
+        return with_normalizer(NumpyPolicy.load(path), path)
+    from stable_baselines3 import PPO
+    return with_normalizer(PPO.load(path), path)
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="train/models/ppo_single_junction.zip", help="PPO .zip or exported NumPy .npz actor")
+    parser.add_argument("--record", default=None, help="Directory to record the episode's steps to (see envs/recorder.py)")
+    args = parser.parse_args()
     with open("train/config.yaml", "r") as f:
         cfg = yaml.safe_load(f)
-    path = "train/models/ppo_single_junction.zip"
+    path = args.model
     if not os.path.exists(path):
         print("missing model")
         return
     seed = cfg.get("seed", 42)
-    model = PPO.load(path)
+    model = load_model(path)
     env_base = TrafficEnv(seed=seed, **cfg["env"])
-    results = {"base": run_episode(env_base, model)}
+    recorder = None
+    if args.record:
+        from envs.recorder import EpisodeRecorder
+        recorder = EpisodeRecorder(args.record, meta={"model": path, "seed": seed})
+    results = {"base": run_episode(env_base, model, recorder)}
+    if recorder is not None:
+        recorder.close()
     print(results)
     os.makedirs('results', exist_ok=True)
     import json
@@ -0,0 +1,258 @@
+import os
+import csv
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import yaml
+
+METRICS = ("reward", "avg_q", "served_v", "switches")
+
+_models = {}
+
+
+class FixedCycle:
+    """Vectorized version of the eval_fixed.py controller."""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        self.name = f"fixed_{cycle}"
+
+    def reset(self, env):
+        self.phase_time = np.zeros(env.num_envs, dtype=np.int64)
+
+    def act(self, env, obs):
+        action = (self.phase_time >= self.cycle).astype(np.int64)
+        self.phase_time[action == 1] = 0
+        return action
+
+    def observe(self, env):
+        self.phase_time += env.yellow_left == 0
+
+
+class LongestQueue:
+    """Request a switch whenever the red approach holds more vehicles than the green one."""
+
+    name = "longest_queue"
+
+    def reset(self, env):
+        pass
+
+    def act(self, env, obs):
+        green_q = np.where(env.phase == 0, env.q_ns, env.q_ew)
+        red_q = np.where(env.phase == 0, env.q_ew, env.q_ns)
+        return ((red_q > green_q) & (env.yellow_left == 0)).astype(np.int64)
+
+    def observe(self, env):
+        pass
+
+
+class MaxPressure(LongestQueue):
+    """Longest-queue with hysteresis: the red queue must beat the green one by
+    the capacity lost to a yellow interval before switching pays off."""
+
+    name = "max_pressure"
+
+    def act(self, env, obs):
+        green_q = np.where(env.phase == 0, env.q_ns, env.q_ew)
+        red_q = np.where(env.phase == 0, env.q_ew, env.q_ns)
+        margin = env.veh_throughput * env.yellow_dur
+        return ((red_q - green_q > margin) & (env.yellow_left == 0)).astype(np.int64)
+
+
+class PolicyController:
+    """Saved PPO policy (.zip or exported .npz), one forward pass per step for all seeds."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+
+    def reset(self, env):
+        if self.path not in _models:
+            from api.registry import load_policy
+            _models[self.path] = load_policy(self.path, device="cpu")
+        self.model = _models[self.path]
+
+    def act(self, env, obs):
+        action, _ = self.model.predict(obs, deterministic=True)
+        return np.asarray(action, dtype=np.int64)
+
+    def observe(self, env):
+        pass
+
+
+class _Junction:
+    """Scalar view of junction i of a batched env, as the planner expects."""
+
+    def __init__(self, env, i):
+        self._env = env
+        self._i = i
+
+    def __getattr__(self, name):
+        value = getattr(self._env, name)
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self._env.num_envs,):
+            return value[self._i]
+        return value
+
+
+class MPCController:
+    """envs/planner.py rollout planner, one planner per seed."""
+
+    def __init__(self, horizon=None):
+        self.kwargs = {} if horizon is None else {"horizon": horizon}
+        self.name = "mpc" if horizon is None else f"mpc_{horizon}"
+
+    def reset(self, env):
+        from envs.planner import MPCPlanner
+        self.views = [_Junction(env, i) for i in range(env.num_envs)]
+        self.planners = [MPCPlanner(seed=i, **self.kwargs) for i in range(env.num_envs)]
+
+    def act(self, env, obs):
+        return np.array([p.act(v) for p, v in zip(self.planners, self.views)], dtype=np.int64)
+
+    def observe(self, env):
+        pass
+
+
+HEURISTICS = {"longest_queue": LongestQueue, "max_pressure": MaxPressure}
+
+
+def build_controller(spec):
+    kind, _, arg = spec.partition(":")
+    if kind == "fixed":
+        return FixedCycle(int(arg))
+    if kind == "ppo":
+        return PolicyController(arg)
+    if kind == "mpc":
+        return MPCController(int(arg) if arg else None)
+    if kind not in HEURISTICS:
+        names = ["fixed:<cycle>", "ppo:<path>", "mpc[:<horizon>]", *HEURISTICS]
+        raise ValueError(f"unknown controller {spec!r}; expected one of {', '.join(names)}")
+    return HEURISTICS[kind]()
+
+
+def run_scenario(spec, env_cfg, seeds, lambda_ns, lambda_ew):
+    """Run one episode per seed for one controller/demand pair; returns per-episode rows."""
+    from envs.batched_env import BatchedTrafficEnv
+    ctrl = build_controller(spec)
+    env_cfg = {k: v for k, v in env_cfg.items() if k != "fast"}
+    env_cfg.update(lambda_ns=lambda_ns, lambda_ew=lambda_ew)
+    env = BatchedTrafficEnv(len(seeds), seeds=seeds, **env_cfg)
+    obs = env.reset()
+    ctrl.reset(env)
+    total_q = np.zeros(env.num_envs, dtype=np.float64)
+    steps = int(env.episode_len.max())
+    for _ in range(steps):
+        action = ctrl.act(env, obs)
+        env.step_arrays(action)
+        ctrl.observe(env)
+        total_q += env.q_ns + env.q_ew
+        obs = env._obs()
+    avg_q = total_q / max(1, steps)
+    rows = []
+    for i, s in enumerate(seeds):
+        rows.append({
+            "controller": ctrl.name,
+            "lambda_ns": lambda_ns,
+            "lambda_ew": lambda_ew,
+            "seed": int(s),
+            "reward": float(env.total_reward[i]),
+            "avg_q": float(avg_q[i]),
+            "served_v": int(env.total_served_v[i]),
+            "switches": int(env.switches[i]),
+        })
+    return rows
+
+
+def _init_worker():
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def summarize(rows):
+    groups = {}
+    for r in rows:
+        groups.setdefault((r["controller"], r["lambda_ns"], r["lambda_ew"]), []).append(r)
+    out = []
+    for (ctrl, lns, lew), items in sorted(groups.items()):
+        for m in METRICS:
+            v = np.array([r[m] for r in items], dtype=np.float64)
+            half = 1.96 * v.std(ddof=1) / np.sqrt(len(v)) if len(v) > 1 else 0.0
+            out.append({
+                "controller": ctrl,
+                "lambda_ns": lns,
+                "lambda_ew": lew,
+                "metric": m,
+                "n": len(v),
+                "mean": float(v.mean()),
+                "std": float(v.std(ddof=1)) if len(v) > 1 else 0.0,
+                "ci95_low": float(v.mean() - half),
+                "ci95_high": float(v.mean() + half),
+            })
+    return out
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def _floats(s):
+    return [float(x) for x in s.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate controllers over seeds and demand levels")
+    parser.add_argument("--config", default="train/config.yaml")
+    parser.add_argument("--episodes", type=int, default=32, help="Seeds (episodes) per controller and scenario")
+    parser.add_argument("--fixed_cycles", default="120", help="Comma-separated fixed-cycle lengths")
+    parser.add_argument("--heuristics", default="longest_queue,max_pressure", help="Comma-separated heuristic controllers (also mpc or mpc:<horizon>)")
+    parser.add_argument("--models", nargs="*", default=[], help="Saved PPO .zip files or exported .npz policies to evaluate")
+    parser.add_argument("--lambda_ns", default=None, help="Comma-separated NS demand levels (default: config)")
+    parser.add_argument("--lambda_ew", default=None, help="Comma-separated EW demand levels (default: config)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out_dir", default="results")
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    env_cfg = cfg["env"]
+    base_seed = cfg.get("seed", 42)
+    seeds = [base_seed + i for i in range(args.episodes)]
+    specs = [f"fixed:{int(c)}" for c in _floats(args.fixed_cycles)]
+    specs += [h for h in args.heuristics.split(",") if h]
+    for p in args.models:
+        if not os.path.exists(p):
+            print(f"[WARN] Model not found: {p}")
+            continue
+        specs.append(f"ppo:{p}")
+    for spec in specs:
+        try:
+            build_controller(spec)
+        except ValueError as e:
+            parser.error(str(e))
+    ns_levels = _floats(args.lambda_ns) if args.lambda_ns else [env_cfg["lambda_ns"]]
+    ew_levels = _floats(args.lambda_ew) if args.lambda_ew else [env_cfg["lambda_ew"]]
+    jobs = list(itertools.product(specs, ns_levels, ew_levels))
+    rows = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker) as pool:
+        futures = [pool.submit(run_scenario, spec, env_cfg, seeds, lns, lew) for spec, lns, lew in jobs]
+        for fut in futures:
+            rows.extend(fut.result())
+    summary = summarize(rows)
+    os.makedirs(args.out_dir, exist_ok=True)
+    write_csv(os.path.join(args.out_dir, "eval_episodes.csv"), rows)
+    write_csv(os.path.join(args.out_dir, "eval_summary.csv"), summary)
+    for r in summary:
+        if r["metric"] == "reward":
+            print(json.dumps({k: r[k] for k in ("controller", "lambda_ns", "lambda_ew", "n", "mean", "ci95_low", "ci95_high")}))
+    print(os.path.join(args.out_dir, "eval_summary.csv"))
+
+
+if __name__ == "__main__":
+    main()
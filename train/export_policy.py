@@ -0,0 +1,57 @@
+import argparse
+import os
+import shutil
+import numpy as np
+from api.numpy_policy import NumpyPolicy
+from envs.normalize import norm_path
+
+ACTIVATION_NAMES = {"Tanh": "tanh", "ReLU": "relu", "Identity": "identity"}
+
+
+def to_numpy_policy(policy):
+    """Copy the actor of an SB3 ActorCriticPolicy into a NumpyPolicy."""
+    import torch.nn as nn
+    layers = [m for m in policy.mlp_extractor.policy_net if isinstance(m, nn.Linear)]
+    acts = {type(m).__name__ for m in policy.mlp_extractor.policy_net if not isinstance(m, nn.Linear)}
+    if len(acts) > 1 or not acts <= set(ACTIVATION_NAMES):
+        raise ValueError(f"unsupported activations: {sorted(acts)}")
+    layers.append(policy.action_net)
+    # torch Linear computes x @ W.T + b; store W.T so the runtime does x @ W + b.
+    weights = [layer.weight.detach().cpu().numpy().T for layer in layers]
+    biases = [layer.bias.detach().cpu().numpy() for layer in layers]
+    activation = ACTIVATION_NAMES[acts.pop()] if acts else "identity"
+    return NumpyPolicy(weights, biases, activation)
+
+
+def export(path, out=None):
+    """Write the deterministic actor of a saved PPO zip to an .npz file.
+
+    Saved normalization statistics are copied along when the output has a
+    different name.
+    """
+    from api.registry import load_policy
+    out = out or os.path.splitext(path)[0] + ".npz"
+    to_numpy_policy(load_policy(path, normalize=False)).save(out)
+    if os.path.exists(norm_path(path)) and norm_path(path) != norm_path(out):
+        shutil.copy2(norm_path(path), norm_path(out))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a PPO zip to a NumPy actor (.npz)")
+    parser.add_argument("model", nargs="?", default="train/models/ppo_single_junction.zip")
+    parser.add_argument("--out", default=None, help="Output path (default: model path with .npz)")
+    parser.add_argument("--check", type=int, default=4096, help="Random observations to compare against model.predict (0 skips)")
+    args = parser.parse_args()
+    out = export(args.model, args.out)
+    if args.check:
+        from api.registry import load_policy
+        obs = np.random.default_rng(0).random((args.check, 5), dtype=np.float32)
+        ref, _ = load_policy(args.model).predict(obs, deterministic=True)
+        got, _ = load_policy(out).predict(obs)
+        print(f"actions match on {int((ref == got).sum())}/{len(obs)} observations")
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import argparse
+import numpy as np
+import yaml
+from envs.normalize import Normalizer, norm_path
+from train.dataset import iter_minibatches, shard_paths
+from train.train_ppo import make_batched_env, new_model
+
+
+def fit_normalizer(paths, cfg, rng, batch_size=1 << 16):
+    """Normalizer statistics from the dataset, standing in for the ones PPO
+    would have collected: observations, and the discounted returns for the
+    reward scale (VecNormalize-style scaling divides by their std)."""
+    norm = Normalizer.make(cfg.get("normalize"), 1, cfg.get("gamma", 0.99))
+    if norm is None:
+        return None
+    for batch in iter_minibatches(paths, batch_size, rng, columns=("obs", "ret")):
+        norm.obs_rms.update(batch["obs"])
+        norm.ret_rms.update(batch["ret"])
+    norm._sync()
+    return norm
+
+
+def behavior_clone(model, paths, epochs=3, batch_size=1024, lr=3e-4, value_coef=0.5, normalizer=None, seed=0, log=print):
+    """Fit model.policy's action head to the dataset actions by maximum
+    likelihood and, with ``value_coef``, its value head to the recorded
+    returns. Returns per-epoch ``{"loss", "acc", "value_loss"}``."""
+    import torch
+    import torch.nn.functional as F
+    policy = model.policy
+    device = policy.device
+    opt = torch.optim.Adam(policy.parameters(), lr=lr)
+    rng = np.random.default_rng(seed)
+    ret_scale = 1.0
+    if normalizer is not None and normalizer.norm_reward:
+        ret_scale = 1.0 / float(np.sqrt(normalizer.ret_rms.var + normalizer.epsilon))
+    history = []
+    policy.set_training_mode(True)
+    for epoch in range(epochs):
+        total, nll_sum, correct, v_sum = 0, 0.0, 0, 0.0
+        for batch in iter_minibatches(paths, batch_size, rng, columns=("obs", "action", "ret")):
+            obs = batch["obs"] if normalizer is None else normalizer.normalize_obs(batch["obs"])
+            obs_t = torch.as_tensor(obs, device=device)
+            act_t = torch.as_tensor(batch["action"].astype(np.int64), device=device)
+            values, log_prob, _ = policy.evaluate_actions(obs_t, act_t)
+            nll = -log_prob.mean()
+            loss = nll
+            v_loss = torch.zeros((), device=device)
+            if value_coef:
+                target = torch.as_tensor(batch["ret"] * ret_scale, dtype=torch.float32, device=device)
+                v_loss = F.mse_loss(values.flatten(), target)
+                loss = loss + value_coef * v_loss
+            opt.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(policy.parameters(), model.max_grad_norm)
+            opt.step()
+            with torch.no_grad():
+                pred = policy.get_distribution(obs_t).mode()
+            k = len(act_t)
+            total += k
+            nll_sum += nll.item() * k
+            v_sum += v_loss.item() * k
+            correct += int((pred == act_t).sum())
+        stats = {"epoch": epoch + 1, "loss": nll_sum / max(1, total), "acc": correct / max(1, total), "value_loss": v_sum / max(1, total)}
+        history.append(stats)
+        log(stats)
+    policy.set_training_mode(False)
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Behavior-clone the PPO MlpPolicy on an offline dataset (train.dataset)")
+    parser.add_argument("--config", default="train/config.yaml")
+    parser.add_argument("--data", default="results/datasets/heuristic", help="Dataset directory with dataset.json")
+    parser.add_argument("--out", default="train/models/bc_pretrained.zip", help="PPO checkpoint to write; pass it to train_ppo.py --resume_from")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch_size", type=int, default=1024)
+    parser.add_argument("--lr", type=float, default=3e-4)
+    parser.add_argument("--value_coef", type=float, default=0.5, help="Weight of the value-head regression on recorded returns (0 disables)")
+    parser.add_argument("--device", default="auto", choices=["auto", "cpu", "cuda"])
+    args = parser.parse_args()
+    from stable_baselines3.common.utils import set_random_seed
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    seed = cfg.get("seed", 42)
+    set_random_seed(seed)
+    paths = shard_paths(args.data)
+    normalizer = fit_normalizer(paths, cfg, np.random.default_rng(seed))
+    # A one-env batched env only supplies the spaces; the saved model trains on any backend.
+    env = make_batched_env({**cfg, "normalize": None}, 1, seed)
+    model = new_model(cfg, env, seed, device=args.device)
+    behavior_clone(model, paths, args.epochs, args.batch_size, args.lr, args.value_coef, normalizer, seed)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    model.save(args.out)
+    print(args.out)
+    if normalizer is not None:
+        print(normalizer.save(norm_path(args.out)))
+    print(f"continue with: python -m train.train_ppo --config {args.config} --resume_from {args.out}")
+    env.close()
+
+
+if __name__ == "__main__":
+    main()
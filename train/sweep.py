@@ -0,0 +1,282 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import yaml
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    sweep TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    rung INTEGER NOT NULL DEFAULT -1,
+    status TEXT NOT NULL DEFAULT 'idle',
+    updated REAL NOT NULL,
+    PRIMARY KEY (sweep, trial)
+);
+CREATE TABLE IF NOT EXISTS results (
+    sweep TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    rung INTEGER NOT NULL,
+    timesteps INTEGER NOT NULL,
+    score REAL NOT NULL,
+    wall_s REAL NOT NULL,
+    PRIMARY KEY (sweep, trial, rung)
+);
+"""
+
+
+def sample_params(space, rng):
+    """Draw one point from ``{key: {type: uniform|loguniform|int|choice, ...}}``."""
+    out = {}
+    for key, spec in sorted(space.items()):
+        kind = spec["type"]
+        if kind == "uniform":
+            out[key] = float(rng.uniform(spec["low"], spec["high"]))
+        elif kind == "loguniform":
+            out[key] = float(np.exp(rng.uniform(np.log(spec["low"]), np.log(spec["high"]))))
+        elif kind == "int":
+            out[key] = int(rng.integers(spec["low"], spec["high"] + 1))
+        elif kind == "choice":
+            out[key] = spec["values"][int(rng.integers(len(spec["values"])))]
+        else:
+            raise ValueError(f"unknown search space type for {key}: {kind}")
+    return out
+
+
+def apply_params(cfg, params):
+    """Config copy with dotted keys (``env.wait_w``) overridden."""
+    cfg = copy.deepcopy(cfg)
+    for key, value in params.items():
+        node = cfg
+        *path, leaf = key.split(".")
+        for part in path:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return cfg
+
+
+# Reward terms of TrafficEnv; a sweep may train with other weights, but every
+# trial is scored with the base config's so the scores stay comparable.
+REWARD_WEIGHTS = ("env.wait_w", "env.max_w", "env.switch_w", "env.served_w", "env.imbalance_w", "env.hold_w")
+
+
+def eval_config(cfg, params):
+    """Config a trial is scored on: ``params`` without the reward weights."""
+    return apply_params(cfg, {k: v for k, v in params.items() if k not in REWARD_WEIGHTS})
+
+
+class Sweep:
+    """Asynchronous successive halving (ASHA) over trials stored in SQLite.
+
+    Rung r trains a trial to ``min_timesteps * eta**r`` timesteps. A trial
+    that finished rung r is promoted to r+1 once it ranks in the top
+    ``1/eta`` of all trials that have finished rung r; otherwise it waits and
+    is eventually left behind (pruned). Free workers take promotions first,
+    highest rung first, then start new trials. All state lives in the
+    database, so a crashed sweep resumes where it stopped: trials that were
+    running go back to idle and repeat their interrupted rung.
+    """
+
+    def __init__(self, db_path, name, space, n_trials=32, min_timesteps=50000, eta=3, max_rung=3, seed=0):
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        self.name = name
+        self.space = space
+        self.n_trials = n_trials
+        self.min_timesteps = min_timesteps
+        self.eta = eta
+        self.max_rung = max_rung
+        self.seed = seed
+        with self.db:
+            self.db.execute("UPDATE trials SET status='idle' WHERE sweep=? AND status='running'", (name,))
+
+    def budget(self, rung):
+        return int(self.min_timesteps * self.eta ** rung)
+
+    def _trials(self, where="", args=()):
+        rows = self.db.execute(f"SELECT trial, params, rung, status FROM trials WHERE sweep=? {where} ORDER BY trial", (self.name, *args))
+        return [(t, json.loads(p), r, s) for t, p, r, s in rows]
+
+    def scores(self, rung):
+        rows = self.db.execute("SELECT trial, score FROM results WHERE sweep=? AND rung=? ORDER BY score DESC", (self.name, rung))
+        return rows.fetchall()
+
+    def _promotable(self, rung):
+        ranked = self.scores(rung)
+        top = {t for t, _ in ranked[:len(ranked) // self.eta]}
+        for t, params, r, status in self._trials("AND rung=? AND status='idle'", (rung,)):
+            if t in top:
+                return t, params
+        return None
+
+    def next_job(self):
+        """Return ``(trial, params, rung)`` to run next, or None if nothing is ready."""
+        for rung in range(self.max_rung - 1, -1, -1):
+            found = self._promotable(rung)
+            if found is not None:
+                return found[0], found[1], rung + 1
+        # Interrupted or not yet started rung-0 runs of existing trials.
+        for t, params, r, status in self._trials("AND rung=-1 AND status='idle'"):
+            return t, params, 0
+        count = self.db.execute("SELECT COUNT(*) FROM trials WHERE sweep=?", (self.name,)).fetchone()[0]
+        if count >= self.n_trials:
+            return None
+        params = sample_params(self.space, np.random.default_rng([self.seed, count]))
+        with self.db:
+            self.db.execute("INSERT INTO trials (sweep, trial, params, updated) VALUES (?, ?, ?, ?)",
+                            (self.name, count, json.dumps(params), time.time()))
+        return count, params, 0
+
+    def start(self, trial):
+        with self.db:
+            self.db.execute("UPDATE trials SET status='running', updated=? WHERE sweep=? AND trial=?", (time.time(), self.name, trial))
+
+    def record(self, trial, rung, timesteps, score, wall_s):
+        status = "finished" if rung >= self.max_rung else "idle"
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", (self.name, trial, rung, timesteps, score, wall_s))
+            self.db.execute("UPDATE trials SET rung=?, status=?, updated=? WHERE sweep=? AND trial=?",
+                            (rung, status, time.time(), self.name, trial))
+
+    def fail(self, trial, error):
+        with self.db:
+            self.db.execute("UPDATE trials SET status=?, updated=? WHERE sweep=? AND trial=?",
+                            (f"failed: {error}"[:200], time.time(), self.name, trial))
+
+    def close(self):
+        """Mark idle trials that were never promoted as stopped."""
+        with self.db:
+            self.db.execute("UPDATE trials SET status='stopped' WHERE sweep=? AND status='idle'", (self.name,))
+
+    def leaderboard(self):
+        rows = self.db.execute(
+            "SELECT t.trial, t.params, t.rung, t.status, r.score FROM trials t JOIN results r "
+            "ON t.sweep=r.sweep AND t.trial=r.trial AND t.rung=r.rung WHERE t.sweep=? ORDER BY t.rung DESC, r.score DESC",
+            (self.name,))
+        return [{"trial": t, "params": json.loads(p), "rung": r, "status": s, "score": sc} for t, p, r, s, sc in rows]
+
+
+def _pin_worker(cores):
+    core = cores.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def run_trial(cfg, params, trial, rung, timesteps, prev_timesteps, ckpt_dir, num_envs, eval_episodes):
+    """Train one trial up to ``timesteps`` (continuing its last checkpoint) and evaluate it.
+
+    Scoring uses SB3's evaluate_policy, the routine behind EvalCallback, on
+    the same TrafficEnv factory train_ppo.py evaluates with, once at the end
+    of the rung. The eval env keeps the base reward weights (eval_config), so
+    a trial cannot score higher just by sampling smaller penalties.
+    """
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.evaluation import evaluate_policy
+    from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor
+    from envs.normalize import Normalizer, norm_path
+    from train.train_ppo import make_batched_env, make_env, new_model
+    from train.wrappers import NormalizeVec
+    t0 = time.perf_counter()
+    base, cfg = cfg, apply_params(cfg, params)
+    seed = cfg.get("seed", 42) + trial
+    ckpt = os.path.join(ckpt_dir, f"trial_{trial}.zip")
+    resume = rung > 0 and os.path.exists(ckpt)
+    normalizer = None
+    if resume and cfg.get("normalize") and os.path.exists(norm_path(ckpt)):
+        normalizer = Normalizer.load(norm_path(ckpt), num_envs)
+    env = make_batched_env(cfg, num_envs, seed, normalizer)
+    normalizer = getattr(env, "normalizer", None)
+    if resume:
+        model = PPO.load(ckpt, env=env, device="cpu")
+    else:
+        model, prev_timesteps = new_model(cfg, env, seed, device="cpu"), 0
+    model.learn(total_timesteps=timesteps - prev_timesteps, reset_num_timesteps=prev_timesteps == 0)
+    model.save(ckpt)
+    eval_env = VecMonitor(DummyVecEnv([make_env("base", eval_config(base, params), seed + 10_000)]))
+    if normalizer is not None:
+        normalizer.save(norm_path(ckpt))
+        eval_env = NormalizeVec(eval_env, normalizer, training=False)
+    score, _ = evaluate_policy(model, eval_env, n_eval_episodes=eval_episodes, deterministic=True)
+    env.close()
+    return float(score), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASHA hyperparameter / reward-weight sweep")
+    parser.add_argument("--config", default="train/config.yaml")
+    parser.add_argument("--space", default="train/sweep.yaml", help="Search space and schedule")
+    parser.add_argument("--name", default=None, help="Sweep name (default: space file name)")
+    parser.add_argument("--db", default="results/sweeps.sqlite")
+    parser.add_argument("--out_dir", default="results/sweeps")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--num_envs", type=int, default=8, help="Batched envs per trial")
+    parser.add_argument("--eval_episodes", type=int, default=3)
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    with open(args.space, "r") as f:
+        spec = yaml.safe_load(f)
+    name = args.name or os.path.splitext(os.path.basename(args.space))[0]
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    ckpt_dir = os.path.join(args.out_dir, name)
+    os.makedirs(ckpt_dir, exist_ok=True)
+    sched = spec.get("schedule", {})
+    sweep = Sweep(args.db, name, spec["space"], n_trials=sched.get("trials", 32),
+                  min_timesteps=sched.get("min_timesteps", 50000), eta=sched.get("eta", 3),
+                  max_rung=sched.get("max_rung", 3), seed=cfg.get("seed", 42))
+    workers = max(1, args.workers)
+    ctx = mp.get_context("forkserver")
+    cores = ctx.Queue()
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    for i in range(workers):
+        cores.put(available[i % len(available)])
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_pin_worker, initargs=(cores,)) as pool:
+        while True:
+            while len(running) < workers:
+                job = sweep.next_job()
+                if job is None:
+                    break
+                trial, params, rung = job
+                sweep.start(trial)
+                prev = sweep.budget(rung - 1) if rung > 0 else 0
+                fut = pool.submit(run_trial, cfg, params, trial, rung, sweep.budget(rung), prev,
+                                  ckpt_dir, args.num_envs, args.eval_episodes)
+                running[fut] = (trial, rung)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                trial, rung = running.pop(fut)
+                try:
+                    score, wall = fut.result()
+                except Exception as e:
+                    print(f"[WARN] trial {trial} rung {rung} failed: {e}")
+                    sweep.fail(trial, e)
+                    continue
+                sweep.record(trial, rung, sweep.budget(rung), score, wall)
+                print(json.dumps({"trial": trial, "rung": rung, "timesteps": sweep.budget(rung), "score": score, "wall_s": round(wall, 1)}))
+    sweep.close()
+    board = sweep.leaderboard()
+    if board:
+        best = board[0]
+        out = os.path.join(args.out_dir, f"{name}_best.yaml")
+        with open(out, "w") as f:
+            yaml.safe_dump(apply_params(cfg, best["params"]), f, sort_keys=False)
+        print(json.dumps(best))
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
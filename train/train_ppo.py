@@ -2,15 +2,22 @@ import os
 import shutil
 import argparse
 import yaml
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
-from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.callbacks import EvalCallback, CallbackList
-from train.wrappers import RandomizeParams
-from stable_baselines3.common.utils import set_random_seed
-from envs.traffic_env import TrafficEnv
+# SB3, torch and the env modules that pull them in are imported where they
+# are used, so --help and the config helpers load in a fraction of a second.
+
+def signal_kwargs(cfg):
+    # The signal model takes the env section's timings and weights, plus its
+    # own table, pedestrian rates and ped_w from the signal section.
+    if cfg["env"].get("demand"):
+        raise ValueError("demand models are not supported with the 'signal' config")
+    env_cfg = {k: v for k, v in cfg["env"].items() if k not in ("fast", "demand")}
+    return {**env_cfg, **(cfg["signal"] if isinstance(cfg["signal"], dict) else {"table": cfg["signal"]})}
 
 def make_env(env_type, cfg, seed):
+    from envs.traffic_env import TrafficEnv
+    if cfg.get("signal"):
+        from envs.signal_env import SignalEnv
+        return lambda: SignalEnv(seed=seed, **signal_kwargs(cfg))
     def _thunk():
         e = TrafficEnv(
                 seed=seed,
@@ -28,10 +35,64 @@ def make_env(env_type, cfg, seed):
                 served_w=cfg["env"].get("served_w", 0.05),
                 imbalance_w=cfg["env"].get("imbalance_w", 0.0),
                 hold_w=cfg["env"].get("hold_w", 0.0),
+                fast=cfg["env"].get("fast", False),
+                demand=cfg["env"].get("demand"),
             )
         return e
     return _thunk
 
+def make_batched_env(cfg, num_envs, seed, normalizer=None, record=None):
+    from stable_baselines3.common.vec_env import VecMonitor
+    from envs.batched_env import BatchedTrafficEnv
+    from envs.signal_env import BatchedSignalEnv
+    env_cfg = {k: v for k, v in cfg["env"].items() if k != "fast"}
+    normalize = normalizer or cfg.get("normalize")
+    if cfg.get("signal"):
+        env = BatchedSignalEnv(num_envs, seed=seed, normalize=normalize, gamma=cfg.get("gamma", 0.99), record=record, **signal_kwargs(cfg))
+    else:
+        env = BatchedTrafficEnv(num_envs, seed=seed, normalize=normalize, gamma=cfg.get("gamma", 0.99), record=record, **env_cfg)
+    env.seed(seed)
+    # The normalization stage reports raw episode returns itself.
+    return env if env.normalizer is not None else VecMonitor(env)
+
+def make_shm_env(cfg, num_envs, seed, num_workers=None, normalizer=None, record=None):
+    from stable_baselines3.common.vec_env import VecMonitor
+    from envs.shm_vec_env import ShmVecEnv
+    if cfg.get("signal"):
+        raise ValueError("--vec shm does not support the 'signal' config; use --vec batched")
+    env_cfg = {k: v for k, v in cfg["env"].items() if k != "fast"}
+    normalize = normalizer or cfg.get("normalize")
+    env = ShmVecEnv(num_envs, num_workers=num_workers, seed=seed, normalize=normalize, gamma=cfg.get("gamma", 0.99), record=record, **env_cfg)
+    env.seed(seed)
+    return env if env.normalizer is not None else VecMonitor(env)
+
+def new_model(cfg, env, seed, device="auto", tb_log_dir=None):
+    from stable_baselines3 import PPO
+    lr_cfg = cfg.get("learning_rate")
+    lr_sched = cfg.get("learning_rate_schedule")
+    if lr_sched == "linear" and isinstance(lr_cfg, (int, float)):
+        init_lr = float(lr_cfg)
+        def lr_schedule(progress_remaining):
+            return init_lr * progress_remaining
+        lr = lr_schedule
+    else:
+        lr = lr_cfg
+    return PPO(cfg["policy"], env,
+               learning_rate=lr,
+               gamma=cfg["gamma"],
+               gae_lambda=cfg["gae_lambda"],
+               n_steps=cfg["n_steps"],
+               batch_size=cfg["batch_size"],
+               n_epochs=cfg["n_epochs"],
+               ent_coef=cfg["ent_coef"],
+               clip_range=cfg["clip_range"],
+               target_kl=cfg.get("target_kl", None),
+               seed=seed,
+               device=device,
+               tensorboard_log=tb_log_dir,
+               policy_kwargs=cfg.get("policy_kwargs", None),
+               verbose=0)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--env", choices=["base"], default="base")
@@ -42,54 +103,56 @@ def main():
     parser.add_argument("--total_timesteps", type=int, default=None, help="Override total timesteps")
     parser.add_argument("--tb_log_dir", default=None, help="TensorBoard log dir")
     parser.add_argument("--subproc", action="store_true", help="Use SubprocVecEnv for parallelism")
+    parser.add_argument("--vec", default=None, choices=["dummy", "subproc", "batched", "shm"], help="Vectorized env backend (batched = native structure-of-arrays env, shm = batched slices in worker processes over shared memory)")
+    parser.add_argument("--num_workers", type=int, default=None, help="Worker processes for --vec shm (default: CPU count)")
     parser.add_argument("--eval_freq", type=int, default=0, help="Eval frequency in steps (0 disables)")
     parser.add_argument("--eval_episodes", type=int, default=5, help="Episodes per evaluation")
     parser.add_argument("--save_best", action="store_true", help="Save best model during training")
     parser.add_argument("--progress_bar", action="store_true", help="Show training progress bar")
     parser.add_argument("--resume_from", default=None, help="Path to an existing SB3 checkpoint to continue training from")
+    parser.add_argument("--record", default=None, help="Directory to record every training step to (see envs/recorder.py)")
     args = parser.parse_args()
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.callbacks import EvalCallback, CallbackList
+    from stable_baselines3.common.utils import set_random_seed
+    from envs.normalize import Normalizer, norm_path
+    from train.wrappers import BatchRandomize, NormalizeVec, RecordVec
+    from train import export_policy
     with open(args.config, "r") as f:
         cfg = yaml.safe_load(f)
     os.makedirs(args.models_dir, exist_ok=True)
     seed = cfg.get("seed", 42)
     set_random_seed(seed)
+    rand_cfg = cfg.get("rand")
     def factory():
-        e = make_env(args.env, cfg, seed)()
-        rand_cfg = cfg.get("rand")
-        if rand_cfg:
-            e = RandomizeParams(e, rand_cfg)
-        return e
-
-    vec_cls = SubprocVecEnv if args.subproc and args.num_envs > 1 else None
-    env = make_vec_env(factory, n_envs=args.num_envs, seed=seed, vec_env_cls=vec_cls)
-    policy = cfg["policy"]
+        return make_env(args.env, cfg, seed)()
 
-    lr_cfg = cfg.get("learning_rate")
-    lr_sched = cfg.get("learning_rate_schedule")
-    if lr_sched == "linear" and isinstance(lr_cfg, (int, float)):
-        init_lr = float(lr_cfg)
-        def lr_schedule(progress_remaining):
-            return init_lr * progress_remaining
-        lr = lr_schedule
+    normalizer = None
+    if cfg.get("normalize") and args.resume_from and os.path.exists(norm_path(args.resume_from)):
+        normalizer = Normalizer.load(norm_path(args.resume_from), args.num_envs)
+    vec_kind = args.vec or ("subproc" if args.subproc else "dummy")
+    vec_cls = SubprocVecEnv if vec_kind == "subproc" and args.num_envs > 1 else None
+    if vec_kind in ("batched", "shm"):
+        if vec_kind == "shm":
+            env = make_shm_env(cfg, args.num_envs, seed, args.num_workers, normalizer, args.record)
+        else:
+            env = make_batched_env(cfg, args.num_envs, seed, normalizer, args.record)
+        normalizer = getattr(env, "normalizer", None)
     else:
-        lr = lr_cfg
+        env = make_vec_env(factory, n_envs=args.num_envs, seed=seed, vec_env_cls=vec_cls)
+        if args.record:
+            env = RecordVec(env, args.record)
+        normalizer = normalizer or Normalizer.make(cfg.get("normalize"), args.num_envs, cfg["gamma"],
+                                                   obs_dim=env.observation_space.shape[0])
+        if normalizer is not None:
+            env = NormalizeVec(env, normalizer)
+    if rand_cfg:
+        env = BatchRandomize(env, rand_cfg, seed=seed)
 
     def _new_model():
-        return PPO(policy, env,
-                   learning_rate=lr,
-                   gamma=cfg["gamma"],
-                   gae_lambda=cfg["gae_lambda"],
-                   n_steps=cfg["n_steps"],
-                   batch_size=cfg["batch_size"],
-                   n_epochs=cfg["n_epochs"],
-                   ent_coef=cfg["ent_coef"],
-                   clip_range=cfg["clip_range"],
-                   target_kl=cfg.get("target_kl", None),
-                   seed=seed,
-                   device=args.device,
-                   tensorboard_log=args.tb_log_dir,
-                   policy_kwargs=cfg.get("policy_kwargs", None),
-                   verbose=0)
+        return new_model(cfg, env, seed, device=args.device, tb_log_dir=args.tb_log_dir)
 
     resume_path = args.resume_from
     if resume_path and os.path.exists(resume_path):
@@ -120,14 +183,12 @@ def main():
 
     callbacks = []
     if args.eval_freq and args.eval_freq > 0:
-        def eval_factory():
-            e = make_env(args.env, cfg, seed)()
-            rand_cfg = cfg.get("rand")
-            if rand_cfg:
-                e = RandomizeParams(e, rand_cfg)
-            return e
         eval_vec_cls = vec_cls if vec_cls is not None else DummyVecEnv
-        eval_env = make_vec_env(eval_factory, n_envs=1, seed=seed, vec_env_cls=eval_vec_cls)
+        eval_env = make_vec_env(factory, n_envs=1, seed=seed, vec_env_cls=eval_vec_cls)
+        if rand_cfg:
+            eval_env = BatchRandomize(eval_env, rand_cfg, seed=seed + 1)
+        if normalizer is not None:
+            eval_env = NormalizeVec(eval_env, normalizer, training=False)
         eval_cb = EvalCallback(eval_env, best_model_save_path=args.models_dir if args.save_best else None,
                                log_path=args.tb_log_dir, eval_freq=args.eval_freq,
                                n_eval_episodes=args.eval_episodes, deterministic=True, render=False)
@@ -145,6 +206,13 @@ def main():
     else:
         model.save(out_path)
         print(out_path)
+    if normalizer is not None:
+        print(normalizer.save(norm_path(out_path)))
+    try:
+        print(export_policy.export(out_path))
+    except ValueError as e:
+        print(f"[WARN] NumPy policy export skipped: {e}")
+    env.close()
 
 if __name__ == "__main__":
     main()
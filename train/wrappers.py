@@ -1,37 +1,233 @@
-import random
+import numpy as np
 import gymnasium as gym
+from stable_baselines3.common.vec_env import VecEnvWrapper
+from envs.recorder import VecRecorder, vec_schema
+
+# Config names whose env attribute is spelled differently.
+ATTR_NAMES = {"yellow": "yellow_dur"}
 
 
 class RandomizeParams(gym.Wrapper):
 
-    def __init__(self, env, cfg: dict):
+    def __init__(self, env, cfg: dict, seed=None):
         super().__init__(env)
         self.cfg = cfg or {}
+        self.rng = np.random.default_rng(seed)
         self.base = {
             "lambda_ns": getattr(env, "lambda_ns", None),
             "lambda_ew": getattr(env, "lambda_ew", None),
-            "lambda_p_ns": getattr(env, "lambda_p_ns", None),
-            "lambda_p_ew": getattr(env, "lambda_p_ew", None),
         }
 
     def _scale(self, low, high):
-        return random.uniform(low, high)
+        return float(self.rng.uniform(low, high))
 
     def _apply_randomization(self):
         r = self.cfg
         ns_scale = self._scale(r.get("lambda_scale_min", 0.7), r.get("lambda_scale_max", 1.3))
         ew_scale = self._scale(r.get("lambda_scale_min", 0.7), r.get("lambda_scale_max", 1.3))
-        p_scale_ns = self._scale(r.get("ped_scale_min", 0.7), r.get("ped_scale_max", 1.3))
-        p_scale_ew = self._scale(r.get("ped_scale_min", 0.7), r.get("ped_scale_max", 1.3))
         if self.base["lambda_ns"] is not None:
             self.env.lambda_ns = float(self.base["lambda_ns"]) * ns_scale
         if self.base["lambda_ew"] is not None:
             self.env.lambda_ew = float(self.base["lambda_ew"]) * ew_scale
-        if self.base["lambda_p_ns"] is not None:
-            self.env.lambda_p_ns = float(self.base["lambda_p_ns"]) * p_scale_ns
-        if self.base["lambda_p_ew"] is not None:
-            self.env.lambda_p_ew = float(self.base["lambda_p_ew"]) * p_scale_ew
 
     def reset(self, *args, **kwargs):
         self._apply_randomization()
         return self.env.reset(*args, **kwargs)
+
+
+def parse_rand(cfg, param_dtypes):
+    """Normalize a ``rand`` config to ``{name: {"scale"|"range": [lo, hi], "every": n}}``.
+
+    The older flat ``lambda_scale_min``/``lambda_scale_max`` keys become scale
+    ranges for both arrival rates. Names are checked against ``param_dtypes``,
+    the env's own parameter table.
+    """
+    cfg = cfg or {}
+    params = {k: dict(v) for k, v in (cfg.get("params") or {}).items()}
+    if "lambda_scale_min" in cfg or "lambda_scale_max" in cfg:
+        lo, hi = cfg.get("lambda_scale_min", 0.7), cfg.get("lambda_scale_max", 1.3)
+        for name in ("lambda_ns", "lambda_ew"):
+            params.setdefault(name, {"scale": [lo, hi]})
+    for name, spec in params.items():
+        if ("scale" in spec) == ("range" in spec):
+            raise ValueError(f"rand.params.{name} needs exactly one of 'scale' or 'range'")
+        if ATTR_NAMES.get(name, name) not in param_dtypes:
+            raise ValueError(f"rand.params.{name} is not a randomizable parameter of this env "
+                             f"(one of {', '.join(sorted(param_dtypes))})")
+    return params
+
+
+class BatchRandomize(VecEnvWrapper):
+    """Per-env domain randomization for vectorized traffic envs.
+
+    Each parameter is drawn uniformly from ``range: [lo, hi]`` or as the env's
+    configured value times a factor from ``scale: [lo, hi]``, at every episode
+    start and, with ``every: n``, again every n steps within the episode.
+    Integer parameters are rounded.
+
+    Env i draws from its own generator seeded with ``(seed, i)``, so its
+    parameter sequence does not depend on how many envs run or how they are
+    split across workers. Uniforms are pre-drawn per env in blocks of
+    ``block`` rows and turned into parameters for all resampled envs in one
+    vectorized expression; steps without a resample only advance a counter.
+    Parameters are those of the env's ``PARAM_DTYPES`` table.
+    New values go in through the env's vectorized ``set_params`` when it has
+    one (BatchedTrafficEnv, ShmVecEnv) and per-env set_attr otherwise.
+
+    The values an episode started with are reported in its final step's info
+    under ``"rand"``; scheduled changes are reported under ``"rand_update"``
+    in the info of the step where they take effect.
+    """
+
+    def __init__(self, venv, cfg, seed=0, block=64):
+        super().__init__(venv)
+        param_dtypes = venv.get_attr("PARAM_DTYPES", indices=[0])[0]
+        specs = parse_rand(cfg, param_dtypes)
+        n = self.num_envs
+        self.names = list(specs)
+        self.attrs = [ATTR_NAMES.get(k, k) for k in self.names]
+        self.low = np.array([specs[k].get("scale", specs[k].get("range"))[0] for k in self.names], dtype=np.float64)
+        self.high = np.array([specs[k].get("scale", specs[k].get("range"))[1] for k in self.names], dtype=np.float64)
+        self.integer = np.array([np.issubdtype(param_dtypes[a], np.integer) for a in self.attrs], dtype=bool)
+        self.base = np.ones((n, len(self.names)), dtype=np.float64)
+        for j, (name, attr) in enumerate(zip(self.names, self.attrs)):
+            if "scale" in specs[name]:
+                self.base[:, j] = np.asarray(venv.get_attr(attr), dtype=np.float64)
+        self.schedules = {}
+        for j, name in enumerate(self.names):
+            every = int(specs[name].get("every", 0))
+            if every > 0:
+                self.schedules.setdefault(every, np.zeros(len(self.names), dtype=bool))[j] = True
+        self.block = max(1, int(block))
+        self.rngs = [np.random.default_rng([seed, i]) for i in range(n)]
+        self._u = np.zeros((n, self.block, len(self.names)), dtype=np.float64)
+        self._pos = np.full(n, self.block, dtype=np.int64)
+        self._steps = np.zeros(n, dtype=np.int64)
+        self.values = np.zeros((n, len(self.names)), dtype=np.float64)
+        self.start_values = np.zeros_like(self.values)
+        self._all = np.arange(n)
+
+    def _sample(self, indices, columns=None):
+        """Draw new values for envs ``indices`` (restricted to ``columns``) and push them."""
+        for i in indices[self._pos[indices] >= self.block]:
+            self._u[i] = self.rngs[i].random((self.block, len(self.names)))
+            self._pos[i] = 0
+        u = self._u[indices, self._pos[indices]]
+        self._pos[indices] += 1
+        values = self.low + u * (self.high - self.low)
+        values *= self.base[indices]
+        values = np.where(self.integer, np.maximum(0.0, np.round(values)), values)
+        if columns is None:
+            columns = np.ones(len(self.names), dtype=bool)
+        self.values[np.ix_(indices, columns)] = values[:, columns]
+        params = {self.attrs[j]: self.values[indices, j] for j in np.flatnonzero(columns)}
+        if hasattr(self.venv, "set_params"):
+            self.venv.set_params(indices, params)
+        else:
+            for k, i in enumerate(indices):
+                for attr, v in params.items():
+                    value = int(v[k]) if self.integer[self.attrs.index(attr)] else float(v[k])
+                    self.venv.set_attr(attr, value, indices=[int(i)])
+
+    def _record(self, i, columns=None):
+        cols = range(len(self.names)) if columns is None else np.flatnonzero(columns)
+        return {self.names[j]: self.values[i, j].item() for j in cols}
+
+    def reset(self):
+        obs = self.venv.reset()
+        # Fresh episodes have empty queues and t_in_phase 0, so the reset
+        # observation does not depend on the parameters set after it.
+        if self.names:
+            self._sample(self._all)
+            self.start_values[:] = self.values
+        self._steps[:] = 0
+        return obs
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        if not self.names:
+            return obs, rewards, dones, infos
+        self._steps += 1
+        done_idx = np.flatnonzero(dones)
+        for every, columns in self.schedules.items():
+            due = np.flatnonzero((self._steps % every == 0) & ~dones)
+            if due.size:
+                self._sample(due, columns)
+                for i in due:
+                    infos[i]["rand_update"] = self._record(i, columns)
+        if done_idx.size:
+            for i in done_idx:
+                infos[i]["rand"] = {name: self.start_values[i, j].item() for j, name in enumerate(self.names)}
+            self._sample(done_idx)
+            self.start_values[done_idx] = self.values[done_idx]
+            self._steps[done_idx] = 0
+        return obs, rewards, dones, infos
+
+
+class NormalizeVec(VecEnvWrapper):
+    """Normalizer as a wrapper, for vec envs without a built-in stage.
+
+    With ``training=False`` only observations are scaled, with statistics
+    shared from (and updated by) another env, as EvalCallback needs.
+    """
+
+    def __init__(self, venv, normalizer, training=True):
+        super().__init__(venv)
+        self.normalizer = normalizer
+        self.training = training
+
+    def reset(self):
+        obs = np.asarray(self.venv.reset(), dtype=np.float32)
+        if self.training:
+            return self.normalizer.reset(obs)
+        return self.normalizer.normalize_obs(obs)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        obs = np.asarray(obs, dtype=np.float32)
+        if self.training:
+            obs, rewards = self.normalizer.step(obs, rewards, dones, infos)
+        else:
+            obs = self.normalizer.normalize_obs(obs)
+        for i in np.flatnonzero(dones):
+            if "terminal_observation" in infos[i]:
+                infos[i]["terminal_observation"] = self.normalizer.normalize_obs(infos[i]["terminal_observation"])
+        return obs, rewards, dones, infos
+
+
+class RecordVec(VecEnvWrapper):
+    """Log every step to an episode recording, for vec envs without a built-in
+    ``record`` stage (DummyVecEnv, SubprocVecEnv).
+
+    Wrap it inside NormalizeVec to keep raw observations and rewards.
+    """
+
+    def __init__(self, venv, record):
+        super().__init__(venv)
+        self.recorder = VecRecorder.make(record, venv.num_envs, vec_schema(venv.observation_space.shape[0]))
+        self._actions = np.zeros(venv.num_envs, dtype=np.int64)
+
+    def reset(self):
+        obs = self.venv.reset()
+        self.recorder.reset()
+        return obs
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        last = obs
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            last = np.array(obs, dtype=np.float32)
+            for i in done_idx:
+                if "terminal_observation" in infos[i]:
+                    last[i] = infos[i]["terminal_observation"]
+        self.recorder.step(last, self._actions, rewards, dones)
+        return obs, rewards, dones, infos
+
+    def close(self):
+        self.recorder.close()
+        return self.venv.close()
@@ -1,4 +1,6 @@
 const api = ''
+const sessionId = sessionStorage.getItem('neurolight-session') || (crypto.randomUUID ? crypto.randomUUID() : String(Math.random()).slice(2))
+sessionStorage.setItem('neurolight-session', sessionId)
 const c = document.getElementById('c')
 const ctx = c.getContext('2d')
 let obs = null
@@ -10,6 +12,8 @@ let yellow = 0
 let pedWalk = 0
 let pedClear = 0
 let prevPhase = 0
+// The server runs TrafficEnv, which has no pedestrian model, so the
+// pedestrian drawing stays off.
 let pedEnabled = false
 let interval = 1000
 let rush = false
@@ -34,14 +38,14 @@ window.addEventListener('load', () => setTimeout(size, 200))
 async function post(path, body){
   const r = await fetch(`${api}${path}`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: { 'Content-Type': 'application/json', 'X-Session-Id': sessionId },
     body: body ? JSON.stringify(body) : '{}'
   });
   return r.json()
 }
 
 async function get(path){
-  const r = await fetch(`${api}${path}`);
+  const r = await fetch(`${api}${path}`, { headers: { 'X-Session-Id': sessionId } });
   return r.json()
 }
 
@@ -471,7 +475,7 @@ async function stepOnce(){
     waitSeries = []
   }
   
-  const met = await get('/metrics')
+  const met = r.metrics || await get('/metrics')
   metrics = met
   
   document.getElementById('ep').textContent = met.episode || 1